@@ -0,0 +1,350 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+性能剖析工具
+功能：为数据分析、文本分析工具提供分阶段计时、计数器和峰值内存统计，
+      --profile 时打印各阶段耗时，可导出JSON时间线或cProfile/pyinstrument剖析结果
+作者：何枭雄
+日期：2025-01-15
+
+在工具中使用：
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'common'))
+    from profiling import profiler, add_profile_arguments, profile_session
+
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    with profile_session(args):
+        with profiler.stage('read+parse'):
+            ...
+        profiler.count('lines', line_count)
+
+未开启时 stage() 返回共享的空上下文，count() 直接返回，不计时也不分配对象。
+阶段可以嵌套（显示为 父阶段/子阶段），但不要跨越生成器的 yield 使用。
+"""
+
+import os
+import sys
+import json
+import time
+import contextlib
+import unicodedata
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+try:
+    import pyinstrument
+except ImportError:
+    pyinstrument = None
+
+
+PROFILERS = ('cprofile', 'pyinstrument')
+MAX_TRACE_EVENTS = 100000     # JSON时间线最多记录的阶段事件数（阶段统计不受影响）
+
+
+def peak_rss_kb(children=False):
+    """进程（或已结束子进程中最大）的峰值常驻内存（KB），不支持时返回None"""
+    if resource is None:
+        return None
+    who = resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+    peak = resource.getrusage(who).ru_maxrss
+    # Linux单位为KB，macOS为字节
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def display_width(text):
+    """终端显示宽度（中文字符占两列）"""
+    return sum(2 if unicodedata.east_asian_width(ch) in 'WF' else 1 for ch in text)
+
+
+def ljust(text, width):
+    return text + ' ' * max(width - display_width(text), 0)
+
+
+def rjust(text, width):
+    return ' ' * max(width - display_width(text), 0) + text
+
+
+def format_mb(kb):
+    return '-' if kb is None else f'{kb / 1024:.1f}'
+
+
+class _NullStage(object):
+    """未开启剖析时使用的空上下文"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_STAGE = _NullStage()
+
+
+class Stage(object):
+    """一次阶段计时，退出时把耗时和峰值内存记入 Profiler"""
+
+    __slots__ = ('profiler', 'name', 'path', 'start', 'rss')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        stack = self.profiler.stack
+        stack.append(self.name)
+        self.path = '/'.join(stack)
+        self.rss = peak_rss_kb()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        self.profiler.stack.pop()
+        self.profiler.record(self.path, self.start, end, self.rss, peak_rss_kb())
+        return False
+
+
+class StageStats(object):
+    """一个阶段的累计统计"""
+
+    __slots__ = ('calls', 'seconds', 'rss_growth', 'rss_peak')
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.rss_growth = 0
+        self.rss_peak = None
+
+    def as_dict(self):
+        return {'calls': self.calls, 'seconds': round(self.seconds, 6),
+                'rss_growth_kb': self.rss_growth, 'rss_peak_kb': self.rss_peak}
+
+
+class Profiler(object):
+    """
+    阶段剖析器
+
+    阶段按首次出现的顺序统计；峰值内存取自 getrusage 的 ru_maxrss，
+    每个阶段记录退出时的进程峰值及该阶段内峰值的增长量
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.reset()
+
+    def reset(self):
+        self.stack = []
+        self.stages = {}
+        self.counters = {}
+        self.events = []
+        self.dropped_events = 0
+        self.started = self.stopped = None
+
+    def start(self):
+        self.reset()
+        self.enabled = True
+        self.started = time.perf_counter()
+
+    def stop(self):
+        self.stopped = time.perf_counter()
+
+    @property
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        return (self.stopped or time.perf_counter()) - self.started
+
+    def stage(self, name):
+        """阶段计时上下文：with profiler.stage('parse'): ..."""
+        if not self.enabled:
+            return NULL_STAGE
+        return Stage(self, name)
+
+    def count(self, name, value=1):
+        """累加计数器（行数、记录数、字节数等）"""
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def record(self, path, start, end, rss_before, rss_after):
+        stats = self.stages.get(path)
+        if stats is None:
+            stats = self.stages[path] = StageStats()
+        stats.calls += 1
+        stats.seconds += end - start
+        if rss_after is not None:
+            stats.rss_growth += rss_after - rss_before
+            stats.rss_peak = rss_after
+
+        if len(self.events) < MAX_TRACE_EVENTS:
+            self.events.append((path, start, end, rss_after))
+        else:
+            self.dropped_events += 1
+
+    def report(self, file=None):
+        """打印各阶段耗时、计数器和峰值内存（file默认标准输出）"""
+        total = self.elapsed
+        lines = []
+        lines.append("\n" + "="*82)
+        lines.append("性能剖析结果")
+        lines.append("="*82)
+        lines.append(ljust('阶段', 30) + rjust('次数', 8) + rjust('耗时(s)', 12) + rjust('占比', 8)
+              + rjust('峰值内存(MB)', 14) + rjust('增长(MB)', 10))
+        lines.append("-"*82)
+
+        accounted = 0.0
+        for path, stats in self.stages.items():
+            depth = path.count('/')
+            if depth == 0:
+                accounted += stats.seconds
+            name = '  ' * depth + path.rsplit('/', 1)[-1]
+            share = stats.seconds / total * 100 if total > 0 else 0.0
+            lines.append(ljust(name, 30) + f"{stats.calls:>8}{stats.seconds:>12.3f}{share:>7.1f}%"
+                  f"{format_mb(stats.rss_peak):>14}{format_mb(stats.rss_growth):>10}")
+
+        other = max(total - accounted, 0.0)
+        share = other / total * 100 if total > 0 else 0.0
+        lines.append(ljust('(其它)', 30) + f"{'':>8}{other:>12.3f}{share:>7.1f}%")
+        lines.append(ljust('总计', 30) + f"{'':>8}{total:>12.3f}")
+
+        if self.counters:
+            lines.append("-"*82)
+            lines.append(ljust('计数器', 30) + rjust('数量', 16) + rjust('速率(/s)', 16))
+            for name, value in self.counters.items():
+                rate = value / total if total > 0 else 0.0
+                lines.append(ljust(name, 30) + f"{value:>16}{rate:>16.0f}")
+
+        lines.append("-"*82)
+        children_rss = peak_rss_kb(children=True)
+        times = os.times()
+        line = f"峰值内存: {format_mb(peak_rss_kb())} MB"
+        if children_rss:
+            line += f"，子进程峰值内存: {format_mb(children_rss)} MB"
+        if times.children_user or times.children_system:
+            line += f"，子进程CPU时间: {times.children_user + times.children_system:.2f} s"
+        lines.append(line)
+        lines.append("="*82)
+        print('\n'.join(lines), file=file or sys.stdout)
+
+    def write_trace(self, output_file, file=None):
+        """导出Chrome trace格式的时间线（可用 chrome://tracing 或 Perfetto 打开）"""
+        pid = os.getpid()
+        events = []
+        for path, start, end, rss in self.events:
+            events.append({
+                'name': path.rsplit('/', 1)[-1],
+                'cat': path,
+                'ph': 'X',
+                'ts': round((start - self.started) * 1e6, 1),
+                'dur': round((end - start) * 1e6, 1),
+                'pid': pid,
+                'tid': 0,
+                'args': {'rss_peak_kb': rss},
+            })
+        trace = {
+            'traceEvents': events,
+            'displayTimeUnit': 'ms',
+            'otherData': {
+                'command': ' '.join(sys.argv),
+                'elapsed': round(self.elapsed, 6),
+                'stages': {path: stats.as_dict() for path, stats in self.stages.items()},
+                'counters': self.counters,
+                'rss_peak_kb': peak_rss_kb(),
+                'children_rss_peak_kb': peak_rss_kb(children=True),
+                'dropped_events': self.dropped_events,
+            },
+        }
+        with open(output_file, 'w', encoding='utf-8') as f:
+            json.dump(trace, f, ensure_ascii=False, indent=1)
+        print(f"[INFO] 剖析时间线已导出到: {output_file}", file=file or sys.stdout)
+
+
+# 各工具共用的全局剖析器
+profiler = Profiler()
+
+
+def add_profile_arguments(parser):
+    """为命令行工具添加剖析相关参数"""
+    group = parser.add_argument_group('性能剖析')
+    group.add_argument('--profile', action='store_true',
+                       help='运行结束后打印各阶段耗时、计数和峰值内存')
+    group.add_argument('--profile-json', metavar='FILE',
+                       help='导出Chrome trace格式的阶段时间线（JSON）')
+    group.add_argument('--profile-dump', metavar='FILE',
+                       help='同时采集函数级剖析结果写入该文件（会拖慢运行，阶段耗时仅供相对比较）')
+    group.add_argument('--profiler', choices=PROFILERS, default='cprofile',
+                       help='--profile-dump 使用的剖析器（默认cprofile；pyinstrument需单独安装，'
+                            '文件名以.html结尾时输出HTML）')
+    return group
+
+
+class _FunctionProfiler(object):
+    """cProfile/pyinstrument 的统一封装"""
+
+    def __init__(self, kind, output_file, file=None):
+        self.output_file = output_file
+        self.file = file or sys.stdout
+        if kind == 'pyinstrument' and pyinstrument is None:
+            print("[WARN] 未安装pyinstrument，改用cProfile（pip install pyinstrument）", file=self.file)
+            kind = 'cprofile'
+        self.kind = kind
+        if kind == 'pyinstrument':
+            self.impl = pyinstrument.Profiler()
+        else:
+            import cProfile
+            self.impl = cProfile.Profile()
+
+    def start(self):
+        if self.kind == 'pyinstrument':
+            self.impl.start()
+        else:
+            self.impl.enable()
+
+    def stop(self):
+        if self.kind == 'pyinstrument':
+            self.impl.stop()
+            if self.output_file.endswith('.html'):
+                output = self.impl.output_html()
+            else:
+                output = self.impl.output_text(unicode=True)
+            with open(self.output_file, 'w', encoding='utf-8') as f:
+                f.write(output)
+        else:
+            self.impl.disable()
+            self.impl.dump_stats(self.output_file)
+        print(f"[INFO] {self.kind} 剖析结果已写入: {self.output_file}", file=self.file)
+
+
+@contextlib.contextmanager
+def profile_session(args, file=None):
+    """
+    按命令行参数开启剖析，退出时打印报告并写出文件
+
+    未指定任何剖析参数时什么也不做；标准输出用于输出结果的工具可以传入 file=sys.stderr
+    """
+    if not (args.profile or args.profile_json or args.profile_dump):
+        yield profiler
+        return
+
+    function_profiler = None
+    if args.profile_dump:
+        function_profiler = _FunctionProfiler(args.profiler, args.profile_dump, file)
+
+    profiler.start()
+    if function_profiler is not None:
+        function_profiler.start()
+    try:
+        yield profiler
+    finally:
+        if function_profiler is not None:
+            function_profiler.stop()
+        profiler.stop()
+        profiler.report(file)
+        if args.profile_json:
+            profiler.write_trace(args.profile_json, file)
+        profiler.enabled = False
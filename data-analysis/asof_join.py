@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多数据源时间对齐工具
+功能：以 LogParser 输出的CSV为主数据源，为每一行匹配监控采样、标定参数表等其它数据源中
+      时间不晚于它的最近一条记录（as-of连接），超出容差时留空，结果写出为一个CSV
+作者：何枭雄
+日期：2025-01-15
+
+各数据源须按时间升序排列，时间戳格式与 log_parser 一致（%Y-%m-%d %H:%M:%S.mmm，
+无毫秒部分时按0处理）。所有数据源流式读取，按时间做一次k路归并，
+内存中只保留每个数据源的最新一条记录，占用与数据量无关。
+
+使用方法：
+    python asof_join.py -l drive.csv -r monitor=metrics.csv -r calib=calibration.csv -t monitor=2s -o joined.csv
+    python asof_join.py -l drive.csv -r monitor=../vehicle-monitoring/metrics.ring -o joined.csv
+"""
+
+import os
+import sys
+import csv
+import heapq
+import argparse
+import contextlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'common'))
+from log_parser import TimestampCache
+from profiling import profiler, add_profile_arguments, profile_session
+
+
+DEFAULT_TIME_COLUMN = 'timestamp'
+RING_SUFFIX = '.ring'              # metrics_recorder.py 的环形记录文件
+PROGRESS_INTERVAL = 1000000        # 每输出多少行显示一次进度
+
+# 容差单位（换算为毫秒）
+DURATION_UNITS = (('ms', 1), ('s', 1000), ('m', 60000), ('h', 3600000))
+
+
+def parse_duration(text):
+    """解析容差：纯数字为毫秒，也可带单位 ms/s/m/h，如 500ms、2s"""
+    text = text.strip().lower()
+    for unit, scale in DURATION_UNITS:
+        if text.endswith(unit):
+            return int(float(text[:-len(unit)]) * scale)
+    return int(float(text))
+
+
+def parse_source_option(text):
+    """解析 名称=值，无名称时返回 (None, 值)"""
+    name, sep, value = text.partition('=')
+    if not sep:
+        return None, text
+    return name, value
+
+
+def iter_ring_rows(path):
+    """读取监控环形记录文件，返回 (表头, 行迭代器)"""
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                    os.pardir, 'vehicle-monitoring'))
+    from metrics_recorder import MetricsReader, COLUMNS
+
+    reader = MetricsReader(path)
+    rows = ([record[name] for name in COLUMNS] for record in reader.iter_records())
+    return list(COLUMNS), rows
+
+
+class Source(object):
+    """
+    一个按时间升序排列的数据源（CSV文件或监控环形记录文件）
+
+    rows() 逐行返回 (毫秒时间戳, 优先级, 行)，供 heapq.merge 归并。
+    时间倒退的行计入 out_of_order：主数据源按上一行的时间处理（保证输出顺序），
+    其它数据源直接跳过（不覆盖已匹配的较新记录）
+    """
+
+    def __init__(self, name, path, time_column=DEFAULT_TIME_COLUMN, tolerance=None):
+        self.name = name
+        self.path = path
+        self.time_column = time_column
+        self.tolerance = tolerance
+        self.header = None
+        self.count = 0
+        self.matched = 0
+        self.bad = 0
+        self.out_of_order = 0
+
+    def open(self, stack):
+        """打开数据源并读取表头，文件在 stack 退出时关闭"""
+        if self.path.endswith(RING_SUFFIX):
+            self.header, self.reader = iter_ring_rows(self.path)
+        else:
+            f = stack.enter_context(open(self.path, 'r', newline='', encoding='utf-8-sig'))
+            self.reader = csv.reader(f)
+            self.header = next(self.reader, None)
+            if self.header is None:
+                raise ValueError(f"文件为空: {self.path}")
+        if self.time_column not in self.header:
+            raise ValueError(f"{self.path} 中没有时间列 {self.time_column}"
+                             f"（可用 --time-column 指定）")
+        self.time_index = self.header.index(self.time_column)
+
+    def rows(self, priority, primary=False):
+        time_index = self.time_index
+        width = len(self.header)
+        to_ms = TimestampCache().to_ms
+        last = None
+        # 相邻行大多在同一秒内，秒部分只在变化时换算，毫秒部分直接相加
+        last_prefix, base = None, 0
+        for row in self.reader:
+            if not row:
+                continue
+            try:
+                text = row[time_index]
+                prefix, fraction = text[:19], text[20:23]
+                if prefix != last_prefix:
+                    base = to_ms(prefix)
+                    last_prefix = prefix
+                time_ms = base + int(fraction.ljust(3, '0')) if fraction else base
+            except (ValueError, IndexError):
+                self.bad += 1
+                continue
+            if last is not None and time_ms < last:
+                self.out_of_order += 1
+                if not primary:
+                    continue
+                time_ms = last
+            last = time_ms
+            if len(row) != width:
+                row = (row + [''] * width)[:width]
+            self.count += 1
+            yield time_ms, priority, row
+
+
+class AsofJoiner(object):
+    """
+    as-of连接：主数据源的每一行匹配其它各数据源中时间不晚于它的最近一条记录
+
+    各数据源按 (时间, 优先级) 做k路归并，其它数据源的优先级高于主数据源，
+    时间相同的记录先更新匹配状态再输出主数据源的行（即时间相等也算匹配）
+    """
+
+    def __init__(self, primary, others, output_file):
+        self.primary = primary
+        self.others = others
+        self.output_file = output_file
+        self.rows_written = 0
+
+    def output_header(self):
+        header = list(self.primary.header)
+        for source in self.others:
+            header.extend(f'{source.name}.{column}' for column in source.header)
+        return header
+
+    def run(self):
+        """执行连接，返回写出的行数"""
+        with contextlib.ExitStack() as stack:
+            for source in [self.primary] + self.others:
+                source.open(stack)
+
+            # 其它数据源优先级 0..k-1，主数据源为 k（时间相同时排在最后）
+            primary_priority = len(self.others)
+            merged = heapq.merge(*[source.rows(priority) for priority, source in enumerate(self.others)],
+                                 self.primary.rows(primary_priority, primary=True))
+
+            latest = [None] * len(self.others)
+            empty = [[''] * len(source.header) for source in self.others]
+            tolerances = [source.tolerance for source in self.others]
+            matched = [0] * len(self.others)
+            slots = range(len(self.others))
+
+            with profiler.stage('join'), \
+                    open(self.output_file, 'w', newline='', encoding='utf-8') as f:
+                # 与 log_parser 输出一致带BOM；逐行写出时utf-8-sig编码器开销较大，这里手动写入
+                f.write('\ufeff')
+                writer = csv.writer(f)
+                writer.writerow(self.output_header())
+                writerow = writer.writerow
+                count = 0
+                for time_ms, priority, row in merged:
+                    if priority != primary_priority:
+                        latest[priority] = (time_ms, row)
+                        continue
+
+                    out = row
+                    for i in slots:
+                        current = latest[i]
+                        tolerance = tolerances[i]
+                        if current is not None and (tolerance is None or time_ms - current[0] <= tolerance):
+                            out = out + current[1]
+                            matched[i] += 1
+                        else:
+                            out = out + empty[i]
+                    writerow(out)
+
+                    count += 1
+                    if count % PROGRESS_INTERVAL == 0:
+                        print(f"[INFO] 已输出 {count} 行")
+
+        for source, value in zip(self.others, matched):
+            source.matched = value
+        self.rows_written = count
+        for source in [self.primary] + self.others:
+            profiler.count(f'rows_{source.name}', source.count)
+        profiler.count('rows_written', count)
+        return count
+
+    def print_summary(self):
+        """输出各数据源的读取和匹配情况"""
+        print("\n========== 对齐统计 ==========")
+        print(f"主数据源 {self.primary.path}: {self.primary.count} 行")
+        for source in self.others:
+            rate = source.matched / self.rows_written * 100 if self.rows_written else 0.0
+            tolerance = '不限' if source.tolerance is None else f'{source.tolerance} ms'
+            print(f"{source.name} ({source.path}): 读取 {source.count} 行，"
+                  f"匹配 {source.matched} 行（{rate:.1f}%，容差 {tolerance}）")
+        print("==============================\n")
+
+        for source in [self.primary] + self.others:
+            if source.bad:
+                print(f"[WARN] {source.path}: {source.bad} 行时间戳无法解析，已跳过")
+            if source.out_of_order:
+                action = '按上一行时间处理' if source is self.primary else '已跳过'
+                print(f"[WARN] {source.path}: {source.out_of_order} 行时间倒退，{action}"
+                      f"（请先按时间排序）")
+
+
+def build_sources(args, parser):
+    """根据命令行参数创建数据源"""
+    time_columns, tolerances = {}, {}
+    for text in args.time_column or []:
+        name, value = parse_source_option(text)
+        time_columns[name] = value
+    for text in args.tolerance or []:
+        name, value = parse_source_option(text)
+        try:
+            tolerances[name] = parse_duration(value)
+        except ValueError:
+            parser.error(f'无法识别的容差: {text}')
+
+    default_column = time_columns.get(None, DEFAULT_TIME_COLUMN)
+    primary = Source('primary', args.left, time_columns.get('primary', default_column))
+
+    others = []
+    for text in args.right:
+        name, path = parse_source_option(text)
+        if name is None:
+            name = os.path.splitext(os.path.basename(path))[0]
+        if name == 'primary' or any(source.name == name for source in others):
+            parser.error(f'数据源名称重复: {name}（可用 名称=路径 指定）')
+        others.append(Source(name, path, time_columns.get(name, default_column),
+                             tolerances.get(name, tolerances.get(None))))
+
+    unknown = (set(time_columns) | set(tolerances)) - {None, 'primary'} - {s.name for s in others}
+    if unknown:
+        parser.error(f'未知的数据源名称: {", ".join(sorted(unknown))}')
+    return primary, others
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(
+        description='多数据源时间对齐工具 - 按时间戳做as-of连接（流式k路归并）',
+        epilog='示例: python asof_join.py -l drive.csv -r monitor=metrics.csv -r calib=calibration.csv '
+               '-t monitor=2s -o joined.csv'
+    )
+    parser.add_argument('-l', '--left', required=True,
+                        help='主数据源（如 log_parser.py 输出的CSV），输出的每一行对应其中一行')
+    parser.add_argument('-r', '--right', required=True, action='append',
+                        help='要对齐的数据源 [名称=]路径，可指定多次；列名加 "名称." 前缀，'
+                             '.ring 后缀为监控环形记录文件')
+    parser.add_argument('-o', '--output', required=True, help='输出CSV文件路径')
+    parser.add_argument('-t', '--tolerance', action='append',
+                        help='最大时间差 [名称=]容差，如 2000、2s、monitor=500ms；'
+                             '不带名称时作用于所有数据源，默认不限')
+    parser.add_argument('--time-column', action='append',
+                        help=f'时间列名 [名称=]列名（默认{DEFAULT_TIME_COLUMN}，主数据源名称为primary）')
+    add_profile_arguments(parser)
+
+    args = parser.parse_args()
+    primary, others = build_sources(args, parser)
+
+    print("="*60)
+    print("多数据源时间对齐工具 v1.0")
+    print("="*60)
+
+    with profile_session(args):
+        joiner = AsofJoiner(primary, others, args.output)
+        print(f"[INFO] 主数据源: {primary.path}")
+        for source in others:
+            print(f"[INFO] 对齐数据源 {source.name}: {source.path}")
+        try:
+            count = joiner.run()
+        except FileNotFoundError as e:
+            print(f"[ERROR] 文件不存在: {e.filename}")
+            print("\n[FAILED] 任务失败！")
+            return
+        except (OSError, ValueError) as e:
+            print(f"[ERROR] {e}")
+            print("\n[FAILED] 任务失败！")
+            return
+
+        joiner.print_summary()
+        print(f"[INFO] 共输出 {count} 行到: {args.output}")
+        print("\n[SUCCESS] 任务完成！")
+
+
+if __name__ == '__main__':
+    main()
@@ -10,10 +10,15 @@
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
+import os
+import sys
 import json
 import argparse
 from pathlib import Path
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'common'))
+from profiling import profiler, add_profile_arguments, profile_session
+
 # 设置中文字体（Windows系统）
 plt.rcParams['font.sans-serif'] = ['SimHei', 'Microsoft YaHei']
 plt.rcParams['axes.unicode_minus'] = False
@@ -40,7 +45,10 @@ class CalibrationAnalyzer:
         for json_file in json_files:
             try:
                 with open(json_file, 'r') as f:
-                    data = json.load(f)
+                    with profiler.stage('read'):
+                        text = f.read()
+                    with profiler.stage('parse'):
+                        data = json.loads(text)
                     
                     # 提取关键参数
                     params = {
@@ -59,9 +67,11 @@ class CalibrationAnalyzer:
                 print(f"[WARN] 读取 {json_file.name} 失败: {str(e)}")
         
         print(f"[INFO] 成功加载 {len(self.calibration_data)} 个标定文件")
+        profiler.count('files', len(self.calibration_data))
         
         # 转换为DataFrame
-        self.df = pd.DataFrame(self.calibration_data)
+        with profiler.stage('transform'):
+            self.df = pd.DataFrame(self.calibration_data)
         return True
     
     def calculate_statistics(self):
@@ -211,6 +221,7 @@ def main():
     parser.add_argument('-p', '--plot', action='store_true', help='生成分布图')
     parser.add_argument('-t', '--threshold', type=float, default=3.0, 
                        help='异常值检测阈值（sigma），默认3.0')
+    add_profile_arguments(parser)
     
     args = parser.parse_args()
     
@@ -218,22 +229,27 @@ def main():
     print("标定参数统计分析工具 v1.0")
     print("="*60)
     
-    analyzer = CalibrationAnalyzer(args.dir)
-    
-    if analyzer.load_calibration_files():
-        analyzer.calculate_statistics()
-        
-        if args.outlier:
-            analyzer.detect_outliers(threshold=args.threshold)
-        
-        if args.plot:
-            analyzer.plot_distribution()
-        
-        analyzer.export_report()
+    with profile_session(args):
+        analyzer = CalibrationAnalyzer(args.dir)
         
-        print("\n[SUCCESS] 分析完成！")
-    else:
-        print("\n[FAILED] 分析失败！")
+        if analyzer.load_calibration_files():
+            with profiler.stage('statistics'):
+                analyzer.calculate_statistics()
+            
+            if args.outlier:
+                with profiler.stage('outliers'):
+                    analyzer.detect_outliers(threshold=args.threshold)
+            
+            if args.plot:
+                with profiler.stage('plot'):
+                    analyzer.plot_distribution()
+            
+            with profiler.stage('write'):
+                analyzer.export_report()
+            
+            print("\n[SUCCESS] 分析完成！")
+        else:
+            print("\n[FAILED] 分析失败！")
 
 
 if __name__ == '__main__':
@@ -2,7 +2,7 @@
 # -*- coding: utf-8 -*-
 """
 数据格式转换工具
-功能：在不同数据格式之间转换（JSON、CSV、YAML）
+功能：在不同数据格式之间转换（JSON、CSV、YAML、NDJSON、MessagePack）
 作者：何枭雄
 日期：2025-01-15
 """
@@ -11,45 +11,560 @@ import json
 import csv
 import yaml
 import argparse
+import contextlib
+import hashlib
+import io
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'common'))
+from profiling import profiler, add_profile_arguments, profile_session
+
+# 可选：更快的JSON后端
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+# 可选：MessagePack格式支持
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+# CSV列推断默认采样记录数
+DEFAULT_SAMPLE_SIZE = 1000
+
+# 流式读取JSON数组的块大小
+JSON_CHUNK_SIZE = 1 << 20
+
+# 支持的格式（文件后缀）
+SUPPORTED_FORMATS = ('json', 'csv', 'yaml', 'yml', 'ndjson', 'jsonl', 'msgpack')
+
+# 格式别名
+FORMAT_ALIASES = {'yml': 'yaml', 'jsonl': 'ndjson'}
+
+# 可以逐条流式读取/写出的格式
+STREAM_INPUT_FORMATS = ('json', 'csv', 'ndjson', 'msgpack')
+STREAM_OUTPUT_FORMATS = ('json', 'csv', 'ndjson', 'msgpack')
+
+# 批量转换时记录输入文件哈希的清单文件名
+BATCH_MANIFEST_NAME = '.convert_manifest.json'
+
+# orjson把超过64位的整数解析为浮点数（较新版本报错）：这类整数至少19位。
+# 数字统一替换为0后查找19个连续的0，比正则逐字符匹配快一个数量级
+_DIGITS_TO_ZERO = bytes.maketrans(b'123456789', b'000000000')
+_LONG_DIGIT_RUN = b'0' * 19
+
+#############################################################
+# 编解码后端
+#############################################################
+class JsonCodec:
+    """标准库json后端"""
+    
+    name = 'json'
+    format = 'json'
+    
+    @staticmethod
+    def available():
+        return True
+    
+    def load(self, f):
+        return json.load(f)
+    
+    def loads(self, text):
+        return json.loads(text)
+    
+    def dumps(self, data, pretty=True):
+        if pretty:
+            return json.dumps(data, indent=2, ensure_ascii=False)
+        return json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+    
+    def dump(self, data, f):
+        json.dump(data, f, indent=2, ensure_ascii=False)
+
+
+def _may_have_long_integer(data):
+    """
+    JSON文本（bytes）中是否可能含有超过64位的整数
+
+    小数部分的长数字串（如 0.00021980607000882113）不算；
+    字符串中的长数字串会误判为是，只影响速度不影响结果
+    """
+    zeros = data.translate(_DIGITS_TO_ZERO)
+    pos = zeros.find(_LONG_DIGIT_RUN)
+    while pos != -1:
+        # 前一个字符是数字说明是同一数字串的后半段，是小数点说明是小数部分
+        if pos == 0 or zeros[pos - 1] not in b'0.':
+            return True
+        pos = zeros.find(_LONG_DIGIT_RUN, pos + len(_LONG_DIGIT_RUN))
+    return False
+
+
+def _has_non_finite(data):
+    """数据中是否含有NaN/Infinity浮点数"""
+    stack = [data]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, float):
+            if value != value or value in (float('inf'), float('-inf')):
+                return True
+        elif isinstance(value, dict):
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            stack.extend(value)
+    return False
+
+
+class OrjsonCodec(JsonCodec):
+    """orjson后端（Rust实现）"""
+    
+    name = 'orjson'
+    
+    @staticmethod
+    def available():
+        return orjson is not None
+    
+    def load(self, f):
+        return self.loads(f.read())
+    
+    def loads(self, text):
+        # 加速后端的解析结果必须与标准库一致：超长整数以及NaN/Infinity等
+        # orjson不支持的标准库扩展写法回退到标准库解析
+        data = text.encode('utf-8') if isinstance(text, str) else text
+        if _may_have_long_integer(data):
+            return json.loads(text)
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            return json.loads(text)
+    
+    def dumps(self, data, pretty=True):
+        try:
+            option = orjson.OPT_INDENT_2 if pretty else 0
+            output = orjson.dumps(data, option=option)
+        except TypeError:
+            # 非字符串键、超过64位的整数等orjson不支持的数据回退到标准库
+            return super().dumps(data, pretty)
+        # orjson把NaN/Infinity写成null，与标准库不一致；输出含null时检查一遍
+        if b'null' in output and _has_non_finite(data):
+            return super().dumps(data, pretty)
+        return output.decode('utf-8')
+    
+    def dump(self, data, f):
+        f.write(self.dumps(data))
+
+
+class UjsonCodec(JsonCodec):
+    """ujson后端（C实现）"""
+    
+    name = 'ujson'
+    
+    @staticmethod
+    def available():
+        return ujson is not None
+    
+    def load(self, f):
+        return self.loads(f.read())
+    
+    def loads(self, text):
+        # 超出64位的整数、NaN等ujson不支持的写法回退到标准库解析
+        try:
+            return ujson.loads(text)
+        except ValueError:
+            return json.loads(text)
+    
+    def dumps(self, data, pretty=True):
+        # ujson默认把 / 转义为 \/，与标准库不一致
+        try:
+            return ujson.dumps(data, indent=2 if pretty else 0, ensure_ascii=False,
+                               escape_forward_slashes=False)
+        except (TypeError, ValueError, OverflowError):
+            # 非字符串键、超过64位的整数、NaN等ujson不支持的数据回退到标准库
+            return super().dumps(data, pretty)
+    
+    def dump(self, data, f):
+        f.write(self.dumps(data))
+
+
+class PyYamlCodec:
+    """纯Python实现的PyYAML后端"""
+    
+    name = 'pyyaml'
+    format = 'yaml'
+    
+    @staticmethod
+    def available():
+        return True
+    
+    def load(self, f):
+        return yaml.safe_load(f)
+    
+    def dump(self, data, f):
+        yaml.dump(data, f, default_flow_style=False,
+                  allow_unicode=True, sort_keys=False)
+
+
+class LibYamlCodec(PyYamlCodec):
+    """基于libyaml的PyYAML C扩展后端"""
+    
+    name = 'libyaml'
+    
+    @staticmethod
+    def available():
+        return hasattr(yaml, 'CSafeLoader') and hasattr(yaml, 'CSafeDumper')
+    
+    def load(self, f):
+        return yaml.load(f, Loader=yaml.CSafeLoader)
+    
+    def dump(self, data, f):
+        yaml.dump(data, f, Dumper=yaml.CSafeDumper, default_flow_style=False,
+                  allow_unicode=True, sort_keys=False)
+
+
+# 各格式的后端，按优先级从快到慢排列
+CODEC_REGISTRY = {
+    'json': (OrjsonCodec, UjsonCodec, JsonCodec),
+    'yaml': (LibYamlCodec, PyYamlCodec),
+}
+
+
+def resolve_codecs(names=None):
+    """
+    为每种格式选择编解码后端
+    
+    Args:
+        names: 指定的后端名称列表（如 ['ujson', 'pyyaml']），未指定的格式自动选择最快的可用后端
+    
+    Returns:
+        {格式: 后端实例}
+    
+    Raises:
+        ValueError: 后端名称未知或当前环境不可用
+    """
+    chosen = {}
+    for name in names or []:
+        for codec_format, backends in CODEC_REGISTRY.items():
+            codec_cls = next((b for b in backends if b.name == name), None)
+            if codec_cls is not None:
+                break
+        else:
+            known = ', '.join(b.name for backends in CODEC_REGISTRY.values() for b in backends)
+            raise ValueError(f"未知的编解码后端: {name}（可选: {known}）")
+        if not codec_cls.available():
+            raise ValueError(f"编解码后端不可用（未安装）: {name}")
+        chosen[codec_format] = codec_cls()
+    
+    for codec_format, backends in CODEC_REGISTRY.items():
+        if codec_format not in chosen:
+            chosen[codec_format] = next(b for b in backends if b.available())()
+    return chosen
+
+
+def parse_codec_option(value):
+    """解析 --codec 参数（逗号分隔的后端名称）"""
+    if not value:
+        return None
+    return [name.strip().lower() for name in value.split(',') if name.strip()]
+
+
+def flatten_record(record, parent_key='', sep='.'):
+    """
+    将嵌套字典展开为单层字典，嵌套键以点号连接
+    
+    例如 {"a": {"b": 1}} -> {"a.b": 1}
+    """
+    items = {}
+    for key, value in record.items():
+        new_key = f"{parent_key}{sep}{key}" if parent_key else str(key)
+        if isinstance(value, dict) and value:
+            items.update(flatten_record(value, new_key, sep))
+        else:
+            items[new_key] = value
+    return items
+
+
+def csv_record(record, number):
+    """校验并展开一条要写入CSV的记录（number为从1开始的记录序号）"""
+    if not isinstance(record, dict):
+        raise TypeError(f"第 {number} 条记录不是键值对象（{type(record).__name__}），"
+                        f"无法按列写出CSV")
+    return flatten_record(record)
+
+
+def infer_value_type(value):
+    """
+    推断单个值的列类型，None返回None（不参与推断）
+    
+    只区分影响CSV输出的类型：整数与浮点数混合的列统一按浮点数写出，
+    布尔值按文本处理（不与整数合并为数值列）
+    """
+    if value is None:
+        return None
+    if isinstance(value, int) and not isinstance(value, bool):
+        return 'int'
+    if isinstance(value, float):
+        return 'float'
+    return 'str'
+
+
+def merge_types(current, new):
+    """合并两个列类型：int与float合并为float，其余冲突退化为str"""
+    if current is None:
+        return new
+    if new is None or current == new:
+        return current
+    if {current, new} == {'int', 'float'}:
+        return 'float'
+    return 'str'
+
+
+def _format_str(value):
+    if value is None:
+        return ''
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+    return str(value)
+
+
+def _format_float(value):
+    if value is None:
+        return ''
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return repr(float(value))
+    return _format_str(value)
+
+
+# 按列类型选择格式化函数：只有浮点列需要统一格式，其余按原值写出
+_FORMATTERS = {
+    'int': _format_str,
+    'float': _format_float,
+    'str': _format_str,
+    None: _format_str,
+}
+
+
+class CsvSchema:
+    """CSV列结构推断：字段并集、嵌套展开、需要统一按浮点数写出的列"""
+    
+    def __init__(self):
+        self.columns = []
+        self.types = {}
+    
+    def update(self, record):
+        """用一条（已展开的）记录更新列结构"""
+        types = self.types
+        for key, value in record.items():
+            value_type = infer_value_type(value)
+            if key not in types:
+                self.columns.append(key)
+                types[key] = value_type
+            elif types[key] != value_type:
+                types[key] = merge_types(types[key], value_type)
+    
+    def summary(self):
+        """返回列类型统计（整数与浮点数混合、统一按浮点数写出的列数）"""
+        float_columns = sum(1 for column in self.columns if self.types[column] == 'float')
+        return f"其中 {float_columns} 列按浮点数写出"
+
+
+class RowBuilder:
+    """
+    预分配的CSV行构建器
+    
+    列索引和格式化函数在构造时一次性确定，每条记录只做一次字典遍历，
+    行列表复用同一块内存，避免DictWriter逐行构建字典的开销
+    """
+    
+    def __init__(self, schema):
+        self.columns = list(schema.columns)
+        self.index = {column: i for i, column in enumerate(self.columns)}
+        self.formatters = [_FORMATTERS[schema.types[column]] for column in self.columns]
+        self.empty = [''] * len(self.columns)
+        self.row = list(self.empty)
+        self.dropped_keys = set()
+    
+    def build(self, record):
+        """将记录填入预分配行并返回（返回值在下次调用时被覆盖）"""
+        row = self.row
+        row[:] = self.empty
+        index = self.index
+        formatters = self.formatters
+        for key, value in record.items():
+            i = index.get(key)
+            if i is None:
+                self.dropped_keys.add(key)
+                continue
+            row[i] = formatters[i](value)
+        return row
+
+
+def iter_json_array(path, chunk_size=JSON_CHUNK_SIZE):
+    """
+    流式读取顶层为数组的JSON文件，逐个返回数组元素
+    
+    内存占用只与单个元素和块大小有关，与文件总大小无关
+    """
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        buf = f.read(chunk_size)
+        eof = not buf
+        pos = 0
+        
+        def skip(chars):
+            nonlocal buf, pos, eof
+            while True:
+                while pos < len(buf) and buf[pos] in chars:
+                    pos += 1
+                if pos < len(buf) or eof:
+                    return
+                buf = f.read(chunk_size)
+                pos = 0
+                eof = not buf
+        
+        skip(' \t\r\n\ufeff')
+        if pos >= len(buf) or buf[pos] != '[':
+            raise ValueError("JSON顶层不是数组，无法流式读取")
+        pos += 1
+        
+        while True:
+            skip(' \t\r\n,')
+            if pos >= len(buf):
+                raise ValueError("JSON数组未正常结束")
+            if buf[pos] == ']':
+                return
+            
+            while True:
+                try:
+                    item, end = decoder.raw_decode(buf, pos)
+                    # 数字等无结束符的值可能被块边界截断，需要读入更多数据确认
+                    if end < len(buf) or eof:
+                        break
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                more = f.read(chunk_size)
+                eof = not more
+                buf = buf[pos:] + more
+                pos = 0
+            
+            yield item
+            pos = end
+            # 丢弃已解析部分，保持缓冲区大小有界
+            if pos > chunk_size:
+                buf = buf[pos:]
+                pos = 0
+
+
+def iter_ndjson(path, codec):
+    """流式读取NDJSON文件，每行一条记录（跳过空行）"""
+    loads = codec.loads
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                yield loads(line)
+            except ValueError as e:
+                raise ValueError(f"NDJSON第 {line_number} 行解析失败: {str(e)}")
+
+
+def require_msgpack():
+    """检查msgpack是否已安装"""
+    if msgpack is None:
+        raise RuntimeError("MessagePack格式需要安装msgpack: pip install msgpack")
+
+
+def iter_msgpack(path):
+    """流式读取MessagePack文件（多个对象顺序拼接，每个对象一条记录）"""
+    require_msgpack()
+    with open(path, 'rb') as f:
+        yield from msgpack.Unpacker(f, raw=False, strict_map_key=False)
+
+
+def is_json_array(path):
+    """判断JSON文件顶层是否为数组（只读取开头若干字符）"""
+    with open(path, 'r', encoding='utf-8') as f:
+        while True:
+            ch = f.read(1)
+            if not ch:
+                return False
+            if ch not in ' \t\r\n\ufeff':
+                return ch == '['
+
+
+def normalize_format(name):
+    """格式名称小写并处理别名（yml -> yaml, jsonl -> ndjson）"""
+    name = name.lower()
+    return FORMAT_ALIASES.get(name, name)
+
 
 class DataConverter:
     """数据格式转换器"""
     
-    def __init__(self, input_file, output_file, input_format=None, output_format=None):
+    def __init__(self, input_file, output_file, input_format=None, output_format=None,
+                 sample_size=DEFAULT_SAMPLE_SIZE, scan_all=False, codecs=None):
         self.input_file = Path(input_file)
         self.output_file = Path(output_file)
+        # 实际写入的路径；convert() 期间为临时文件，成功后才替换为 output_file
+        self.write_path = self.output_file
         
         # 自动检测格式
-        self.input_format = input_format or self.input_file.suffix[1:].lower()
-        self.output_format = output_format or self.output_file.suffix[1:].lower()
+        self.input_format = normalize_format(input_format or self.input_file.suffix[1:])
+        self.output_format = normalize_format(output_format or self.output_file.suffix[1:])
+        
+        # CSV列推断参数：采样记录数，或预扫描全部记录
+        self.sample_size = sample_size
+        self.scan_all = scan_all
+        
+        # 编解码后端，未指定时自动选择最快的可用后端
+        self.codecs = resolve_codecs(codecs)
         
         self.data = None
     
     def load_data(self):
         """加载数据"""
         print(f"[INFO] 加载 {self.input_format.upper()} 文件: {self.input_file}")
+        codec_format = 'json' if self.input_format == 'ndjson' else self.input_format
+        if codec_format in self.codecs:
+            print(f"[INFO] 使用解码后端: {self.codecs[codec_format].name}")
         
         try:
-            if self.input_format == 'json':
-                with open(self.input_file, 'r', encoding='utf-8') as f:
-                    self.data = json.load(f)
+            with profiler.stage('read+parse'):
+                if self.input_format == 'json':
+                    with open(self.input_file, 'r', encoding='utf-8') as f:
+                        self.data = self.codecs['json'].load(f)
             
-            elif self.input_format == 'csv':
-                with open(self.input_file, 'r', encoding='utf-8') as f:
-                    reader = csv.DictReader(f)
-                    self.data = list(reader)
+                elif self.input_format == 'csv':
+                    with open(self.input_file, 'r', encoding='utf-8') as f:
+                        reader = csv.DictReader(f)
+                        self.data = list(reader)
             
-            elif self.input_format in ['yaml', 'yml']:
-                with open(self.input_file, 'r', encoding='utf-8') as f:
-                    self.data = yaml.safe_load(f)
+                elif self.input_format == 'yaml':
+                    with open(self.input_file, 'r', encoding='utf-8') as f:
+                        self.data = self.codecs['yaml'].load(f)
             
-            else:
-                print(f"[ERROR] 不支持的输入格式: {self.input_format}")
-                print("支持的格式: json, csv, yaml, yml")
-                return False
+                elif self.input_format in ['ndjson', 'msgpack']:
+                    self.data = list(self.iter_records())
             
+                else:
+                    print(f"[ERROR] 不支持的输入格式: {self.input_format}")
+                    print("支持的格式: " + ", ".join(SUPPORTED_FORMATS))
+                    return False
+            
+            if isinstance(self.data, list):
+                profiler.count('records_read', len(self.data))
             print(f"[INFO] 成功加载数据")
             
             # 显示数据概览
@@ -82,80 +597,592 @@ class DataConverter:
             # 确保输出目录存在
             self.output_file.parent.mkdir(parents=True, exist_ok=True)
             
-            if self.output_format == 'json':
-                with open(self.output_file, 'w', encoding='utf-8') as f:
-                    json.dump(self.data, f, indent=2, ensure_ascii=False)
+            with profiler.stage('write'):
+                if self.output_format == 'json':
+                    with open(self.write_path, 'w', encoding='utf-8') as f:
+                        self.codecs['json'].dump(self.data, f)
             
-            elif self.output_format == 'csv':
-                # 如果数据是字典列表
-                if isinstance(self.data, list) and self.data:
-                    with open(self.output_file, 'w', newline='', encoding='utf-8-sig') as f:
+                elif self.output_format == 'csv':
+                    # 如果数据是字典列表
+                    if isinstance(self.data, list) and self.data:
                         if isinstance(self.data[0], dict):
-                            fieldnames = self.data[0].keys()
-                            writer = csv.DictWriter(f, fieldnames=fieldnames)
-                            writer.writeheader()
-                            writer.writerows(self.data)
+                            self.write_csv(lambda: iter(self.data))
+                        elif all(isinstance(row, (list, tuple)) for row in self.data):
+                            # 二维数组按行写出
+                            with open(self.write_path, 'w', newline='', encoding='utf-8-sig') as f:
+                                writer = csv.writer(f)
+                                writer.writerows(self.data)
                         else:
-                            writer = csv.writer(f)
-                            writer.writerows(self.data)
+                            print("[ERROR] CSV格式要求数据为对象列表或二维数组，"
+                                  f"当前首个元素为 {type(self.data[0]).__name__}")
+                            return False
+                    else:
+                        print("[ERROR] CSV格式要求数据为非空列表格式")
+                        return False
+            
+                elif self.output_format == 'yaml':
+                    with open(self.write_path, 'w', encoding='utf-8') as f:
+                        self.codecs['yaml'].dump(self.data, f)
+            
+                elif self.output_format in ['ndjson', 'msgpack']:
+                    # 列表逐条写出，其他数据作为单条记录写出
+                    records = self.data if isinstance(self.data, list) else [self.data]
+                    self.write_records(iter(records))
+            
                 else:
-                    print("[ERROR] CSV格式要求数据为非空列表格式")
+                    print(f"[ERROR] 不支持的输出格式: {self.output_format}")
+                    print("支持的格式: " + ", ".join(SUPPORTED_FORMATS))
                     return False
             
-            elif self.output_format in ['yaml', 'yml']:
-                with open(self.output_file, 'w', encoding='utf-8') as f:
-                    yaml.dump(self.data, f, default_flow_style=False, 
-                             allow_unicode=True, sort_keys=False)
-            
+            print(f"[INFO] 转换成功！")
+            return True
+        
+        except Exception as e:
+            print(f"[ERROR] 保存失败: {str(e)}")
+            return False
+    
+    def infer_schema(self, records, limit=None):
+        """
+        从记录迭代器推断CSV列结构
+        
+        Args:
+            records: 记录迭代器
+            limit: 最多采样的记录数，None表示扫描全部
+        
+        Returns:
+            (schema, sampled): 列结构和已展开的采样记录列表（limit为None时为空）
+        """
+        schema = CsvSchema()
+        sampled = []
+        for number, record in enumerate(records, 1):
+            flat = csv_record(record, number)
+            schema.update(flat)
+            if limit is not None:
+                sampled.append(flat)
+                if len(sampled) >= limit:
+                    break
+        return schema, sampled
+    
+    def write_csv(self, open_records):
+        """
+        按推断的列结构写出CSV
+        
+        Args:
+            open_records: 无参函数，每次调用返回一个新的记录迭代器；
+                          全量扫描模式下会调用两次（预扫描 + 写出）
+        
+        Returns:
+            写出的记录数
+        """
+        with profiler.stage('schema'):
+            if self.scan_all:
+                print("[INFO] 预扫描全部记录推断列结构...")
+                schema, sampled = self.infer_schema(open_records())
+                records = open_records()
             else:
-                print(f"[ERROR] 不支持的输出格式: {self.output_format}")
-                print("支持的格式: json, csv, yaml, yml")
+                records = open_records()
+                schema, sampled = self.infer_schema(records, self.sample_size)
+        
+        print(f"[INFO] 推断出 {len(schema.columns)} 列 ({schema.summary()})")
+        
+        builder = RowBuilder(schema)
+        count = 0
+        # 流式转换时记录在写出过程中逐条读取解析，耗时一并计入写出阶段
+        with profiler.stage('write'), open(self.write_path, 'w', newline='', encoding='utf-8-sig') as f:
+            writer = csv.writer(f)
+            writer.writerow(builder.columns)
+            build = builder.build
+            writerow = writer.writerow
+            
+            # 先写出采样阶段缓存的记录，再继续消费剩余记录
+            for flat in sampled:
+                writerow(build(flat))
+                count += 1
+            for record in records:
+                count += 1
+                writerow(build(csv_record(record, count)))
+        profiler.count('records_written', count)
+        
+        if builder.dropped_keys:
+            print(f"[WARN] {len(builder.dropped_keys)} 个字段未出现在前 {self.sample_size} "
+                  f"条采样记录中，已忽略（可使用 --scan-all 预扫描全部记录）")
+        
+        return count
+    
+    def write_records(self, records):
+        """
+        逐条写出记录（JSON数组、NDJSON、MessagePack），不要求数据全部在内存中
+        
+        Returns:
+            写出的记录数
+        """
+        count = 0
+        if self.output_format == 'msgpack':
+            require_msgpack()
+            packer = msgpack.Packer(use_bin_type=True)
+            with open(self.write_path, 'wb') as f:
+                for record in records:
+                    f.write(packer.pack(record))
+                    count += 1
+            return count
+        
+        dumps = self.codecs['json'].dumps
+        with open(self.write_path, 'w', encoding='utf-8') as f:
+            if self.output_format == 'ndjson':
+                for record in records:
+                    f.write(dumps(record, pretty=False))
+                    f.write('\n')
+                    count += 1
+                return count
+            
+            # JSON数组：逐个元素缩进写出，结果与整体 dump(indent=2) 一致
+            for record in records:
+                f.write('[\n  ' if count == 0 else ',\n  ')
+                f.write(dumps(record).replace('\n', '\n  '))
+                count += 1
+            f.write('\n]' if count else '[]')
+        return count
+    
+    def iter_records(self):
+        """流式返回输入文件中的记录（JSON数组、CSV、NDJSON、MessagePack）"""
+        if self.input_format == 'json':
+            return iter_json_array(self.input_file)
+        if self.input_format == 'csv':
+            return self._iter_csv_records()
+        if self.input_format == 'ndjson':
+            return iter_ndjson(self.input_file, self.codecs['json'])
+        if self.input_format == 'msgpack':
+            return iter_msgpack(self.input_file)
+        raise ValueError(f"不支持流式读取的输入格式: {self.input_format}")
+    
+    def _iter_csv_records(self):
+        with open(self.input_file, 'r', encoding='utf-8') as f:
+            yield from csv.DictReader(f)
+    
+    def can_stream(self):
+        """判断是否可以走流式转换（不把全部数据载入内存）"""
+        if self.output_format not in STREAM_OUTPUT_FORMATS:
+            return False
+        if self.input_format not in STREAM_INPUT_FORMATS:
+            return False
+        if self.input_format == 'json':
+            # JSON -> JSON 直接整体读写更快；顶层不是数组的JSON无法逐条读取
+            if self.output_format == 'json':
+                return False
+            try:
+                return is_json_array(self.input_file)
+            except (OSError, UnicodeDecodeError):
                 return False
+        return True
+    
+    def stream_convert(self):
+        """流式转换，单次遍历、内存有界"""
+        print(f"[INFO] 流式转换 {self.input_format.upper()} -> {self.output_format.upper()}: "
+              f"{self.input_file} -> {self.output_file}")
+        
+        try:
+            self.output_file.parent.mkdir(parents=True, exist_ok=True)
+            
+            if self.output_format == 'csv':
+                # 首条记录不是字典（如二维数组）时回退到普通转换
+                first = next(iter(self.iter_records()), None)
+                if first is None:
+                    print("[ERROR] CSV格式要求数据为非空列表格式")
+                    return False
+                if not isinstance(first, dict):
+                    return self.load_data() and self.save_data()
+                count = self.write_csv(self.iter_records)
+            else:
+                with profiler.stage('write'):
+                    count = self.write_records(self.iter_records())
+                profiler.count('records_written', count)
             
+            print(f"[INFO] 共写出 {count} 条记录")
             print(f"[INFO] 转换成功！")
             return True
         
+        except FileNotFoundError:
+            print(f"[ERROR] 文件不存在: {self.input_file}")
+            return False
+        except (json.JSONDecodeError, ValueError) as e:
+            print(f"[ERROR] 解析失败: {str(e)}")
+            return False
         except Exception as e:
-            print(f"[ERROR] 保存失败: {str(e)}")
+            print(f"[ERROR] 转换失败: {str(e)}")
             return False
     
     def convert(self):
-        """执行转换"""
-        if self.load_data():
-            return self.save_data()
+        """
+        执行转换
+        
+        先写入 <输出文件>.tmp，成功后再替换输出文件；
+        中途失败时删除临时文件，不会留下不完整的输出（也不会覆盖已有的输出）
+        """
+        self.write_path = self.output_file.with_name(self.output_file.name + '.tmp')
+        try:
+            if self.can_stream():
+                ok = self.stream_convert()
+            else:
+                ok = self.load_data() and self.save_data()
+            if ok:
+                os.replace(self.write_path, self.output_file)
+            return ok
+        finally:
+            if self.write_path.exists():
+                self.write_path.unlink()
+            self.write_path = self.output_file
+
+
+def file_sha1(path, chunk_size=JSON_CHUNK_SIZE):
+    """计算文件SHA1"""
+    sha1 = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+def _batch_convert_one(task):
+    """
+    批量转换的工作进程函数（模块级函数，便于进程池序列化）
+    
+    Args:
+        task: (输入路径, 输出路径, 输出格式, 已记录的输入哈希或None, 转换参数字典)
+    
+    Returns:
+        (输入路径, 状态, 输入字节数, 输入哈希, 错误信息)，状态为 ok/skipped/failed
+    """
+    input_path, output_path, output_format, known_hash, options = task
+    try:
+        size = os.path.getsize(input_path)
+        digest = None
+        if known_hash is not None:
+            digest = file_sha1(input_path)
+            if digest == known_hash and os.path.exists(output_path):
+                return input_path, 'skipped', size, digest, ''
+        
+        # 工作进程内屏蔽单文件转换日志，只保留错误信息用于汇总
+        log = io.StringIO()
+        with contextlib.redirect_stdout(log):
+            converter = DataConverter(input_path, output_path,
+                                      output_format=output_format, **options)
+            ok = converter.convert()
+        if ok:
+            return input_path, 'ok', size, digest, ''
+        
+        errors = [line for line in log.getvalue().splitlines() if line.startswith('[ERROR]')]
+        return input_path, 'failed', size, digest, errors[-1] if errors else '转换失败'
+    except Exception as e:
+        return input_path, 'failed', 0, None, f"[ERROR] {str(e)}"
+
+
+class BatchConverter:
+    """目录批量转换器：进程池并发转换，跳过已是最新的输出"""
+    
+    def __init__(self, input_dir, output_dir, output_format, pattern='**/*',
+                 workers=None, check='mtime', force=False, options=None):
+        self.input_dir = Path(input_dir)
+        self.output_dir = Path(output_dir)
+        self.output_format = output_format.lower()
+        self.pattern = pattern
+        self.workers = workers or os.cpu_count() or 1
+        self.check = check
+        self.force = force
+        self.options = options or {}
+        
+        self.manifest_file = self.output_dir / BATCH_MANIFEST_NAME
+        self.manifest = {}
+        self.failures = []
+    
+    def collect_inputs(self):
+        """收集待转换的输入文件（跳过已是目标格式的文件）"""
+        target = normalize_format(self.output_format)
+        inputs = []
+        for path in sorted(self.input_dir.glob(self.pattern)):
+            suffix = path.suffix[1:].lower()
+            if not path.is_file() or suffix not in SUPPORTED_FORMATS:
+                continue
+            if normalize_format(suffix) == target:
+                continue
+            inputs.append(path)
+        return inputs
+    
+    def output_path_for(self, input_path):
+        """输出路径：保持相对目录结构，替换后缀"""
+        relative = input_path.relative_to(self.input_dir)
+        return self.output_dir / relative.with_suffix('.' + self.output_format)
+    
+    def is_up_to_date(self, key, input_path, output_path):
+        """
+        mtime模式：上次转换成功（清单中记录的输入mtime与当前一致）且输出文件存在、不早于输入文件
+        """
+        try:
+            input_mtime = input_path.stat().st_mtime
+            return (self.manifest.get(key) == input_mtime
+                    and output_path.stat().st_mtime >= input_mtime)
+        except FileNotFoundError:
+            return False
+    
+    def load_manifest(self):
+        if not self.manifest_file.exists():
+            return
+        try:
+            with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                self.manifest = json.load(f)
+        except Exception as e:
+            print(f"[WARN] 读取清单文件失败，将全部重新转换: {str(e)}")
+            self.manifest = {}
+    
+    def save_manifest(self):
+        with open(self.manifest_file, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, indent=2, ensure_ascii=False)
+    
+    def run(self):
+        """执行批量转换"""
+        if not self.input_dir.is_dir():
+            print(f"[ERROR] 输入目录不存在: {self.input_dir}")
+            return False
+        
+        inputs = self.collect_inputs()
+        print(f"[INFO] 共找到 {len(inputs)} 个待转换文件: {self.input_dir}/{self.pattern}")
+        
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.load_manifest()
+        
+        tasks = []
+        skipped = 0
+        input_mtimes = {}
+        for input_path in inputs:
+            output_path = self.output_path_for(input_path)
+            key = str(input_path.relative_to(self.input_dir))
+            known_hash = None
+            if not self.force:
+                if self.check == 'mtime' and self.is_up_to_date(key, input_path, output_path):
+                    skipped += 1
+                    continue
+                if self.check == 'hash':
+                    known_hash = self.manifest.get(key, '')
+            elif self.check == 'hash':
+                known_hash = ''
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            # 转换前记录输入mtime，转换期间输入被修改时下次会重新转换
+            input_mtimes[key] = input_path.stat().st_mtime
+            tasks.append((str(input_path), str(output_path), self.output_format,
+                          known_hash, self.options))
+        
+        print(f"[INFO] 提交 {len(tasks)} 个，已是最新跳过 {skipped} 个，"
+              f"进程数 {self.workers}")
+        
+        converted = 0
+        total_bytes = 0
+        start = time.perf_counter()
+        
+        # 小文件数量多时按块分发，减少进程间通信次数
+        chunksize = max(1, len(tasks) // (self.workers * 4))
+        with profiler.stage('convert'), ProcessPoolExecutor(max_workers=self.workers) as executor:
+            for input_path, status, size, digest, error in executor.map(
+                    _batch_convert_one, tasks, chunksize=chunksize):
+                key = str(Path(input_path).relative_to(self.input_dir))
+                if status == 'failed':
+                    self.failures.append((input_path, error))
+                    self.manifest.pop(key, None)
+                    continue
+                # 清单记录转换成功的文件：hash模式为输入哈希，mtime模式为输入mtime
+                if digest is not None:
+                    self.manifest[key] = digest
+                elif self.check == 'mtime':
+                    self.manifest[key] = input_mtimes[key]
+                if status == 'skipped':
+                    skipped += 1
+                else:
+                    converted += 1
+                    total_bytes += size
+        
+        elapsed = time.perf_counter() - start
+        profiler.count('files_converted', converted)
+        profiler.count('files_skipped', skipped)
+        profiler.count('bytes_converted', total_bytes)
+        with profiler.stage('write'):
+            self.save_manifest()
+        self.print_summary(converted, skipped, total_bytes, elapsed)
+        return not self.failures
+    
+    def print_summary(self, converted, skipped, total_bytes, elapsed):
+        """输出吞吐量和失败汇总"""
+        rate = converted / elapsed if elapsed > 0 else 0.0
+        mb_rate = total_bytes / 1024 / 1024 / elapsed if elapsed > 0 else 0.0
+        
+        print("\n" + "="*60)
+        print("批量转换汇总")
+        print("="*60)
+        print(f"成功: {converted}  跳过: {skipped}  失败: {len(self.failures)}")
+        print(f"耗时: {elapsed:.2f} 秒")
+        print(f"吞吐量: {rate:.1f} 文件/秒, {mb_rate:.2f} MB/秒")
+        
+        if self.failures:
+            print(f"\n[WARN] {len(self.failures)} 个文件转换失败：")
+            for input_path, error in self.failures:
+                print(f"  {input_path}: {error}")
+        print("="*60)
+
+
+def benchmark_codecs(input_file, input_format=None, repeat=3):
+    """
+    对各格式所有可用后端做读写基准测试，输出相对于纯Python/标准库后端的加速比
+    
+    Args:
+        input_file: 样本数据文件（任一支持的格式）
+        input_format: 输入格式，不指定则按后缀识别
+        repeat: 每项重复次数，取最短耗时
+    """
+    input_format = normalize_format(input_format or Path(input_file).suffix[1:])
+    
+    converter = DataConverter(input_file, input_file, input_format=input_format)
+    with contextlib.redirect_stdout(io.StringIO()):
+        loaded = converter.load_data()
+    if not loaded:
+        print(f"[ERROR] 无法加载样本文件: {input_file}")
         return False
+    data = converter.data
+    
+    def best_time(func):
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            best = min(best, time.perf_counter() - start)
+        return best
+    
+    print(f"[INFO] 样本文件: {input_file}，重复 {repeat} 次取最短耗时\n")
+    print(f"{'格式':<6}{'后端':<10}{'读取(秒)':>12}{'写出(秒)':>12}{'读取加速':>10}{'写出加速':>10}")
+    
+    for codec_format, backends in CODEC_REGISTRY.items():
+        # 先用基准后端（列表最后一个）序列化一次，作为各后端的读取输入
+        baseline_codec = backends[-1]()
+        buf = io.StringIO()
+        baseline_codec.dump(data, buf)
+        text = buf.getvalue()
+        
+        results = []
+        for codec_cls in backends:
+            if not codec_cls.available():
+                results.append((codec_cls.name, None, None))
+                continue
+            codec = codec_cls()
+            load_time = best_time(lambda: codec.load(io.StringIO(text)))
+            dump_time = best_time(lambda: codec.dump(data, io.StringIO()))
+            results.append((codec.name, load_time, dump_time))
+        
+        base_load, base_dump = results[-1][1], results[-1][2]
+        for name, load_time, dump_time in results:
+            if load_time is None:
+                print(f"{codec_format:<6}{name:<10}{'未安装':>12}")
+                continue
+            load_speedup = base_load / load_time if load_time > 0 else 0.0
+            dump_speedup = base_dump / dump_time if dump_time > 0 else 0.0
+            print(f"{codec_format:<6}{name:<10}{load_time:>12.4f}{dump_time:>12.4f}"
+                  f"{load_speedup:>9.1f}x{dump_speedup:>9.1f}x")
+    return True
 
 
 def main():
     parser = argparse.ArgumentParser(
-        description='数据格式转换工具 - 支持 JSON、CSV、YAML 互转',
-        epilog='示例: python data_converter.py -i data.json -o data.csv'
+        description='数据格式转换工具 - 支持 JSON、CSV、YAML、NDJSON、MessagePack 互转',
+        epilog='示例: python data_converter.py -i data.json -o data.csv\n'
+               '      python data_converter.py --input-dir tiles/ --output-dir out/ --to csv',
+        formatter_class=argparse.RawDescriptionHelpFormatter
     )
-    parser.add_argument('-i', '--input', required=True, help='输入文件路径')
-    parser.add_argument('-o', '--output', required=True, help='输出文件路径')
+    parser.add_argument('-i', '--input', help='输入文件路径')
+    parser.add_argument('-o', '--output', help='输出文件路径')
     parser.add_argument('--if', dest='input_format', 
-                       help='输入格式 (json/csv/yaml)，不指定则自动检测')
+                       help='输入格式 (json/csv/yaml/ndjson/msgpack)，不指定则自动检测')
     parser.add_argument('--of', dest='output_format', 
-                       help='输出格式 (json/csv/yaml)，不指定则自动检测')
+                       help='输出格式 (json/csv/yaml/ndjson/msgpack)，不指定则自动检测')
+    parser.add_argument('--sample-size', type=int, default=DEFAULT_SAMPLE_SIZE,
+                       help=f'输出CSV时用于推断列结构的采样记录数，默认{DEFAULT_SAMPLE_SIZE}')
+    parser.add_argument('--scan-all', action='store_true',
+                       help='输出CSV时预扫描全部记录推断列结构（多一次读取，保证不丢字段）')
+    parser.add_argument('--codec',
+                       help='指定编解码后端，逗号分隔（json: orjson/ujson/json，'
+                            'yaml: libyaml/pyyaml），默认自动选择最快的可用后端')
+    parser.add_argument('--benchmark', action='store_true',
+                       help='以 -i 指定的文件为样本，对比各编解码后端的读写速度')
+    
+    # 批量转换参数
+    batch = parser.add_argument_group('批量转换')
+    batch.add_argument('--input-dir', help='批量转换的输入目录')
+    batch.add_argument('--output-dir', help='批量转换的输出目录（保持相对目录结构）')
+    batch.add_argument('--to', dest='target_format', choices=SUPPORTED_FORMATS,
+                       help='批量转换的目标格式')
+    batch.add_argument('--pattern', default='**/*',
+                       help='输入文件匹配模式（相对输入目录的glob），默认 **/*')
+    batch.add_argument('-j', '--jobs', type=int, default=None,
+                       help='并发进程数，默认CPU核数')
+    batch.add_argument('--check', choices=['mtime', 'hash'], default='mtime',
+                       help='判断输出是否最新的方式：mtime（默认）或 hash（输入内容哈希）')
+    batch.add_argument('--force', action='store_true', help='忽略最新检查，全部重新转换')
+    add_profile_arguments(parser)
     
     args = parser.parse_args()
     
+    if args.jobs is not None and args.jobs < 1:
+        parser.error('并发进程数 -j/--jobs 必须大于0')
+    
+    try:
+        codecs = parse_codec_option(args.codec)
+        resolve_codecs(codecs)
+    except ValueError as e:
+        parser.error(str(e))
+    
+    if args.benchmark:
+        if not args.input:
+            parser.error('--benchmark 需要用 -i 指定样本文件')
+        benchmark_codecs(args.input, args.input_format)
+        return
+    
+    if args.input_dir:
+        if not args.output_dir or not args.target_format:
+            parser.error('批量转换需要同时指定 --output-dir 和 --to')
+    elif not args.input or not args.output:
+        parser.error('需要指定 -i/-o，或使用 --input-dir 批量转换')
+    
     print("="*60)
     print("数据格式转换工具 v1.0")
     print("="*60)
     
-    converter = DataConverter(
-        args.input, 
-        args.output,
-        args.input_format,
-        args.output_format
-    )
-    
-    if converter.convert():
-        print("\n[SUCCESS] 任务完成！")
-    else:
-        print("\n[FAILED] 任务失败！")
-
+    with profile_session(args):
+        if args.input_dir:
+            batch_converter = BatchConverter(
+                args.input_dir,
+                args.output_dir,
+                args.target_format,
+                pattern=args.pattern,
+                workers=args.jobs,
+                check=args.check,
+                force=args.force,
+                options={'sample_size': args.sample_size, 'scan_all': args.scan_all,
+                         'codecs': codecs}
+            )
+            if batch_converter.run():
+                print("\n[SUCCESS] 任务完成！")
+            else:
+                print("\n[FAILED] 部分文件转换失败！")
+            return
+        
+        converter = DataConverter(
+            args.input, 
+            args.output,
+            args.input_format,
+            args.output_format,
+            sample_size=args.sample_size,
+            scan_all=args.scan_all,
+            codecs=codecs
+        )
+        
+        if converter.convert():
+            print("\n[SUCCESS] 任务完成！")
+        else:
+            print("\n[FAILED] 任务失败！")
 
 if __name__ == '__main__':
     main()
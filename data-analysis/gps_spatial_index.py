@@ -0,0 +1,528 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+GPS轨迹空间索引工具
+功能：为车辆日志中的GPS坐标建立网格索引，快速查询"哪些路测、哪些时刻经过某点/某区域附近"
+作者：何枭雄
+日期：2025-01-15
+
+索引方式：
+- 按固定经纬度间隔（默认0.0005度，约55米）将坐标划分为网格，每个GPS点按网格编号排序存储
+- 每个点记录所在日志的行号、字节偏移、行长度、时间戳和经纬度，查询结果可直接定位到原始日志
+- 每个日志一个索引文件（<日志>.gidx），多个索引可合并为车队索引，合并时只拼接不重排
+
+使用方法：
+    python gps_spatial_index.py build -i drive1.log drive2.log -j 4
+    python gps_spatial_index.py merge -i drive1.log.gidx drive2.log.gidx -o fleet.gidx
+    python gps_spatial_index.py query -x fleet.gidx --point 31.2304,121.4737 --radius 50
+    python gps_spatial_index.py query -x fleet.gidx --polygon "31.23,121.47;31.24,121.47;31.24,121.48" --ranges
+"""
+
+import os
+import sys
+import json
+import math
+import mmap
+import time
+import struct
+import bisect
+import argparse
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'common'))
+from log_parser import TIMESTAMP_PATTERN, GPS_PATTERN, TimestampCache, format_ms
+from profiling import profiler, add_profile_arguments, profile_session
+
+
+MAGIC = b'GRIDIDX1'
+INDEX_VERSION = 1
+INDEX_SUFFIX = '.gidx'
+DEFAULT_CELL_SIZE = 0.0005      # 网格大小（度），纬度方向约55米
+DEFAULT_RADIUS = 50.0           # 默认查询半径（米）
+DEFAULT_RANGE_GAP = 4096        # 输出字节范围时，间隔不超过该字节数的匹配点合并为一段
+EARTH_RADIUS = 6371008.8        # 地球平均半径（米）
+METERS_PER_DEGREE = EARTH_RADIUS * math.pi / 180
+
+# 每个数据块（一个日志）的数组：(名称, 类型码)，按网格编号排序
+BLOCK_ARRAYS = (
+    ('cell_keys', 'q'),      # 去重后的网格编号（升序）
+    ('cell_starts', 'q'),    # 每个网格的第一个点在点数组中的位置（最后一项为点数）
+    ('lat', 'd'),
+    ('lon', 'd'),
+    ('time_ms', 'q'),        # 本地时间毫秒时间戳（与日志时间一致）
+    ('offset', 'q'),         # 行起始字节偏移
+    ('length', 'q'),         # 行字节长度（含换行符）
+    ('line', 'q'),           # 行号（从1开始）
+)
+
+
+def cell_index(value, cell_size):
+    return math.floor(value / cell_size)
+
+
+def cell_key(lat_index, lon_index):
+    """纬度网格号、经度网格号合并为一个可排序的整数（保证为正数且不超过int64）"""
+    return ((lat_index + 0x40000000) << 32) | (lon_index + 0x40000000)
+
+
+def scan_log(log_file):
+    """
+    扫描日志中的GPS点（与 LogParser.parse_log 使用相同的匹配规则）
+
+    返回 {数组名: array}（未排序）
+    """
+    columns = {name: array(code) for name, code in BLOCK_ARRAYS[2:]}
+    lat_append, lon_append = columns['lat'].append, columns['lon'].append
+    time_append, offset_append = columns['time_ms'].append, columns['offset'].append
+    length_append, line_append = columns['length'].append, columns['line'].append
+    to_ms = TimestampCache().to_ms
+
+    offset = 0
+    with open(log_file, 'rb') as f:
+        for line_no, raw in enumerate(f, 1):
+            length = len(raw)
+            line = raw.decode('utf-8', errors='replace')
+            gps_match = GPS_PATTERN.search(line)
+            if gps_match:
+                timestamp_match = TIMESTAMP_PATTERN.search(line)
+                if timestamp_match:
+                    try:
+                        lat, lon = float(gps_match.group(1)), float(gps_match.group(2))
+                    except ValueError:
+                        lat = None
+                    if lat is not None and -90 <= lat <= 90 and -180 <= lon <= 180:
+                        lat_append(lat)
+                        lon_append(lon)
+                        time_append(to_ms(timestamp_match.group(0)))
+                        offset_append(offset)
+                        length_append(length)
+                        line_append(line_no)
+            offset += length
+    return columns
+
+
+def build_block(log_file, cell_size):
+    """扫描一个日志并按网格排序，返回 (块信息, {数组名: array})"""
+    stat = os.stat(log_file)
+    with profiler.stage('read+parse'):
+        columns = scan_log(log_file)
+    lat, lon = columns['lat'], columns['lon']
+    profiler.count('bytes_scanned', stat.st_size)
+    profiler.count('points', len(lat))
+
+    with profiler.stage('transform'):
+        keys = [cell_key(cell_index(a, cell_size), cell_index(o, cell_size)) for a, o in zip(lat, lon)]
+
+        # 同一网格内保持日志顺序（稳定排序）
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        arrays = {name: array(code, (columns[name][i] for i in order)) for name, code in BLOCK_ARRAYS[2:]}
+
+        cell_keys, cell_starts = array('q'), array('q')
+        last = None
+        for position, i in enumerate(order):
+            if keys[i] != last:
+                last = keys[i]
+                cell_keys.append(last)
+                cell_starts.append(position)
+        cell_starts.append(len(order))
+    arrays['cell_keys'] = cell_keys
+    arrays['cell_starts'] = cell_starts
+
+    info = {
+        'source': os.path.abspath(log_file),
+        'size': stat.st_size,
+        'mtime': stat.st_mtime,
+        'points': len(order),
+        'cells': len(cell_keys),
+        'bbox': [min(lat), min(lon), max(lat), max(lon)] if lat else None,
+    }
+    return info, arrays
+
+
+def write_index(index_file, cell_size, blocks):
+    """
+    写出索引文件
+
+    格式：MAGIC + 文件头长度(uint32) + JSON文件头 + 各数据块的数组（8字节对齐）
+    blocks: [(块信息, {数组名: array 或 memoryview}), ...]
+    """
+    header_blocks = []
+    position = 0
+    for info, arrays in blocks:
+        layout = {}
+        for name, code in BLOCK_ARRAYS:
+            nbytes = len(arrays[name]) * 8
+            layout[name] = [position, nbytes]
+            position += nbytes
+        header_blocks.append(dict(info, arrays=layout))
+
+    header = json.dumps({'version': INDEX_VERSION, 'cell_size': cell_size,
+                         'blocks': header_blocks}, ensure_ascii=False).encode('utf-8')
+    header += b' ' * (-(len(MAGIC) + 4 + len(header)) % 8)
+
+    tmp_file = index_file + '.tmp'
+    with open(tmp_file, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<I', len(header)))
+        f.write(header)
+        for _, arrays in blocks:
+            for name, _ in BLOCK_ARRAYS:
+                f.write(arrays[name])
+    os.replace(tmp_file, index_file)
+
+
+class SpatialIndex(object):
+    """
+    只读索引：mmap映射索引文件，数组直接在映射内存上访问，打开和查询都不需要整体读入
+    """
+
+    def __init__(self, index_file):
+        self.index_file = index_file
+        self.file = open(index_file, 'rb')
+        try:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self.file.close()
+            raise ValueError(f"索引文件为空: {index_file}")
+        if self.map[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"不是有效的索引文件: {index_file}")
+        header_size = struct.unpack_from('<I', self.map, len(MAGIC))[0]
+        start = len(MAGIC) + 4
+        header = json.loads(self.map[start:start + header_size].decode('utf-8'))
+        if header.get('version') != INDEX_VERSION:
+            self.close()
+            raise ValueError(f"索引文件版本不支持: {index_file}")
+        self.cell_size = header['cell_size']
+        self.blocks = header['blocks']
+        self.data_start = start + header_size
+        self.view = memoryview(self.map)
+
+    def arrays(self, block):
+        """数据块的全部数组（映射内存上的memoryview）"""
+        result = {}
+        for name, code in BLOCK_ARRAYS:
+            position, nbytes = block['arrays'][name]
+            start = self.data_start + position
+            result[name] = self.view[start:start + nbytes].cast(code)
+        return result
+
+    def close(self):
+        if getattr(self, 'view', None) is not None:
+            self.view.release()
+            self.view = None
+        self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def candidates(self, min_lat, min_lon, max_lat, max_lon):
+        """
+        返回落在范围内网格中的点：[(块序号, 数组, 点位置), ...]
+
+        先按数据块外包框过滤，再对每一行网格在有序网格编号中二分查找
+        """
+        cell = self.cell_size
+        lat_range = range(cell_index(min_lat, cell), cell_index(max_lat, cell) + 1)
+        lon_first, lon_last = cell_index(min_lon, cell), cell_index(max_lon, cell)
+
+        for block_id, block in enumerate(self.blocks):
+            bbox = block.get('bbox')
+            if not bbox or bbox[0] > max_lat or bbox[2] < min_lat or bbox[1] > max_lon or bbox[3] < min_lon:
+                continue
+            arrays = self.arrays(block)
+            cell_keys, cell_starts = arrays['cell_keys'], arrays['cell_starts']
+            for lat_index in lat_range:
+                # 同一纬度行的网格编号连续，二分找到该行经度范围的起止位置
+                first = bisect.bisect_left(cell_keys, cell_key(lat_index, lon_first))
+                last = bisect.bisect_right(cell_keys, cell_key(lat_index, lon_last))
+                if first < last:
+                    for position in range(cell_starts[first], cell_starts[last]):
+                        yield block_id, arrays, position
+
+
+def local_xy(lat, lon, origin_lat, origin_lon):
+    """以origin为原点的局部平面坐标（米），适用于数公里范围"""
+    x = (lon - origin_lon) * METERS_PER_DEGREE * math.cos(math.radians(origin_lat))
+    y = (lat - origin_lat) * METERS_PER_DEGREE
+    return x, y
+
+
+def segment_distance(px, py, ax, ay, bx, by):
+    """点到线段的距离"""
+    dx, dy = bx - ax, by - ay
+    length2 = dx * dx + dy * dy
+    t = 0.0 if length2 == 0 else max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / length2))
+    return math.hypot(px - ax - t * dx, py - ay - t * dy)
+
+
+def point_in_polygon(px, py, polygon):
+    """射线法判断点是否在多边形内"""
+    inside = False
+    j = len(polygon) - 1
+    for i in range(len(polygon)):
+        xi, yi = polygon[i]
+        xj, yj = polygon[j]
+        if (yi > py) != (yj > py) and px < (xj - xi) * (py - yi) / (yj - yi) + xi:
+            inside = not inside
+        j = i
+    return inside
+
+
+class SpatialQuery(object):
+    """
+    查询条件：点 + 半径，或多边形（多边形内部以及距边界半径以内的点都匹配）
+    """
+
+    def __init__(self, points, radius=DEFAULT_RADIUS):
+        self.points = points
+        self.radius = radius
+        self.origin = (sum(p[0] for p in points) / len(points), sum(p[1] for p in points) / len(points))
+        self.shape = [local_xy(lat, lon, *self.origin) for lat, lon in points]
+
+    def bbox(self):
+        """外包框（按半径外扩）"""
+        dlat = self.radius / METERS_PER_DEGREE
+        dlon = self.radius / (METERS_PER_DEGREE * max(math.cos(math.radians(self.origin[0])), 1e-6))
+        lats = [p[0] for p in self.points]
+        lons = [p[1] for p in self.points]
+        return min(lats) - dlat, min(lons) - dlon, max(lats) + dlat, max(lons) + dlon
+
+    def distance(self, lat, lon):
+        """点到查询范围的距离（米），在多边形内部为0"""
+        px, py = local_xy(lat, lon, *self.origin)
+        shape = self.shape
+        if len(shape) == 1:
+            return math.hypot(px - shape[0][0], py - shape[0][1])
+        if len(shape) >= 3 and point_in_polygon(px, py, shape):
+            return 0.0
+        count = len(shape) if len(shape) >= 3 else 1
+        return min(segment_distance(px, py, *shape[i], *shape[(i + 1) % len(shape)])
+                   for i in range(count))
+
+    def run(self, index):
+        """返回匹配的点（按日志、行号排序）"""
+        results = []
+        for block_id, arrays, position in index.candidates(*self.bbox()):
+            lat, lon = arrays['lat'][position], arrays['lon'][position]
+            distance = self.distance(lat, lon)
+            if distance <= self.radius:
+                results.append((block_id, arrays['line'][position], arrays['offset'][position],
+                                arrays['length'][position], arrays['time_ms'][position], lat, lon, distance))
+        results.sort()
+        return results
+
+
+def byte_ranges(results, gap=DEFAULT_RANGE_GAP):
+    """
+    同一日志中间隔不超过gap字节的匹配点合并为一段字节范围（包含其间的其它日志行）
+
+    返回 [(块序号, 起始偏移, 结束偏移, GPS点数, 起始时间, 结束时间), ...]
+    """
+    ranges = []
+    for block_id, _, offset, length, time_ms, _, _, _ in results:
+        if ranges and ranges[-1][0] == block_id and offset - ranges[-1][2] <= gap:
+            last = ranges[-1]
+            ranges[-1] = (block_id, last[1], offset + length, last[3] + 1, last[4], time_ms)
+        else:
+            ranges.append((block_id, offset, offset + length, 1, time_ms, time_ms))
+    return ranges
+
+
+def parse_points(text):
+    """解析 "lat,lon;lat,lon;..." 格式的坐标"""
+    points = []
+    for item in text.split(';'):
+        if item.strip():
+            lat, lon = item.split(',')
+            points.append((float(lat), float(lon)))
+    return points
+
+
+def _build_one(task):
+    """进程池工作函数：为一个日志建立索引"""
+    log_file, index_file, cell_size = task
+    start = time.perf_counter()
+    try:
+        info, arrays = build_block(log_file, cell_size)
+        with profiler.stage('write'):
+            write_index(index_file, cell_size, [(info, arrays)])
+    except Exception as e:
+        return log_file, index_file, None, str(e)
+    return log_file, index_file, (info['points'], info['cells'], time.perf_counter() - start), None
+
+
+def command_build(args):
+    """为每个日志建立索引（已是最新的跳过）"""
+    tasks = []
+    for log_file in args.input:
+        if args.output_dir:
+            index_file = os.path.join(args.output_dir, os.path.basename(log_file) + INDEX_SUFFIX)
+        else:
+            index_file = log_file + INDEX_SUFFIX
+        if not os.path.exists(log_file):
+            print(f"[ERROR] 文件不存在: {log_file}")
+            continue
+        if not args.force and os.path.exists(index_file) \
+                and os.path.getmtime(index_file) >= os.path.getmtime(log_file):
+            print(f"[INFO] 索引已是最新，跳过: {index_file}")
+            continue
+        tasks.append((log_file, index_file, args.cell_size))
+
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    failed = 0
+    if len(tasks) > 1 and args.jobs != 1:
+        # 工作进程内的阶段不计入剖析结果，只统计总耗时和子进程峰值内存
+        with profiler.stage('build'), ProcessPoolExecutor(max_workers=args.jobs) as executor:
+            results = list(executor.map(_build_one, tasks))
+    else:
+        results = [_build_one(task) for task in tasks]
+    for log_file, index_file, stats, error in results:
+        if error:
+            failed += 1
+            print(f"[ERROR] 建立索引失败: {log_file}: {error}")
+        else:
+            points, cells, elapsed = stats
+            print(f"[INFO] {index_file}: {points} 个GPS点，{cells} 个网格，耗时 {elapsed:.2f} 秒")
+    return failed == 0
+
+
+def command_merge(args):
+    """合并多个索引（数据块直接拼接，不重新排序）"""
+    opened = []
+    try:
+        blocks = []
+        for index_file in args.input:
+            with profiler.stage('read'):
+                index = SpatialIndex(index_file)
+            opened.append(index)
+            if index.cell_size != opened[0].cell_size:
+                print(f"[ERROR] 网格大小不一致，无法合并: {index_file}")
+                return False
+            for block in index.blocks:
+                info = {key: value for key, value in block.items() if key != 'arrays'}
+                blocks.append((info, index.arrays(block)))
+        # 数据块通过mmap按需读入，读取耗时计入写出阶段
+        with profiler.stage('write'):
+            write_index(args.output, opened[0].cell_size, blocks)
+    except (OSError, ValueError) as e:
+        print(f"[ERROR] 合并失败: {e}")
+        return False
+    finally:
+        blocks = None
+        for index in opened:
+            index.close()
+    print(f"[INFO] 已合并 {len(args.input)} 个索引到: {args.output}")
+    return True
+
+
+def command_query(args):
+    """查询并输出匹配的行或字节范围"""
+    try:
+        points = parse_points(args.polygon) if args.polygon else parse_points(args.point)
+    except ValueError:
+        print("[ERROR] 坐标格式错误，应为 lat,lon 或 lat,lon;lat,lon;...")
+        return False
+    if not points:
+        print("[ERROR] 请指定 --point 或 --polygon")
+        return False
+
+    query = SpatialQuery(points, args.radius)
+    found = 0
+    start = time.perf_counter()
+    for index_file in args.index:
+        try:
+            with profiler.stage('read'):
+                index = SpatialIndex(index_file)
+        except (OSError, ValueError) as e:
+            print(f"[ERROR] 无法打开索引: {index_file}: {e}")
+            continue
+        with index:
+            with profiler.stage('query'):
+                results = query.run(index)
+            found += len(results)
+            for block in index.blocks:
+                source = block['source']
+                if not os.path.exists(source) or os.path.getsize(source) != block['size']:
+                    print(f"[WARN] 日志已变化或不存在，索引需要重建: {source}")
+
+            with profiler.stage('write'):
+                if args.ranges:
+                    for block_id, begin, end, points, first, last in \
+                            byte_ranges(results, args.gap)[:args.limit or None]:
+                        print(f"{index.blocks[block_id]['source']}\t{begin}-{end}\t{points} 个GPS点\t"
+                              f"{format_ms(first)} ~ {format_ms(last)}")
+                    continue
+
+                for block_id, line, offset, length, time_ms, lat, lon, distance in results[:args.limit or None]:
+                    source = index.blocks[block_id]['source']
+                    text = ''
+                    if args.show:
+                        with open(source, 'rb') as f:
+                            f.seek(offset)
+                            text = '\t' + f.read(length).decode('utf-8', errors='replace').rstrip('\r\n')
+                    print(f"{source}:{line}\t{format_ms(time_ms)}\t{lat:.7f},{lon:.7f}\t{distance:.1f}m{text}")
+
+    elapsed = (time.perf_counter() - start) * 1000
+    profiler.count('points_matched', found)
+    print(f"[INFO] 共匹配 {found} 个GPS点，查询耗时 {elapsed:.1f} 毫秒", file=sys.stderr)
+    return True
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(
+        description='GPS轨迹空间索引工具',
+        epilog='示例: python gps_spatial_index.py query -x fleet.gidx --point 31.2304,121.4737 --radius 50'
+    )
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build = subparsers.add_parser('build', help='为日志建立索引（<日志>.gidx）')
+    build.add_argument('-i', '--input', required=True, nargs='+', help='输入日志文件路径，可指定多个')
+    build.add_argument('-o', '--output-dir', help='索引输出目录（默认与日志同目录）')
+    build.add_argument('--cell-size', type=float, default=DEFAULT_CELL_SIZE,
+                       help=f'网格大小（度，默认{DEFAULT_CELL_SIZE}）')
+    build.add_argument('-j', '--jobs', type=int, default=None, help='并行进程数（默认CPU核数）')
+    build.add_argument('--force', action='store_true', help='索引已是最新时也重新建立')
+
+    merge = subparsers.add_parser('merge', help='合并多个索引为车队索引')
+    merge.add_argument('-i', '--input', required=True, nargs='+', help='输入索引文件')
+    merge.add_argument('-o', '--output', required=True, help='输出索引文件')
+
+    query = subparsers.add_parser('query', help='查询经过某点/某区域附近的GPS点')
+    query.add_argument('-x', '--index', required=True, nargs='+', help='索引文件，可指定多个')
+    query.add_argument('--point', help='查询点 lat,lon')
+    query.add_argument('--polygon', help='查询多边形 lat,lon;lat,lon;...')
+    query.add_argument('-r', '--radius', type=float, default=DEFAULT_RADIUS,
+                       help=f'距离阈值（米，默认{DEFAULT_RADIUS:g}）')
+    query.add_argument('--ranges', action='store_true', help='输出合并后的日志字节范围而不是逐行输出')
+    query.add_argument('--gap', type=int, default=DEFAULT_RANGE_GAP,
+                       help=f'输出字节范围时合并间隔不超过该字节数的匹配点（默认{DEFAULT_RANGE_GAP}）')
+    query.add_argument('--show', action='store_true', help='同时输出原始日志行')
+    query.add_argument('--limit', type=int, default=0, help='最多输出条数（默认0，全部）')
+
+    for subparser in (build, merge, query):
+        add_profile_arguments(subparser)
+
+    args = parser.parse_args()
+
+    commands = {'build': command_build, 'merge': command_merge, 'query': command_query}
+    # 查询结果输出到标准输出，剖析报告与日志一样输出到标准错误
+    with profile_session(args, file=sys.stderr):
+        ok = commands[args.command](args)
+    if ok:
+        print("\n[SUCCESS] 任务完成！", file=sys.stderr)
+    else:
+        print("\n[FAILED] 任务失败！", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -7,11 +7,49 @@
 日期：2025-01-15
 """
 
+import os
 import re
+import sys
 import csv
 import argparse
 from datetime import datetime
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'common'))
+from profiling import profiler, add_profile_arguments, profile_session
+
+
+# 正则表达式匹配模式（gps_spatial_index.py 等工具共用）
+TIMESTAMP_PATTERN = re.compile(r'\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}\.\d{3}')
+GPS_PATTERN = re.compile(r'GPS: lat=([-\d.]+), lon=([-\d.]+), alt=([-\d.]+)')
+SPEED_PATTERN = re.compile(r'Speed: ([\d.]+) km/h')
+STEERING_PATTERN = re.compile(r'SteeringAngle: ([-\d.]+) deg')
+
+# 日志时间戳格式（毫秒精度），输出CSV的timestamp列沿用该格式
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+
+
+class TimestampCache(object):
+    """日志时间戳转换为毫秒时间戳（同一秒内的时间戳只解析一次，无毫秒部分时按0处理）"""
+
+    def __init__(self):
+        self.seconds = {}
+
+    def to_ms(self, timestamp):
+        prefix, fraction = timestamp[:19], timestamp[20:23]
+        millis = int(fraction.ljust(3, '0')) if fraction else 0
+        seconds = self.seconds.get(prefix)
+        if seconds is None:
+            seconds = int(datetime.strptime(prefix, '%Y-%m-%d %H:%M:%S').timestamp())
+            if len(self.seconds) > 100000:
+                self.seconds.clear()
+            self.seconds[prefix] = seconds
+        return seconds * 1000 + millis
+
+
+def format_ms(time_ms):
+    """毫秒时间戳转换为日志时间格式"""
+    return datetime.fromtimestamp(time_ms / 1000).strftime(TIMESTAMP_FORMAT)[:-3]
+
 
 class LogParser:
     """日志解析器类"""
@@ -25,37 +63,32 @@ class LogParser:
         """解析日志文件"""
         print(f"[INFO] 开始解析日志文件: {self.log_file}")
         
-        # 正则表达式匹配模式
-        timestamp_pattern = r'\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}\.\d{3}'
-        gps_pattern = r'GPS: lat=([-\d.]+), lon=([-\d.]+), alt=([-\d.]+)'
-        speed_pattern = r'Speed: ([\d.]+) km/h'
-        steering_pattern = r'SteeringAngle: ([-\d.]+) deg'
-        
+        line_count = 0
         try:
-            with open(self.log_file, 'r', encoding='utf-8') as f:
-                line_count = 0
+            # 逐行读取与解析交替进行，合并为一个阶段计时
+            with profiler.stage('read+parse'), open(self.log_file, 'r', encoding='utf-8') as f:
                 for line in f:
                     line_count += 1
                     
                     # 提取时间戳
-                    timestamp_match = re.search(timestamp_pattern, line)
+                    timestamp_match = TIMESTAMP_PATTERN.search(line)
                     if not timestamp_match:
                         continue
                     
                     timestamp = timestamp_match.group(0)
                     
                     # 提取GPS坐标
-                    gps_match = re.search(gps_pattern, line)
+                    gps_match = GPS_PATTERN.search(line)
                     lat, lon, alt = ('N/A', 'N/A', 'N/A')
                     if gps_match:
                         lat, lon, alt = gps_match.groups()
                     
                     # 提取车速
-                    speed_match = re.search(speed_pattern, line)
+                    speed_match = SPEED_PATTERN.search(line)
                     speed = speed_match.group(1) if speed_match else 'N/A'
                     
                     # 提取方向盘转角
-                    steering_match = re.search(steering_pattern, line)
+                    steering_match = STEERING_PATTERN.search(line)
                     steering = steering_match.group(1) if steering_match else 'N/A'
                     
                     # 如果该行包含有效数据，则保存
@@ -79,7 +112,10 @@ class LogParser:
         except Exception as e:
             print(f"[ERROR] 解析出错: {str(e)}")
             return False
+        finally:
+            profiler.count('lines', line_count)
         
+        profiler.count('records', len(self.data))
         print(f"[INFO] 解析完成！共提取 {len(self.data)} 条有效数据")
         return True
     
@@ -90,7 +126,8 @@ class LogParser:
             return False
         
         try:
-            with open(self.output_file, 'w', newline='', encoding='utf-8-sig') as f:
+            with profiler.stage('write'), \
+                    open(self.output_file, 'w', newline='', encoding='utf-8-sig') as f:
                 fieldnames = ['timestamp', 'latitude', 'longitude', 'altitude', 
                              'speed_kmh', 'steering_angle']
                 writer = csv.DictWriter(f, fieldnames=fieldnames)
@@ -143,6 +180,7 @@ def main():
     parser.add_argument('-i', '--input', required=True, help='输入日志文件路径')
     parser.add_argument('-o', '--output', required=True, help='输出CSV文件路径')
     parser.add_argument('-s', '--stats', action='store_true', help='显示统计信息')
+    add_profile_arguments(parser)
     
     args = parser.parse_args()
     
@@ -150,21 +188,23 @@ def main():
     print("车辆日志解析工具 v1.0")
     print("="*60)
     
-    # 创建解析器实例
-    log_parser = LogParser(args.input, args.output)
-    
-    # 解析日志
-    if log_parser.parse_log():
-        # 显示统计信息
-        if args.stats:
-            log_parser.get_statistics()
+    with profile_session(args):
+        # 创建解析器实例
+        log_parser = LogParser(args.input, args.output)
         
-        # 导出CSV
-        log_parser.export_to_csv()
-        
-        print("\n[SUCCESS] 任务完成！")
-    else:
-        print("\n[FAILED] 任务失败！")
+        # 解析日志
+        if log_parser.parse_log():
+            # 显示统计信息
+            if args.stats:
+                with profiler.stage('stats'):
+                    log_parser.get_statistics()
+            
+            # 导出CSV
+            log_parser.export_to_csv()
+            
+            print("\n[SUCCESS] 任务完成！")
+        else:
+            print("\n[FAILED] 任务失败！")
 
 
 if __name__ == '__main__':
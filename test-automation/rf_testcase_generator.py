@@ -23,6 +23,9 @@ Robot Framework测试用例自动生成器
 
 使用方法：
     python rf_testcase_generator.py /path/to/test/module
+    python rf_testcase_generator.py /path/to/test/module --shard-by count --shard-size 500
+    python rf_testcase_generator.py /path/to/test/module --spec assertions.yaml
+    python rf_testcase_generator.py /path/to/test/module --shard-by count --runner pool --workers 8
 """
 
 import os.path
@@ -35,7 +38,291 @@ import argparse
 import sys
 import platform
 import re
+import io
+import json
+import fnmatch
+import hashlib
 import psutil
+import yaml
+import heapq
+import xml.etree.ElementTree as ElementTree
+from concurrent.futures import ProcessPoolExecutor
+
+
+#############################################################
+# 用例模板
+#############################################################
+SUITE_HEADER_TEMPLATE = (
+    "*** Settings ***\n"
+    "Force Tags        priority-P0    owner-xiaoxiong.he    branch-dev\n"
+    "Documentation     Basic test for {outputpath}\n"
+    "Library           ../../libraries/{module}/Test{module_cap}.py\n"
+    "\n*** Variables ***\n"
+    "${{AD_{module_upper}_DIR}}    {outputpath}\n"
+    "\n*** Test Cases ***\n"
+)
+
+PATH_CASE_TEMPLATE = (
+    "AD_{module_upper}_OUTPUT_CHECK_{caseindex} Compilation_Path_Check\n"
+    "    [Documentation]    {module_cap} Compile output path detection\n"
+    "    [Timeout]          300\n    [Setup]            Setup\n"
+    "    ${{Returnvar}} =     Compilation Path Check    {dirpath}\n"
+    "    SHOULD BE TRUE     ${{Returnvar}}\n"
+    "    [Teardown]         Teardown\n"
+    "\n\n"
+)
+
+FILE_CASE_HEAD_TEMPLATE = (
+    "AD_{module_upper}_OUTPUT_CHECK_{caseindex} Compilation_File_Check\n"
+    "    [Documentation]    {dirpath} Compile output file detection\n"
+    "    [Timeout]          300\n    [Setup]            Setup\n"
+    "    ${{Filepath}} =    CATENATE    {dirpath}\n"
+    "    ${{Returnvar}} =     Compilation File Check    ${{Filepath}}    {filename}\n"
+    "    SHOULD BE TRUE     ${{Returnvar}}\n"
+    "    ${{data}} =     read_file    ${{Filepath}}    {filename}\n"
+)
+
+FILE_CASE_TAIL = "    [Teardown]         Teardown\n\n\n"
+
+# 断言规格文件中匹配到的断言：一个文件只解析一次，所有断言在一次调用中完成
+SPEC_ASSERTION_HEAD = "    ${Checked} =     Arrest Results    ${data}"
+SPEC_ASSERTION_PAIR = "\n    ...    {path}    {expected}"
+SPEC_ASSERTION_TAIL = "\n    SHOULD BE TRUE     ${Checked}\n"
+
+# 未指定断言规格文件时，按用例编号添加的断言（用例编号 -> 断言行）
+LEGACY_ASSERTIONS = {
+    "0101": "    ${a}=         arrest_result    ${data}     $.file_cache.cache_path    transparent-cache/file\n"
+            "    SHOULD BE TRUE     ${a}\n",
+    "0102": "    ${b}=         arrest_result    ${data}     $.identify.algorithmVersion    CSVEHXV_v1.5.0.0\n"
+            "    SHOULD BE TRUE     ${b}\n",
+    "0103": "    ${c}=         arrest_result    ${data}     $.CommonConfig.CollectMode    RMS\n"
+            "    SHOULD BE TRUE     ${c}\n",
+    "0104": "    ${d}=         arrest_result    ${data}     $.ins.shiftSwitch    1\n"
+            "    SHOULD BE TRUE     ${d}\n",
+}
+
+# 用例文件名（不分片时）及分片文件名
+SUITE_FILE_NAME = "01_Compilation_Output_Check.robot"
+SUITE_SHARD_FILE_NAME = "01_Compilation_Output_Check_%04d.robot"
+
+# 测试库模板（%-格式化：classname、createtime）
+LIBRARY_TEMPLATE = '''#!/usr/bin/python
+# -*- coding:utf-8 -*-
+#############################################################
+#   > File Name: %(classname)s.py
+#   > Author: Auto Generated
+#   > Mail:
+#   > Created Time: %(createtime)s
+#############################################################
+
+import os.path
+import os
+import time
+import threading
+import multiprocessing
+import datetime
+import argparse
+import sys
+import platform
+import re
+import psutil
+import json
+import jsonpath
+import yaml
+from collections import OrderedDict
+
+# 解析结果缓存的最大文件数
+PARSE_CACHE_SIZE = 256
+
+# 可以预编译的简单jsonpath：$.a.b.c（只含点号分隔的普通键名）
+SIMPLE_PATH_PATTERN = re.compile(r'^\\$((?:\\.[A-Za-z_][\\w\\-]*)+)$')
+
+
+def compile_jsonpath(expression):
+    """
+    预编译jsonpath表达式，返回 函数(data) -> 匹配值列表 或 False
+
+    只含普通键名的逐级取值路径（$.a.b.c）直接按键访问，结果与jsonpath库一致；
+    单独的 $、下标（[0]）、数字键名等其余表达式交给jsonpath库
+    """
+    match = SIMPLE_PATH_PATTERN.match(expression)
+    if not match:
+        return lambda data: jsonpath.jsonpath(data, expression)
+
+    steps = match.group(1)[1:].split('.')
+
+    def evaluate(data):
+        for step in steps:
+            if not isinstance(data, dict) or step not in data:
+                return False
+            data = data[step]
+        return [data]
+    return evaluate
+
+
+#############################################################
+# 测试库类
+#############################################################
+class %(classname)s(object):
+    # 整个测试运行共用一个实例，缓存在用例之间共享
+    ROBOT_LIBRARY_SCOPE = 'GLOBAL'
+
+    def __init__(self):
+        print("[INFO] 初始化测试库")
+        # (文件路径, 修改时间) -> 解析结果，LRU淘汰
+        self._parse_cache = OrderedDict()
+        # 目录 -> 目录下的文件名集合（一次scandir代替逐个文件stat）
+        self._dir_cache = {}
+        # jsonpath表达式 -> 预编译的取值函数
+        self._jsonpath_cache = {}
+
+    def setup(self):
+        print("[INFO] 测试用例Setup")
+
+    def teardown(self):
+        print("[INFO] 测试用例Teardown")
+
+    def _list_files(self, output_path):
+        """读取并缓存目录下的文件名集合，目录不存在时返回空集合"""
+        files = self._dir_cache.get(output_path)
+        if files is None:
+            files = set()
+            try:
+                with os.scandir(output_path) as entries:
+                    for entry in entries:
+                        if entry.is_file():
+                            files.add(entry.name)
+            except OSError:
+                pass
+            self._dir_cache[output_path] = files
+        return files
+
+    def compilation_path_check(self, output_path):
+        """
+        检查编译输出路径是否存在
+        """
+        try:
+            result = os.path.exists(output_path)
+        except Exception as error:
+            result = False
+        finally:
+            return result
+
+    def compilation_file_check(self, output_path, output_filename):
+        """
+        检查编译输出文件是否存在
+        """
+        try:
+            result = output_filename in self._list_files(output_path)
+        except Exception as error:
+            result = False
+        finally:
+            return result
+
+    def check_files(self, output_path, *output_filenames):
+        """
+        批量检查目录下的多个文件是否都存在，只读取一次目录
+        """
+        files = self._list_files(output_path)
+        missing = [name for name in output_filenames if name not in files]
+        if missing:
+            print("[ERROR] 文件不存在: " + ", ".join(missing))
+            return False
+        return True
+
+    def read_file(self, output_path, output_filename):
+        """
+        读取文件内容，支持JSON/YAML/META格式
+
+        解析结果按 (路径, 修改时间) 缓存，同一文件多次断言只解析一次
+        """
+        filepath = output_path + "/" + output_filename
+        try:
+            mtime = os.stat(filepath).st_mtime_ns
+        except OSError:
+            return False
+
+        key = (filepath, mtime)
+        cache = self._parse_cache
+        if key in cache:
+            cache.move_to_end(key)
+            return cache[key]
+
+        data = None
+        if filepath.endswith('.yaml'):
+            with open(filepath, 'r', encoding='utf-8') as load_f:
+                data = yaml.load(load_f, Loader=getattr(yaml, 'CSafeLoader', yaml.SafeLoader))
+        elif filepath.endswith('.json') or filepath.endswith('.meta'):
+            with open(filepath, 'r') as f:
+                data = json.load(f)
+
+        cache[key] = data
+        if len(cache) > PARSE_CACHE_SIZE:
+            cache.popitem(last=False)
+        return data
+
+    def _jsonpath(self, expression):
+        """取预编译的jsonpath，首次使用时编译"""
+        compiled = self._jsonpath_cache.get(expression)
+        if compiled is None:
+            compiled = self._jsonpath_cache[expression] = compile_jsonpath(expression)
+        return compiled
+
+    def arrest_result(self, data: dict, act, ect):
+        """
+        使用jsonpath提取数据并断言
+        """
+        m = self._jsonpath(act)(data)
+        if not m:
+            return False
+        m = str(m[0])
+        if m:
+            if m == ect:
+                return True
+            else:
+                return False
+        else:
+            return False
+
+    def arrest_results(self, data: dict, *pairs):
+        """
+        批量断言：参数为 jsonpath1, 期望值1, jsonpath2, 期望值2, ...
+
+        全部通过返回True，否则打印不通过的项并返回False
+        """
+        if len(pairs) %% 2:
+            raise ValueError("jsonpath与期望值必须成对出现")
+        failed = []
+        for act, ect in zip(pairs[0::2], pairs[1::2]):
+            if not self.arrest_result(data, act, ect):
+                failed.append(act)
+        if failed:
+            print("[ERROR] 断言不通过: " + ", ".join(failed))
+            return False
+        return True
+
+
+#############################################################
+# 主函数
+#############################################################
+if __name__ == "__main__":
+    test_obj = %(classname)s()
+    print("测试库加载成功")
+'''
+
+# 目录树清单（记录上次生成时的文件及用例编号、分片），用于增量生成
+MANIFEST_FILE_NAME = ".rf_manifest.json"
+MANIFEST_VERSION = 1
+
+# 并行执行：历史结果、各进程的输出目录、pabot用例文件执行顺序
+HISTORY_OUTPUT_FILE = "rfoutput/output.xml"
+PARALLEL_OUTPUT_DIR = "rfoutput/parallel"
+PARALLEL_SUITE_NAME = "Worker"   # 各进程结果的用例集名称（后接进程序号）
+PABOT_ORDERING_FILE_NAME = ".pabot_ordering"
+DEFAULT_CASE_SECONDS = 1.0   # 没有任何历史耗时时，每个用例的估计耗时（秒）
+
+# robot公共参数（串行和并行执行一致）
+ROBOT_FILTER_OPTIONS = "--exclude not-readyOrnot-run \\\n        --include priority-P0"
 
 
 #############################################################
@@ -56,6 +343,27 @@ class InputArgparseClass(object):
         )
         self.parser.add_argument("path", type=str, 
                                 help='要生成测试用例的模块路径（绝对路径）')
+        self.parser.add_argument("--shard-by", choices=['none', 'dir', 'count'], default='none',
+                                help='用例分片方式：none（单个用例文件，默认）、dir（每个目录一个文件）、'
+                                     'count（每个文件最多 --shard-size 个用例）')
+        self.parser.add_argument("--shard-size", type=int, default=500,
+                                help='count分片时每个用例文件的最大用例数，默认500')
+        self.parser.add_argument("-j", "--jobs", type=int, default=None,
+                                help='并行渲染用例文件的进程数，默认CPU核数')
+        self.parser.add_argument("--full", action='store_true',
+                                help='忽略目录树清单，全部重新编号并重新生成')
+        self.parser.add_argument("--follow-symlinks", action='store_true',
+                                help='进入符号链接指向的目录（默认与 os.walk 一致，不进入）')
+        self.parser.add_argument("--spec", type=str, default=None,
+                                help='断言规格文件（YAML/JSON）：文件匹配模式 -> jsonpath/期望值列表；'
+                                     '不指定时沿用按用例编号的内置断言')
+        self.parser.add_argument("--runner", choices=['serial', 'pool', 'pabot'], default='serial',
+                                help='执行脚本类型：serial（robot串行，默认）、pool（多个robot进程并行，'
+                                     'rebot合并结果）、pabot（pabot并行）')
+        self.parser.add_argument("--workers", type=int, default=None,
+                                help='并行执行的进程数，默认CPU核数')
+        self.parser.add_argument("--history", type=str, default=HISTORY_OUTPUT_FILE,
+                                help='用于均衡分配的历史执行结果output.xml，默认 ' + HISTORY_OUTPUT_FILE)
         self.__args = self.parser.parse_args()
         return
 
@@ -76,13 +384,16 @@ class DocumentProcessingClass(object):
     输出格式: [{"/path/to/dir":[file1, file2, file3]}, ...]
     """
 
-    def __init__(self, filepath):
+    def __init__(self, filepath, follow_symlinks=False):
         """
         初始化文档处理器
         """
         self.filepath_cmv = filepath
+        self.followsymlinks_cmv = follow_symlinks
         self.filelist_cmv = []
         self.filedict_cmv = {'': []}
+        # 文件路径 -> (大小, 修改时间)
+        self.filestat_cmv = {}
 
         self.createfiledict_cmf()
         return
@@ -90,24 +401,572 @@ class DocumentProcessingClass(object):
     def createfiledict_cmf(self):
         """
         遍历目录，创建文件字典
+
+        使用 os.scandir 深度优先遍历（与 os.walk 自顶向下的顺序一致），
+        目录项按名称排序，保证每次生成的用例编号稳定；同时记录文件大小和修改时间。
+        与 os.walk 一样，指向目录的符号链接按目录处理（不作为文件生成用例），
+        默认不进入；follow_symlinks 时进入，并按 (st_dev, st_ino) 跳过已访问的目录，避免链接成环
         """
-        for filepath, dirs, files in os.walk(self.filepath_cmv):
+        followsymlinks = self.followsymlinks_cmv
+        visited = set()
+        stack = [self.filepath_cmv]
+        while stack:
+            filepath = stack.pop()
+            files = []
+            dirs = []
+            try:
+                if followsymlinks:
+                    stat = os.stat(filepath)
+                    if (stat.st_dev, stat.st_ino) in visited:
+                        print("[WARN] 跳过重复访问的目录（符号链接成环）: %s" % filepath)
+                        continue
+                    visited.add((stat.st_dev, stat.st_ino))
+                with os.scandir(filepath) as entries:
+                    for entry in entries:
+                        try:
+                            isdir = entry.is_dir(follow_symlinks=True)
+                        except OSError:
+                            isdir = False
+                        if isdir:
+                            if followsymlinks or not entry.is_symlink():
+                                dirs.append(entry.path)
+                            continue
+                        files.append(entry.name)
+                        try:
+                            stat = entry.stat(follow_symlinks=followsymlinks)
+                            self.filestat_cmv[entry.path] = (stat.st_size, stat.st_mtime)
+                        except OSError:
+                            self.filestat_cmv[entry.path] = (-1, 0)
+            except OSError as error:
+                print("[WARN] 无法读取目录 %s: %s" % (filepath, error))
+                continue
+
+            # 子目录逆序入栈，出栈时按名称顺序访问
+            dirs.sort(reverse=True)
+            stack.extend(dirs)
 
             if files == []:
                 continue
 
-            self.filedict_cmv = {'': []}
-            for filename in files:
-                if filepath not in self.filedict_cmv.keys():
-                    self.filedict_cmv = {filepath: [filename]}
-                else:
-                    self.filedict_cmv[filepath].append(filename)
-
+            files.sort()
+            self.filedict_cmv = {filepath: files}
             self.filelist_cmv.append(self.filedict_cmv)
 
         return self.filelist_cmv
 
 
+#############################################################
+# 用例分片渲染
+#############################################################
+def write_if_changed_cmf(filepath, content, ignore_prefix=None):
+    """
+    内容有变化时才写入文件，保持未变化文件的修改时间不变
+
+    ignore_prefix: 比较时忽略以该前缀开头的行（如生成时间）
+    返回是否写入
+    """
+    try:
+        with open(filepath, mode='r') as oldfile:
+            oldcontent = oldfile.read()
+    except (OSError, UnicodeDecodeError):
+        oldcontent = None
+
+    if oldcontent is not None:
+        if ignore_prefix is None:
+            unchanged = oldcontent == content
+        else:
+            strip = lambda text: [line for line in text.split("\n")
+                                  if not line.startswith(ignore_prefix)]
+            unchanged = strip(oldcontent) == strip(content)
+        if unchanged:
+            return False
+
+    with open(filepath, mode='w') as newfile:
+        newfile.write(content)
+    return True
+
+
+def robot_escape_cmf(value):
+    """将任意值转换为可以作为Robot Framework单个参数的文本"""
+    text = str(value)
+    if text == "":
+        return "${EMPTY}"
+    text = text.replace("\\", "\\\\")
+    for mark in "$@&%":
+        text = text.replace(mark + "{", "\\" + mark + "{")
+    if text.startswith("#"):
+        text = "\\" + text
+    # 连续空格和首尾空格会被Robot当作分隔符或去掉
+    text = re.sub(r" {2,}", lambda m: " " + "${SPACE}" * (len(m.group(0)) - 1), text)
+    if text.startswith(" "):
+        text = "${SPACE}" + text[1:]
+    if text.endswith(" "):
+        text = text[:-1] + "${SPACE}"
+    return text
+
+
+def load_spec_cmf(specfile):
+    """
+    读取断言规格文件（YAML或JSON）
+
+    格式：文件匹配模式 -> 断言列表，断言可以写成 {jsonpath: 期望值} 映射，
+    或 [[jsonpath, 期望值], ...] 列表。匹配模式含 "/" 时匹配相对模块目录的路径，
+    否则匹配文件名。
+
+    返回 [(匹配模式, [(jsonpath, 期望值), ...]), ...]
+    """
+    with open(specfile, mode='r', encoding='utf-8') as spec:
+        if specfile.endswith(".json"):
+            rawspec = json.load(spec)
+        else:
+            rawspec = yaml.safe_load(spec)
+
+    if not isinstance(rawspec, dict):
+        raise ValueError("断言规格文件顶层必须是 匹配模式 -> 断言列表 的映射")
+
+    rules = []
+    for pattern, assertions in rawspec.items():
+        if isinstance(assertions, dict):
+            pairs = list(assertions.items())
+        elif isinstance(assertions, list) and all(
+                isinstance(item, (list, tuple)) and len(item) == 2 for item in assertions):
+            pairs = [tuple(item) for item in assertions]
+        else:
+            raise ValueError("匹配模式 %s 的断言格式错误" % pattern)
+        rules.append((str(pattern), [(str(path), expected) for path, expected in pairs]))
+    return rules
+
+
+def spec_assertions_cmf(header, dirpath, filename):
+    """返回文件匹配到的全部断言（按规格文件中的顺序）"""
+    relpath = os.path.relpath(dirpath + "/" + filename, header["names"]["outputpath"])
+    pairs = []
+    for pattern, rulepairs in header["spec"]:
+        target = relpath if "/" in pattern else filename
+        if fnmatch.fnmatchcase(target, pattern):
+            pairs.extend(rulepairs)
+    return pairs
+
+
+def render_suite_cmf(header, cases):
+    """
+    渲染一个用例文件的全部内容
+
+    cases: [(用例类型, 目录序号, 文件序号, 目录, 文件名), ...]，用例类型为 path 或 file
+    """
+    names = header["names"]
+    parts = [SUITE_HEADER_TEMPLATE.format(**names)]
+    append = parts.append
+    for casetype, pathindex, fileindex, dirpath, filename in cases:
+        caseindex = "%02d%02d" % (pathindex, fileindex)
+        if casetype == "path":
+            append(PATH_CASE_TEMPLATE.format(caseindex=caseindex, dirpath=dirpath, **names))
+            continue
+        append(FILE_CASE_HEAD_TEMPLATE.format(caseindex=caseindex, dirpath=dirpath,
+                                              filename=filename, **names))
+        if header["spec"] is None:
+            assertion = LEGACY_ASSERTIONS.get(caseindex)
+            if assertion:
+                append(assertion)
+        else:
+            pairs = spec_assertions_cmf(header, dirpath, filename)
+            if pairs:
+                append(SPEC_ASSERTION_HEAD)
+                for path, expected in pairs:
+                    append(SPEC_ASSERTION_PAIR.format(path=robot_escape_cmf(path),
+                                                      expected=robot_escape_cmf(expected)))
+                append(SPEC_ASSERTION_TAIL)
+        append(FILE_CASE_TAIL)
+    return "".join(parts)
+
+
+def write_suite_cmf(task):
+    """
+    渲染并写出一个用例文件（进程池工作函数），整个文件一次写入
+
+    返回 (文件路径, 用例数, 是否写入)
+    """
+    header, suitefile, cases = task
+    written = write_if_changed_cmf(suitefile, render_suite_cmf(header, cases))
+    return suitefile, len(cases), written
+
+
+def case_name_cmf(module_upper, casetype, pathindex, fileindex):
+    """用例名称（与用例模板一致）"""
+    return "AD_%s_OUTPUT_CHECK_%02d%02d Compilation_%s_Check" % (
+        module_upper, pathindex, fileindex, "Path" if casetype == "path" else "File")
+
+
+def parse_robot_time_cmf(timestamp):
+    """解析Robot Framework 6及以前版本output.xml中的时间，如 20220815 09:06:13.123"""
+    return datetime.datetime.strptime(timestamp, "%Y%m%d %H:%M:%S.%f")
+
+
+def load_case_durations_cmf(outputxml):
+    """
+    从上次执行的output.xml读取每个用例的耗时
+
+    兼容 Robot Framework 7（status带elapsed属性）和之前版本（starttime/endtime）。
+    返回 {用例名称: 秒}，文件不存在或无法解析时返回空字典
+    """
+    durations = {}
+    if not os.path.exists(outputxml):
+        return durations
+    try:
+        for _, elem in ElementTree.iterparse(outputxml, events=("end",)):
+            if elem.tag != "test":
+                continue
+            status = elem.find("status")
+            if status is not None:
+                if status.get("elapsed") is not None:
+                    durations[elem.get("name")] = float(status.get("elapsed"))
+                elif status.get("starttime", "N/A") != "N/A" and status.get("endtime", "N/A") != "N/A":
+                    elapsed = parse_robot_time_cmf(status.get("endtime")) \
+                        - parse_robot_time_cmf(status.get("starttime"))
+                    durations[elem.get("name")] = elapsed.total_seconds()
+            # 用例的关键字明细不再需要，及时释放
+            elem.clear()
+    except (ElementTree.ParseError, ValueError) as error:
+        print("[WARN] 历史执行结果解析失败，按用例数估计耗时: %s" % error)
+        return {}
+    return durations
+
+
+def balance_suites_cmf(suites, workers):
+    """
+    按估计耗时将用例文件分配给各进程（最长耗时优先，每次分给当前负载最小的进程）
+
+    suites: [(用例文件, 估计耗时), ...]
+    返回 [(负载, [用例文件, ...]), ...]，空进程不返回
+    """
+    heap = [(0.0, index, []) for index in range(max(1, min(workers, len(suites))))]
+    for suitefile, seconds in sorted(suites, key=lambda item: (-item[1], item[0])):
+        load, index, members = heapq.heappop(heap)
+        members.append(suitefile)
+        heapq.heappush(heap, (load + seconds, index, members))
+    return [(load, sorted(members)) for load, index, members in sorted(heap, key=lambda item: item[1])
+            if members]
+
+
+def robot_suite_name_cmf(path):
+    """Robot Framework根据文件/目录名生成的用例集名称"""
+    name = os.path.splitext(os.path.basename(path.rstrip("/")))[0]
+    name = re.sub(r"^[^_]*__", "", name).replace("_", " ").strip()
+    if name.islower():
+        name = " ".join(word[:1].upper() + word[1:] for word in name.split(" "))
+    return name
+
+
+def case_key_cmf(casetype, dirpath, filename):
+    """用例在清单中的键：目录用例为目录路径，文件用例为文件路径"""
+    return dirpath if casetype == "path" else dirpath + "/" + filename
+
+
+class RFSuiteEngineClass(object):
+    """
+    用例生成引擎：编号、分片、并行渲染、增量生成
+
+    用例编号规则与原生成方式一致：目录序号两位 + 文件序号两位，
+    目录的路径检查用例与其第一个文件用例同号。
+    首次生成时按遍历顺序编号；之后依据目录树清单增量生成：
+    已有目录和文件保持原编号和原分片，新增的追加编号，
+    只重新生成成员有变化的分片
+    """
+
+    def __init__(self, modulename, outputpath, filelist, testcasepath,
+                 shard_by='none', shard_size=500, jobs=None, filestat=None, full=False,
+                 spec=None):
+        self.modulename_cmv = modulename
+        self.outputpath_cmv = outputpath
+        self.filelist_cmv = filelist
+        self.testcasepath_cmv = testcasepath
+        self.shard_by_cmv = shard_by
+        self.shard_size_cmv = max(shard_size, 1)
+        self.jobs_cmv = jobs or multiprocessing.cpu_count()
+        self.filestat_cmv = filestat or {}
+        self.full_cmv = full
+        self.manifestfile_cmv = testcasepath + "/" + MANIFEST_FILE_NAME
+        self.plan_cmv = {}
+
+        self.header_cmv = {"names": {
+            "module": modulename,
+            "module_cap": modulename.capitalize(),
+            "module_upper": modulename.upper(),
+            "outputpath": outputpath,
+        }, "spec": spec}
+
+        # 断言规格变化时用例编号和分片不变，但全部用例文件需要重新生成
+        self.spechash_cmv = hashlib.sha1(
+            json.dumps(spec, ensure_ascii=False, default=str).encode("utf-8")).hexdigest()
+
+    def settings_cmf(self):
+        """影响用例内容和分片的生成参数，变化时需要全部重新生成"""
+        return {
+            "version": MANIFEST_VERSION,
+            "outputpath": self.outputpath_cmv,
+            "shard_by": self.shard_by_cmv,
+            "shard_size": self.shard_size_cmv,
+        }
+
+    def cases_cmf(self):
+        """
+        按目录生成用例列表（按遍历顺序编号）
+
+        返回 [[(用例类型, 目录序号, 文件序号, 目录, 文件名), ...], ...]，每个目录一组
+        """
+        groups = []
+        pathindex = 1
+        for list_item in self.filelist_cmv:
+            for outputfilepath, outputfile in list_item.items():
+                cases = [("path", pathindex, 1, outputfilepath, None)]
+                for fileindex, outputfile_item in enumerate(outputfile, 1):
+                    cases.append(("file", pathindex, fileindex, outputfilepath, outputfile_item))
+                groups.append(cases)
+                pathindex = pathindex + 1
+        return groups
+
+    def shards_cmf(self):
+        """
+        将用例划分为若干分片
+
+        dir: 每个目录一个分片；count: 按顺序装箱，每片最多 shard_size 个用例；
+        none: 全部用例一个分片
+        """
+        groups = self.cases_cmf()
+        if self.shard_by_cmv == 'none':
+            return [[case for cases in groups for case in cases]]
+        if self.shard_by_cmv == 'dir':
+            return groups
+
+        shards = []
+        current = []
+        for cases in groups:
+            for case in cases:
+                if len(current) >= self.shard_size_cmv:
+                    shards.append(current)
+                    current = []
+                current.append(case)
+        if current:
+            shards.append(current)
+        return shards
+
+    def suitefile_cmf(self, shardindex):
+        """分片编号对应的用例文件路径"""
+        if self.shard_by_cmv == 'none':
+            return self.testcasepath_cmv + "/" + SUITE_FILE_NAME
+        return self.testcasepath_cmv + "/" + SUITE_SHARD_FILE_NAME % shardindex
+
+    def load_manifest_cmf(self):
+        """读取上次生成的清单，不存在、损坏或生成参数变化时返回None"""
+        if self.full_cmv or not os.path.exists(self.manifestfile_cmv):
+            return None
+        try:
+            with open(self.manifestfile_cmv, mode='r') as manifestfile:
+                manifest = json.load(manifestfile)
+        except (OSError, ValueError) as error:
+            print("[WARN] 清单文件读取失败，全部重新生成: %s" % error)
+            return None
+        if manifest.get("settings") != self.settings_cmf():
+            print("[INFO] 生成参数有变化，全部重新生成")
+            return None
+        return manifest
+
+    def build_manifest_cmf(self, plan, nextfile):
+        """根据分片计划生成清单"""
+        dirs = {}
+        files = {}
+        for shardindex, cases in plan.items():
+            for casetype, pathindex, fileindex, dirpath, filename in cases:
+                if casetype == "path":
+                    dirs[dirpath] = {"index": pathindex, "shard": shardindex,
+                                     "next_file": nextfile[dirpath]}
+                    continue
+                filepath = dirpath + "/" + filename
+                size, mtime = self.filestat_cmv.get(filepath, (-1, 0))
+                files[filepath] = {"index": fileindex, "shard": shardindex,
+                                   "size": size, "mtime": mtime}
+        return {"settings": self.settings_cmf(), "spec": self.spechash_cmv,
+                "dirs": dirs, "files": files}
+
+    def fresh_plan_cmf(self):
+        """全量生成：按遍历顺序编号和分片"""
+        plan = dict(enumerate(self.shards_cmf(), 1))
+        nextfile = {}
+        for list_item in self.filelist_cmv:
+            for outputfilepath, outputfile in list_item.items():
+                nextfile[outputfilepath] = len(outputfile) + 1
+        return plan, self.build_manifest_cmf(plan, nextfile)
+
+    def incremental_plan_cmf(self, previous):
+        """
+        增量生成：已有用例沿用清单中的编号和分片，新增用例追加编号并放入有空位的分片
+
+        返回 (分片计划, 新清单, 变化统计)
+        """
+        prevdirs = previous["dirs"]
+        prevfiles = previous["files"]
+
+        assigned = {}       # 用例键 -> 分片
+        counts = {}         # 分片 -> 用例数
+        nextfile = {}
+        pathindexes = {}
+        cases = []          # (用例类型, 目录序号, 文件序号, 目录, 文件名)，序号为None表示新增
+        stats = {"added": 0, "removed": 0, "modified": 0}
+
+        # 第一遍：沿用已有目录和文件的编号与分片
+        for list_item in self.filelist_cmv:
+            for outputfilepath, outputfile in list_item.items():
+                prevdir = prevdirs.get(outputfilepath)
+                if prevdir is not None:
+                    pathindexes[outputfilepath] = prevdir["index"]
+                    nextfile[outputfilepath] = prevdir["next_file"]
+                    assigned[outputfilepath] = prevdir["shard"]
+                    counts[prevdir["shard"]] = counts.get(prevdir["shard"], 0) + 1
+                cases.append(("path", outputfilepath, None))
+
+                for outputfile_item in outputfile:
+                    filepath = outputfilepath + "/" + outputfile_item
+                    prevfile = prevfiles.get(filepath)
+                    if prevfile is None:
+                        stats["added"] += 1
+                    else:
+                        assigned[filepath] = prevfile["shard"]
+                        counts[prevfile["shard"]] = counts.get(prevfile["shard"], 0) + 1
+                        if [prevfile["size"], prevfile["mtime"]] != list(
+                                self.filestat_cmv.get(filepath, (-1, 0))):
+                            stats["modified"] += 1
+                    cases.append(("file", outputfilepath, outputfile_item))
+
+        stats["removed"] = sum(1 for filepath in prevfiles if filepath not in self.filestat_cmv)
+
+        # 第二遍：为新增的目录和文件分配编号和分片
+        nextpath = max([d["index"] for d in prevdirs.values()] or [0]) + 1
+        maxshard = max(list(counts) + [d["shard"] for d in prevdirs.values()] or [0])
+        fileindexes = {}
+        lastshard = None
+        plan = {}
+
+        for casetype, dirpath, filename in cases:
+            key = case_key_cmf(casetype, dirpath, filename)
+            if casetype == "path":
+                lastshard = None
+                if dirpath not in pathindexes:
+                    pathindexes[dirpath] = nextpath
+                    nextfile[dirpath] = 1
+                    nextpath = nextpath + 1
+                fileindex = 1
+            else:
+                prevfile = prevfiles.get(key)
+                if prevfile is not None:
+                    fileindex = prevfile["index"]
+                else:
+                    fileindex = nextfile[dirpath]
+                    nextfile[dirpath] = fileindex + 1
+
+            shardindex = assigned.get(key)
+            if shardindex is None:
+                shardindex, maxshard = self.place_cmf(lastshard, maxshard, counts)
+                counts[shardindex] = counts.get(shardindex, 0) + 1
+            lastshard = shardindex
+            plan.setdefault(shardindex, []).append(
+                (casetype, pathindexes[dirpath], fileindex, dirpath, filename))
+
+        # 分片内按编号排序，目录用例排在同号文件用例之前
+        for shardcases in plan.values():
+            shardcases.sort(key=lambda case: (case[1], case[2], case[0] != "path"))
+
+        return plan, self.build_manifest_cmf(plan, nextfile), stats
+
+    def place_cmf(self, lastshard, maxshard, counts):
+        """为新增用例选择分片，返回 (分片, 当前最大分片号)"""
+        if self.shard_by_cmv == 'none':
+            return 1, max(maxshard, 1)
+        if self.shard_by_cmv == 'dir':
+            # 目录用例开新分片，文件用例跟随所在目录
+            if lastshard is not None:
+                return lastshard, maxshard
+            return maxshard + 1, maxshard + 1
+        # count：优先同目录上一个用例所在分片，其次最后一个分片，都满了开新分片
+        for shardindex in (lastshard, maxshard):
+            if shardindex and counts.get(shardindex, 0) < self.shard_size_cmv:
+                return shardindex, maxshard
+        return maxshard + 1, maxshard + 1
+
+    def members_cmf(self, manifest):
+        """清单中每个分片包含的用例键"""
+        members = {}
+        for key, item in list(manifest["dirs"].items()) + list(manifest["files"].items()):
+            members.setdefault(item["shard"], set()).add(key)
+        return members
+
+    def generate_cmf(self):
+        """
+        生成用例文件：有清单时只重新生成变化的分片，多个分片时并行写出
+        """
+        previous = self.load_manifest_cmf()
+        if previous is None:
+            plan, manifest = self.fresh_plan_cmf()
+            dirty = set(plan)
+        else:
+            plan, manifest, stats = self.incremental_plan_cmf(previous)
+            prevmembers = self.members_cmf(previous)
+            newmembers = self.members_cmf(manifest)
+            if previous.get("spec") != self.spechash_cmv:
+                print("[INFO] 断言规格有变化，全部用例文件重新生成")
+                dirty = set(plan)
+            else:
+                dirty = set(index for index in plan
+                            if newmembers.get(index) != prevmembers.get(index)
+                            or not os.path.exists(self.suitefile_cmf(index)))
+            print("[INFO] 增量生成：新增 %d 个文件，删除 %d 个，修改 %d 个（修改不影响用例内容）"
+                  % (stats["added"], stats["removed"], stats["modified"]))
+
+        self.plan_cmv = plan
+        tasks = [(self.header_cmv, self.suitefile_cmf(index), plan[index])
+                 for index in sorted(dirty)]
+
+        if len(tasks) > 1 and self.jobs_cmv > 1:
+            chunksize = max(1, len(tasks) // (self.jobs_cmv * 4))
+            with ProcessPoolExecutor(max_workers=self.jobs_cmv) as executor:
+                results = list(executor.map(write_suite_cmf, tasks, chunksize=chunksize))
+        else:
+            results = [write_suite_cmf(task) for task in tasks]
+
+        # 清理不再需要的分片文件
+        keep = set(self.suitefile_cmf(index) for index in plan)
+        for filename in os.listdir(self.testcasepath_cmv):
+            suitefile = self.testcasepath_cmv + "/" + filename
+            if filename.startswith(SUITE_FILE_NAME[:-len(".robot")]) and filename.endswith(".robot") \
+                    and suitefile not in keep:
+                os.remove(suitefile)
+
+        with open(self.manifestfile_cmv, mode='w') as manifestfile:
+            json.dump(manifest, manifestfile, ensure_ascii=False)
+
+        casecount = sum(len(cases) for cases in plan.values())
+        writtencount = sum(1 for _, _, written in results if written)
+        print("[INFO] 共 %d 个用例，%d 个用例文件，重新生成 %d 个" % (casecount, len(plan), writtencount))
+        return results
+
+    def estimate_suites_cmf(self, durations):
+        """
+        按历史用例耗时估计每个用例文件的执行时间
+
+        用例编号在增量生成中保持不变，因此按用例名称匹配历史耗时；
+        新增用例按历史平均耗时估计。返回 [(用例文件, 估计耗时), ...]
+        """
+        average = sum(durations.values()) / len(durations) if durations else DEFAULT_CASE_SECONDS
+        module_upper = self.header_cmv["names"]["module_upper"]
+        suites = []
+        for index in sorted(self.plan_cmv):
+            seconds = 0.0
+            for casetype, pathindex, fileindex, _, _ in self.plan_cmv[index]:
+                seconds += durations.get(case_name_cmf(module_upper, casetype, pathindex, fileindex),
+                                         average)
+            suites.append((self.suitefile_cmf(index), seconds))
+        return suites
+
+
 #############################################################
 # Robot Framework测试文件创建类
 #############################################################
@@ -116,7 +975,9 @@ class RFTestFileCreateClass(object):
     根据被测对象生成Robot Framework测试用例和库文件
     """
 
-    def __init__(self, filepath, filelist):
+    def __init__(self, filepath, filelist, shard_by='none', shard_size=500, jobs=None,
+                 filestat=None, full=False, spec=None, runner='serial', workers=None,
+                 history=HISTORY_OUTPUT_FILE):
         """
         初始化测试文件创建器
         """
@@ -137,10 +998,18 @@ class RFTestFileCreateClass(object):
             os.makedirs(self.librariespath_cmv)
 
         self.outputfilepath_cmv = filepath
-        self.rftestfile_cmv = self.testcasepath_cmv + "/" + "01_Compilation_Output_Check.robot"
+        self.rftestfile_cmv = self.testcasepath_cmv + "/" + SUITE_FILE_NAME
+
+        # 用例生成引擎
+        self.engine_cmv = RFSuiteEngineClass(self.modulename_cmv, filepath, filelist,
+                                             self.testcasepath_cmv, shard_by, shard_size, jobs,
+                                             filestat, full, spec)
 
         self.librariesfile_cmv = self.librariespath_cmv + "/" + "Test" + self.modulename_cmv.capitalize() + ".py"
         self.runbashsh_cmv = "run_" + self.modulename_cmv + ".sh"
+        self.runner_cmv = runner
+        self.workers_cmv = workers or multiprocessing.cpu_count()
+        self.history_cmv = history
 
         # 生成文件
         self.rftestfilecreate_cmf()
@@ -149,191 +1018,30 @@ class RFTestFileCreateClass(object):
 
     def rftestfilecreate_cmf(self):
         """
-        生成Robot Framework测试用例文件
-        """
-        with open(self.rftestfile_cmv, mode='w') as rftestfile:
-            # 写入Settings部分
-            rftestfile.write(
-                "*** Settings ***\nForce Tags        priority-P0    owner-xiaoxiong.he    branch-dev\n")
-            rftestfile.write("Documentation     Basic test for " + self.outputfilepath_cmv + "\n")
-            rftestfile.write(
-                "Library           ../../libraries/" + self.modulename_cmv + "/Test" + self.modulename_cmv.capitalize() + ".py\n")
-            
-            # 写入Variables部分
-            rftestfile.write("\n*** Variables ***\n")
-            self.outputfile_cmv = "${AD_" + self.modulename_cmv.upper() + "_DIR}"
-            rftestfile.write(self.outputfile_cmv + "    " + self.outputfilepath_cmv + "\n")
-
-            # 写入Test Cases部分
-            rftestfile.write("\n*** Test Cases ***\n")
-
-            self.pathindex = 1
-            for list_item in self.filelist_cmv:
-                for outputfilepath, outputfile in list_item.items():
-                    self.fileindex = 1
-
-                    # 生成路径检查用例
-                    caseindex = ("%02d%02d") % (self.pathindex, self.fileindex)
-                    rftestfile.write(
-                        "AD_" + self.modulename_cmv.upper() + "_OUTPUT_CHECK_" + caseindex + " Compilation_Path_Check\n")
-
-                    rftestfile.write("    [Documentation]    " + self.modulename_cmv.capitalize() + \
-                                     " Compile output path detection\n")
-                    rftestfile.write("    [Timeout]          300\n    [Setup]            Setup\n")
-                    rftestfile.write("    ${Returnvar} =     Compilation Path Check    " + outputfilepath + "\n")
-                    rftestfile.write("    SHOULD BE TRUE     ${Returnvar}\n")
-                    rftestfile.write("    [Teardown]         Teardown\n")
-                    rftestfile.write("\n\n")
-
-                    # 生成文件检查用例
-                    for outputfile_item in outputfile:
-                        caseindex = ("%02d%02d") % (self.pathindex, self.fileindex)
-                        rftestfile.write(
-                            "AD_" + self.modulename_cmv.upper() + "_OUTPUT_CHECK_" + caseindex + " Compilation_File_Check\n")
-
-                        rftestfile.write(
-                            "    [Documentation]    " + outputfilepath + " Compile output file detection\n")
-                        rftestfile.write("    [Timeout]          300\n    [Setup]            Setup\n")
-                        rftestfile.write("    ${Filepath} =    CATENATE    " + outputfilepath + "\n")
-                        rftestfile.write("    ${Returnvar} =     Compilation File Check    ${Filepath}    " + \
-                                         outputfile_item + "\n")
-                        rftestfile.write("    SHOULD BE TRUE     ${Returnvar}\n")
-                        
-                        # 读取文件内容
-                        rftestfile.write("    ${data} =     read_file    ${Filepath}    " + \
-                                         outputfile_item + "\n")
-                        
-                        # 根据用例编号添加特定断言
-                        if caseindex=="0101":
-                            rftestfile.write("    ${a}=         arrest_result    ${data}     $.file_cache.cache_path    transparent-cache/file\n")
-                            rftestfile.write("    SHOULD BE TRUE     ${a}\n")
-                        if caseindex=="0102":
-                            rftestfile.write("    ${b}=         arrest_result    ${data}     $.identify.algorithmVersion    CSVEHXV_v1.5.0.0\n")
-                            rftestfile.write("    SHOULD BE TRUE     ${b}\n")
-                        if caseindex=="0103":
-                            rftestfile.write("    ${c}=         arrest_result    ${data}     $.CommonConfig.CollectMode    RMS\n")
-                            rftestfile.write("    SHOULD BE TRUE     ${c}\n")
-                        if caseindex=="0104":
-                            rftestfile.write("    ${d}=         arrest_result    ${data}     $.ins.shiftSwitch    1\n")
-                            rftestfile.write("    SHOULD BE TRUE     ${d}\n")
-                            
-                        rftestfile.write("    [Teardown]         Teardown\n")
-                        rftestfile.write("\n\n")
-                        self.fileindex = self.fileindex + 1
-
-                self.pathindex = self.pathindex + 1
+        生成Robot Framework测试用例文件（按分片方式生成一个或多个文件）
+        """
+        return self.engine_cmv.generate_cmf()
 
     def librariesfilecreate_cmf(self):
         """
         生成Python测试库文件
         """
-        with open(self.librariesfile_cmv, mode='w') as librariesfile:
-            librariesfile.write("#!/usr/bin/python\n# -*- coding:utf-8 -*-\n")
-            librariesfile.write("#############################################################\n")
-            librariesfile.write("#   > File Name: Test" + self.modulename_cmv.capitalize() + ".py\n")
-            librariesfile.write("#   > Author: Auto Generated\n")
-            librariesfile.write("#   > Mail:\n")
-
-            now = datetime.datetime.now()
-            librariesfile.write("#   > Created Time: " + str(now) + "\n")
-            librariesfile.write("#############################################################\n\n")
-
-            # 导入必要的库
-            librariesfile.write("import os.path\nimport os\nimport time\nimport threading\nimport multiprocessing\n")
-            librariesfile.write("import datetime\nimport argparse\nimport sys\nimport platform\nimport re\n" + \
-                                "import psutil\nimport json\nimport jsonpath\nimport yaml\n")
-
-            librariesfile.write("\n#############################################################\n")
-            librariesfile.write("# 测试库类\n")
-            librariesfile.write("#############################################################\n")
-            
-            # 创建测试类
-            librariesfile.write("class Test" + self.modulename_cmv.capitalize() + "(object):\n")
-            librariesfile.write("    def __init__(self):\n")
-            librariesfile.write("        print(\"[INFO] 初始化测试库\")\n\n")
-            
-            librariesfile.write("    def setup(self):\n")
-            librariesfile.write("        print(\"[INFO] 测试用例Setup\")\n\n")
-            
-            librariesfile.write("    def teardown(self):\n")
-            librariesfile.write("        print(\"[INFO] 测试用例Teardown\")\n\n")
-            
-            # 路径检查方法
-            librariesfile.write("    def compilation_path_check(self, output_path):\n")
-            librariesfile.write("        \"\"\"\n")
-            librariesfile.write("        检查编译输出路径是否存在\n")
-            librariesfile.write("        \"\"\"\n")
-            librariesfile.write("        try:\n")
-            librariesfile.write("            result = os.path.exists(output_path)\n")
-            librariesfile.write("        except Exception as error:\n")
-            librariesfile.write("            result = False\n")
-            librariesfile.write("        finally:\n")
-            librariesfile.write("            return result\n\n")
-
-            # 文件检查方法
-            librariesfile.write("    def compilation_file_check(self, output_path, output_filename):\n")
-            librariesfile.write("        \"\"\"\n")
-            librariesfile.write("        检查编译输出文件是否存在\n")
-            librariesfile.write("        \"\"\"\n")
-            librariesfile.write("        try:\n")
-            librariesfile.write("            filepath = output_path + \"/\" + output_filename\n")
-            librariesfile.write("            result = os.path.isfile(filepath)\n")
-            librariesfile.write("        except Exception as error:\n")
-            librariesfile.write("            result = False\n")
-            librariesfile.write("        finally:\n")
-            librariesfile.write("            return result\n\n")
-
-            # 文件读取方法
-            librariesfile.write("    def read_file(self, output_path, output_filename):\n")
-            librariesfile.write("        \"\"\"\n")
-            librariesfile.write("        读取文件内容，支持JSON/YAML/META格式\n")
-            librariesfile.write("        \"\"\"\n")
-            librariesfile.write("        filepath = output_path + \"/\" + output_filename\n")
-            librariesfile.write("        if not os.path.exists(filepath):\n")
-            librariesfile.write("            return False\n\n")
-
-            librariesfile.write("        if filepath.endswith('.yaml'):\n")
-            librariesfile.write("            with open(filepath, 'r', encoding='utf-8') as load_f:\n")
-            librariesfile.write("                yaml_info = yaml.safe_load(load_f)\n")
-            librariesfile.write("                return yaml_info\n")
-            
-            librariesfile.write("        if filepath.endswith('.json'):\n")
-            librariesfile.write("            with open(filepath, 'r') as f:\n")
-            librariesfile.write("                data = json.load(f)\n")
-            librariesfile.write("            return data\n")
-            
-            librariesfile.write("        if filepath.endswith('.meta'):\n")
-            librariesfile.write("            with open(filepath, 'r') as s:\n")
-            librariesfile.write("                data2 = json.load(s)\n")
-            librariesfile.write("            return data2\n\n")
-
-            # 断言结果检查方法
-            librariesfile.write("    def arrest_result(self, data: dict, act, ect):\n")
-            librariesfile.write("        \"\"\"\n")
-            librariesfile.write("        使用jsonpath提取数据并断言\n")
-            librariesfile.write("        \"\"\"\n")
-            librariesfile.write("        m = jsonpath.jsonpath(data, act)\n")
-            librariesfile.write("        m = str(m[0])\n")
-            librariesfile.write("        if m:\n")
-            librariesfile.write("            if m == ect:\n")
-            librariesfile.write("                return True\n")
-            librariesfile.write("            else:\n")
-            librariesfile.write("                return False\n")
-            librariesfile.write("        else:\n")
-            librariesfile.write("            return False\n\n")
-
-            librariesfile.write("\n#############################################################\n")
-            librariesfile.write("# 主函数\n")
-            librariesfile.write("#############################################################\n")
-            librariesfile.write("if __name__ == \"__main__\":\n")
-            librariesfile.write("    test_obj = Test" + self.modulename_cmv.capitalize() + "()\n")
-            librariesfile.write("    print(\"测试库加载成功\")\n")
+        content = LIBRARY_TEMPLATE % {
+            "classname": "Test" + self.modulename_cmv.capitalize(),
+            "createtime": str(datetime.datetime.now()),
+        }
+        # 内容未变化（生成时间除外）时不重写，保持文件修改时间不变
+        write_if_changed_cmf(self.librariesfile_cmv, content,
+                             ignore_prefix="#   > Created Time:")
 
     def runbashsh_cmf(self):
         """
         生成执行脚本
         """
-        with open(self.runbashsh_cmv, mode='w') as runbashshfile:
+        if self.runner_cmv != 'serial':
+            return self.parallelrunbashsh_cmf()
+
+        with io.StringIO() as runbashshfile:
             runbashshfile.write("#!/bin/bash\n")
             runbashshfile.write(
                 "#==============================================================================================================\n")
@@ -345,6 +1053,75 @@ class RFTestFileCreateClass(object):
             runbashshfile.write("        --include priority-P0 \\\n")
             runbashshfile.write("        testcase/" + self.modulename_cmv + "/")
 
+            write_if_changed_cmf(self.runbashsh_cmv, runbashshfile.getvalue())
+
+    def parallelrunbashsh_cmf(self):
+        """
+        生成并行执行脚本
+
+        按历史执行结果中的用例耗时估计每个用例文件的执行时间并均衡分配：
+        pool 为每个进程生成一条robot命令，全部结束后用 rebot 合并为一份结果
+        （各进程的用例文件互不重叠，直接合并即可，不用 --merge，
+        合并结果中每个进程为模块下的一个子用例集）；
+        pabot 生成按耗时降序的执行顺序文件，由pabot动态调度并合并结果
+        """
+        durations = load_case_durations_cmf(self.history_cmv)
+        if durations:
+            print("[INFO] 读取历史用例耗时 %d 条: %s" % (len(durations), self.history_cmv))
+        else:
+            print("[INFO] 无历史执行结果，按用例数均衡分配: %s" % self.history_cmv)
+
+        suites = self.engine_cmv.estimate_suites_cmf(durations)
+        if len(suites) < 2:
+            print("[WARN] 只有 1 个用例文件，无法并行执行，请配合 --shard-by count 或 dir 使用")
+
+        modulename = robot_suite_name_cmf(self.modulename_cmv)
+        buckets = balance_suites_cmf(suites, self.workers_cmv)
+        total = sum(seconds for _, seconds in suites)
+        longest = max(load for load, _ in buckets) if buckets else 0.0
+        print("[INFO] 并行执行：%d 个进程，预计耗时 %.1f 秒（串行 %.1f 秒）"
+              % (len(buckets), longest, total))
+
+        with io.StringIO() as runbashshfile:
+            runbashshfile.write("#!/bin/bash\n")
+            runbashshfile.write(
+                "#==============================================================================================================\n")
+            runbashshfile.write("# Robot Framework并行执行脚本（%s，%d 个进程，按历史用例耗时分配用例文件）\n"
+                                % (self.runner_cmv, len(buckets)))
+            runbashshfile.write(
+                "#==============================================================================================================\n")
+
+            if self.runner_cmv == 'pabot':
+                orderingfile = self.testcasepath_cmv + "/" + PABOT_ORDERING_FILE_NAME
+                ordering = "".join("--suite %s.%s\n" % (modulename, robot_suite_name_cmf(suitefile))
+                                   for suitefile, _ in sorted(suites, key=lambda item: (-item[1], item[0])))
+                write_if_changed_cmf(orderingfile, ordering)
+
+                runbashshfile.write("set -ex\n")
+                runbashshfile.write("pabot --processes %d --ordering %s \\\n"
+                                    % (len(buckets), os.path.normpath(orderingfile)))
+                runbashshfile.write("        -L trace -d rfoutput " + ROBOT_FILTER_OPTIONS + " \\\n")
+                runbashshfile.write("        testcase/" + self.modulename_cmv + "/")
+            else:
+                runbashshfile.write("set -x\n")
+                runbashshfile.write("rm -rf %s\n" % PARALLEL_OUTPUT_DIR)
+                runbashshfile.write("pids=()\n")
+                for workerindex, (load, members) in enumerate(buckets, 1):
+                    runbashshfile.write("\n# 进程 %d：%d 个用例文件，预计 %.1f 秒\n"
+                                        % (workerindex, len(members), load))
+                    runbashshfile.write("robot -L trace -d %s/%02d --name \"%s %02d\" -l NONE -r NONE --runemptysuite \\\n"
+                                        % (PARALLEL_OUTPUT_DIR, workerindex, PARALLEL_SUITE_NAME, workerindex))
+                    runbashshfile.write("        " + ROBOT_FILTER_OPTIONS)
+                    for suitefile in members:
+                        runbashshfile.write(" \\\n        " + os.path.normpath(suitefile))
+                    runbashshfile.write(" &\npids+=($!)\n")
+                runbashshfile.write("\n# 等待全部进程结束（用例失败时robot返回非0，由rebot统一给出结果）\n")
+                runbashshfile.write('for pid in "${pids[@]}"; do wait "$pid" || true; done\n')
+                runbashshfile.write("rebot --name %s -d rfoutput -o output.xml \\\n" % modulename)
+                runbashshfile.write("        %s/*/output.xml" % PARALLEL_OUTPUT_DIR)
+
+            write_if_changed_cmf(self.runbashsh_cmv, runbashshfile.getvalue())
+
 
 #############################################################
 # 主函数
@@ -356,8 +1133,20 @@ if __name__ == "__main__":
     
     temp_argparse = InputArgparseClass()
     stability_args = temp_argparse.argparse_get_cmf()
-    filelist = DocumentProcessingClass(stability_args.path)
-    RFTestFileCreateClass(stability_args.path, filelist.filelist_cmv)
+    spec = None
+    if stability_args.spec:
+        try:
+            spec = load_spec_cmf(stability_args.spec)
+        except (OSError, ValueError, yaml.YAMLError) as error:
+            print("[ERROR] 断言规格文件读取失败: %s" % error)
+            sys.exit(1)
+        print("[INFO] 加载断言规格 %d 条: %s" % (len(spec), stability_args.spec))
+
+    filelist = DocumentProcessingClass(stability_args.path, stability_args.follow_symlinks)
+    RFTestFileCreateClass(stability_args.path, filelist.filelist_cmv,
+                          stability_args.shard_by, stability_args.shard_size, stability_args.jobs,
+                          filelist.filestat_cmv, stability_args.full, spec,
+                          stability_args.runner, stability_args.workers, stability_args.history)
     
     print("\n[SUCCESS] 测试用例生成完成！")
     print(f"生成位置：./testcase/{stability_args.path.split('/')[-1]}/")
@@ -0,0 +1,63 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+生成的测试库中 compile_jsonpath 快速路径与jsonpath库的一致性测试
+
+运行：python -m pytest test_compile_jsonpath.py（或 python test_compile_jsonpath.py）
+"""
+
+import os
+import sys
+import unittest
+
+import jsonpath
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from rf_testcase_generator import LIBRARY_TEMPLATE
+
+
+def load_library():
+    """渲染测试库模板并执行，返回其命名空间"""
+    source = LIBRARY_TEMPLATE % {"classname": "TestJsonpath", "createtime": ""}
+    namespace = {"__name__": "generated_library"}
+    exec(compile(source, "TestJsonpath.py", "exec"), namespace)
+    return namespace
+
+
+class CompileJsonpathTest(unittest.TestCase):
+
+    DATA = (
+        {"a": {"0": "x", "b": [1, {"c": 2}], "d-e": None}},
+        {"a": [{"0": 1}, {"b": 2}], "0": 5},
+        {"a": {"b": {"c": False}}},
+        {"a": "text", "length": 3},
+        [1, 2],
+        5,
+    )
+    EXPRESSIONS = (
+        "$", "$.a", "$.a.0", "$.a[0]", "$[0]", "$.0", "$.a.b", "$.a.b.c",
+        "$.a.d-e", "$.a.b[1].c", "$.a.x", "$.length", "$.a.length", "$..c",
+    )
+
+    @classmethod
+    def setUpClass(cls):
+        library = load_library()
+        cls.compile_jsonpath = staticmethod(library["compile_jsonpath"])
+        cls.pattern = library["SIMPLE_PATH_PATTERN"]
+
+    def test_matches_library(self):
+        for data in self.DATA:
+            for expression in self.EXPRESSIONS:
+                with self.subTest(data=data, expression=expression):
+                    self.assertEqual(self.compile_jsonpath(expression)(data),
+                                     jsonpath.jsonpath(data, expression))
+
+    def test_fast_path_only_for_dotted_names(self):
+        for expression in ("$.a", "$.a.b.c", "$.a.d-e", "$._x"):
+            self.assertIsNotNone(self.pattern.match(expression), expression)
+        for expression in ("$", "$.a.0", "$.a[0]", "$[0]", "$.0", "$..c", "$.a.*"):
+            self.assertIsNone(self.pattern.match(expression), expression)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,274 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+日志模板挖掘工具
+功能：将日志行按模板聚类（如 Speed: <num> km/h），统计每类错误信息出现的次数
+作者：何枭雄
+日期：2025-01-15
+"""
+
+import os
+import re
+import sys
+import time
+from collections import OrderedDict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'common'))
+from text_frequency_analyzer import DEFAULT_TOP_K, collect_input_files
+from profiling import profiler, add_profile_arguments, profile_session
+
+
+# 变量部分的掩码规则（按顺序替换）
+MASK_RULES = (
+    (re.compile(r'\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}:\d{2}(?:\.\d+)?'), '<ts>'),
+    (re.compile(r'\b0[xX][0-9a-fA-F]+\b'), '<hex>'),
+    (re.compile(r'\b(?=[0-9a-fA-F]*\d)(?=[0-9a-fA-F]*[a-fA-F])[0-9a-fA-F]{8,}\b'), '<hex>'),
+    (re.compile(r'(?<![A-Za-z_])[-+]?\d+(?:\.\d+)?(?![A-Za-z_])'), '<num>'),
+)
+
+# 模板中的通配符
+WILDCARD = '<*>'
+
+# 默认参数
+DEFAULT_DEPTH = 4            # 前缀树深度（与Drain一致，含根节点和单词数层，按前 depth-2 个单词分流）
+MIN_DEPTH = 3
+DEFAULT_SIMILARITY = 0.5     # 归入已有模板的最低相似度
+DEFAULT_MAX_CHILDREN = 100   # 每个树节点的最大子节点数
+DEFAULT_CACHE_SIZE = 10000   # LRU缓存的掩码行数
+
+
+def mask_line(line):
+    """将时间戳、十六进制ID、数字替换为占位符"""
+    for pattern, placeholder in MASK_RULES:
+        line = pattern.sub(placeholder, line)
+    return line
+
+
+def _is_variable(token):
+    """含占位符或数字的单词不作为前缀树的分支键"""
+    return '<' in token or any(ch.isdigit() for ch in token)
+
+
+class LogCluster(object):
+    """一个日志模板及其出现次数"""
+
+    __slots__ = ('cluster_id', 'tokens', 'count')
+
+    def __init__(self, cluster_id, tokens):
+        self.cluster_id = cluster_id
+        self.tokens = tokens
+        self.count = 0
+
+    @property
+    def template(self):
+        return ' '.join(self.tokens)
+
+    def similarity(self, tokens):
+        """相同位置上相等的单词占比（模板中的通配符不计入）"""
+        same = 0
+        for template_token, token in zip(self.tokens, tokens):
+            if template_token == token and template_token != WILDCARD:
+                same += 1
+        return same / len(tokens) if tokens else 1.0
+
+    def merge(self, tokens):
+        """与新日志行合并，不同位置替换为通配符"""
+        self.tokens = [t if t == token else WILDCARD for t, token in zip(self.tokens, tokens)]
+
+
+class LogTemplateMiner(object):
+    """
+    Drain风格的日志模板挖掘器
+
+    前缀树深度与Drain一致：根节点和单词数层各算一层，之后按前 depth-2 个单词逐层分流
+    （depth=4 时按前2个单词），
+    叶子节点内按相似度归入已有模板或新建模板。
+    已匹配过的掩码行记录在LRU缓存中，重复出现时直接命中，跳过树查找。
+    """
+
+    def __init__(self, depth=DEFAULT_DEPTH, similarity=DEFAULT_SIMILARITY,
+                 max_children=DEFAULT_MAX_CHILDREN, cache_size=DEFAULT_CACHE_SIZE):
+        if depth < MIN_DEPTH:
+            raise ValueError(f"前缀树深度不能小于{MIN_DEPTH}: {depth}")
+        # 分流的单词数（根节点、单词数层之外的层数）
+        self.depth = depth - 2
+        self.similarity = similarity
+        self.max_children = max_children
+        self.cache_size = cache_size
+
+        self.root = {}
+        self.clusters = []
+        self.cache = OrderedDict()
+        self.cache_hits = 0
+        self.line_count = 0
+
+    def add_line(self, line):
+        """处理一行日志，返回其所属模板"""
+        line = line.strip()
+        if not line:
+            return None
+        self.line_count += 1
+
+        masked = mask_line(line)
+
+        # 热路径：缓存命中直接计数（模板只会泛化，已匹配的行始终匹配）
+        cache = self.cache
+        cluster = cache.get(masked)
+        if cluster is not None:
+            cache.move_to_end(masked)
+            cluster.count += 1
+            self.cache_hits += 1
+            return cluster
+
+        tokens = masked.split()
+        cluster = self._match(tokens)
+        cluster.count += 1
+
+        cache[masked] = cluster
+        if len(cache) > self.cache_size:
+            cache.popitem(last=False)
+        return cluster
+
+    def _match(self, tokens):
+        """在前缀树中查找最相似的模板，找不到则新建"""
+        node = self.root.setdefault(len(tokens), {})
+        for token in tokens[:self.depth]:
+            key = WILDCARD if _is_variable(token) else token
+            if key not in node:
+                # 子节点过多时归入通配分支，防止树无限膨胀
+                if len(node) >= self.max_children:
+                    key = WILDCARD
+                node = node.setdefault(key, {})
+            else:
+                node = node[key]
+
+        leaf = node.setdefault(None, [])
+        best, best_similarity = None, -1.0
+        for cluster in leaf:
+            similarity = cluster.similarity(tokens)
+            if similarity > best_similarity:
+                best, best_similarity = cluster, similarity
+
+        if best is not None and best_similarity >= self.similarity:
+            best.merge(tokens)
+            return best
+
+        cluster = LogCluster(len(self.clusters) + 1, list(tokens))
+        self.clusters.append(cluster)
+        leaf.append(cluster)
+        return cluster
+
+    def mine_file(self, input_file, encoding='UTF-8'):
+        """逐行处理文件"""
+        add_line = self.add_line
+        lines, hits = self.line_count, self.cache_hits
+        with profiler.stage('read+parse'), open(input_file, 'r', encoding=encoding, errors='replace') as f:
+            for line in f:
+                add_line(line)
+        profiler.count('lines', self.line_count - lines)
+        profiler.count('cache_hits', self.cache_hits - hits)
+
+    def top_templates(self, top_k=None):
+        """按出现次数降序返回模板列表"""
+        clusters = sorted(self.clusters, key=lambda c: c.count, reverse=True)
+        return clusters[:top_k] if top_k else clusters
+
+
+def print_templates(miner, top_k=DEFAULT_TOP_K, elapsed=0.0):
+    """
+    打印模板统计结果
+    """
+    print("="*60)
+    print("日志模板统计结果")
+    print("="*60)
+    print(f'共处理 {miner.line_count} 行日志')
+    print(f'一共有 {len(miner.clusters)} 个不同的模板')
+    if miner.line_count:
+        print(f'缓存命中率: {miner.cache_hits / miner.line_count * 100:.1f}%')
+    if elapsed > 0:
+        print(f'处理速度: {miner.line_count / elapsed:.0f} 行/秒')
+    print("="*60)
+
+    templates = miner.top_templates(top_k)
+    if top_k and top_k < len(miner.clusters):
+        print(f"\n模板出现次数（前 {top_k} 项，降序排列）：\n")
+    else:
+        print("\n模板出现次数（降序排列）：\n")
+
+    for cluster in templates:
+        print(f"[{cluster.template}] 共出现 {cluster.count} 次")
+
+
+def export_templates(miner, output_file):
+    """导出全部模板为CSV"""
+    import csv
+
+    with open(output_file, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.writer(f)
+        writer.writerow(['template_id', 'template', 'count'])
+        for cluster in miner.top_templates():
+            writer.writerow([cluster.cluster_id, cluster.template, cluster.count])
+    print(f"[INFO] 模板统计已导出到: {output_file}")
+
+
+def main():
+    """
+    主函数
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(description='日志模板挖掘工具 - 按模板统计错误信息')
+    parser.add_argument('-i', '--input', required=True, nargs='+',
+                        help='输入日志文件或目录路径，可指定多个')
+    parser.add_argument('-e', '--encoding', default='UTF-8', help='文件编码（默认UTF-8）')
+    parser.add_argument('-p', '--pattern', default='**/*',
+                        help='输入为目录时的文件匹配模式（默认 **/*）')
+    parser.add_argument('-k', '--top', type=int, default=DEFAULT_TOP_K,
+                        help=f'只输出前K个模板（默认{DEFAULT_TOP_K}，0表示全部）')
+    parser.add_argument('-o', '--output', help='导出全部模板统计的CSV文件路径')
+    parser.add_argument('--depth', type=int, default=DEFAULT_DEPTH,
+                        help=f'前缀树深度，与Drain一致含根节点和单词数层，按前 depth-2 个单词分流'
+                             f'（默认{DEFAULT_DEPTH}，最小{MIN_DEPTH}）')
+    parser.add_argument('--sim', type=float, default=DEFAULT_SIMILARITY,
+                        help=f'归入已有模板的相似度阈值（默认{DEFAULT_SIMILARITY}）')
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_SIZE,
+                        help=f'LRU缓存大小（默认{DEFAULT_CACHE_SIZE}）')
+    add_profile_arguments(parser)
+
+    args = parser.parse_args()
+    if args.depth < MIN_DEPTH:
+        parser.error(f'前缀树深度 --depth 不能小于{MIN_DEPTH}')
+
+    input_files = collect_input_files(args.input, args.pattern)
+    if not input_files:
+        print(f"[错误] 未找到输入文件: {' '.join(args.input)}")
+        print("\n[FAILED] 分析失败！")
+        return
+
+    miner = LogTemplateMiner(depth=args.depth, similarity=args.sim,
+                             cache_size=args.cache_size)
+
+    with profile_session(args):
+        start = time.perf_counter()
+        for input_file in input_files:
+            print(f"[INFO] 开始分析文件: {input_file}")
+            try:
+                miner.mine_file(input_file, args.encoding)
+            except FileNotFoundError:
+                print(f"[错误] 文件不存在: {input_file}")
+            except Exception as e:
+                print(f"[错误] 读取文件失败: {input_file}: {str(e)}")
+        elapsed = time.perf_counter() - start
+        profiler.count('templates', len(miner.clusters))
+
+        if miner.clusters:
+            with profiler.stage('write'):
+                print_templates(miner, args.top, elapsed)
+                if args.output:
+                    export_templates(miner, args.output)
+            print("\n[SUCCESS] 分析完成！")
+        else:
+            print("\n[FAILED] 分析失败！")
+
+if __name__ == '__main__':
+    main()
@@ -2,85 +2,548 @@
 # -*- coding: utf-8 -*-
 """
 文本字符频率分析工具
-功能：统计文本文件中每个字符出现的频率
+功能：统计文本文件中字符、单词、n-gram或正则关键字出现的频率
 作者：何枭雄
 日期：2021-06-15
 """
 
-def analyze_text_frequency(input_file, encoding='UTF-8'):
+import codecs
+import heapq
+import io
+import os
+import re
+import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'common'))
+from profiling import profiler, add_profile_arguments, profile_session
+
+
+# 流式读取的块大小（字符数）
+CHUNK_SIZE = 1 << 20
+
+# 多文件模式下大文件的切分大小（字节）
+SPLIT_SIZE = 64 << 20
+
+# 默认只输出出现次数最多的前K项
+DEFAULT_TOP_K = 20
+
+# 单词/n-gram/关键字模式下Space-Saving摘要默认跟踪的条目数
+DEFAULT_CAPACITY = 10000
+
+# 单词切分规则
+WORD_PATTERN = re.compile(r'\w+')
+
+# 统计模式
+MODES = ('char', 'word', 'ngram', 'keyword')
+
+# 可以按字节安全切分的编码（换行符b'\n'不会出现在多字节字符内部）
+_SPLITTABLE_ENCODINGS = ('utf-8', 'ascii')
+
+
+def count_characters(f, chunk_size=CHUNK_SIZE):
+    """
+    按块流式统计字符出现次数
+    
+    与逐行处理的语义一致：每行去除首尾空白、跳过空行，换行符不计入。
+    跨块的行通过“当前行是否已出现非空白字符”和“行尾待定空白”两个状态衔接，
+    内存占用只与块大小有关。
+    
+    Args:
+        f: 以文本模式打开的文件对象
+        chunk_size: 每次读取的字符数
+    
+    Returns:
+        counter: 字符计数（按字符首次出现顺序）
+        total_chars: 总字符数
+    """
+    counter = Counter()
+    total_chars = 0
+    started = False     # 当前行是否已出现非空白字符
+    pending = ''        # 当前行尾部的空白，后面再出现非空白字符时才计入
+    
+    def feed(segment):
+        """处理当前行的一段（尚未遇到行尾）"""
+        nonlocal total_chars, started, pending
+        if not started:
+            segment = segment.lstrip()
+            if not segment:
+                return
+            started = True
+        body = segment.rstrip()
+        if body:
+            text = pending + body
+            counter.update(text)
+            total_chars += len(text)
+            pending = segment[len(body):]
+        else:
+            pending += segment
+    
+    while True:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            break
+        
+        lines = chunk.split('\n')
+        # 第一段接续上一块未结束的行
+        feed(lines[0])
+        if len(lines) == 1:
+            continue
+        
+        # 中间各段都是完整的行，合并后一次计数
+        started = False
+        pending = ''
+        middle = ''.join([line.strip() for line in lines[1:-1]])
+        counter.update(middle)
+        total_chars += len(middle)
+        
+        # 最后一段是下一行的开头
+        feed(lines[-1])
+    
+    return counter, total_chars
+
+
+class SpaceSaving(object):
+    """
+    Space-Saving Top-K频率摘要
+    
+    最多跟踪 capacity 个条目，内存有界。摘要已满时新条目替换计数最小的条目，
+    并继承其计数作为误差上界。计数总和始终等于输入条目总数；
+    真实频率大于 总数/capacity 的条目一定会被保留。
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {}
+        # 最小堆，每个条目一项，计数可能过期（懒更新），弹出时再校正
+        self._heap = []
+
+    def __len__(self):
+        return len(self.counts)
+
+    def _evict_min(self):
+        """移除当前计数最小的条目，返回其计数"""
+        heap = self._heap
+        counts = self.counts
+        while True:
+            count, item = heap[0]
+            actual = counts[item]
+            if actual == count:
+                heapq.heappop(heap)
+                del counts[item]
+                del self.errors[item]
+                return count
+            heapq.heapreplace(heap, (actual, item))
+
+    def add(self, item, count=1):
+        counts = self.counts
+        if item in counts:
+            counts[item] += count
+            return
+        error = 0
+        if len(counts) >= self.capacity:
+            error = self._evict_min()
+        counts[item] = error + count
+        self.errors[item] = error
+        heapq.heappush(self._heap, (error + count, item))
+
+    def update(self, items):
+        counts = self.counts
+        add = self.add
+        for item in items:
+            if item in counts:
+                counts[item] += 1
+            else:
+                add(item)
+
+    def min_count(self):
+        """摘要已满时未跟踪条目的真实计数上界（最小计数），未满时为0"""
+        if len(self.counts) < self.capacity:
+            return 0
+        return min(self.counts.values())
+
+    def merge(self, other):
+        """
+        合并另一个摘要（可合并Space-Saving）
+
+        一方未跟踪的条目在该方的真实计数最多为该方的最小计数，
+        因此计数和误差都加上对方的最小计数（对方未满时为0），
+        再保留计数最大的 capacity 项，合并后的误差上界仍然成立
+        """
+        self_min = self.min_count()
+        other_min = other.min_count()
+        counts, errors = self.counts, self.errors
+        for item in counts:
+            if item not in other.counts:
+                counts[item] += other_min
+                errors[item] += other_min
+        for item, count in other.counts.items():
+            if item in counts:
+                counts[item] += count
+                errors[item] += other.errors[item]
+            else:
+                counts[item] = count + self_min
+                errors[item] = other.errors[item] + self_min
+        if len(self.counts) > self.capacity:
+            keep = heapq.nlargest(self.capacity, self.counts.items(), key=lambda e: e[1])
+            self.counts = dict(keep)
+            self.errors = {item: self.errors[item] for item in self.counts}
+        self._heap = [(count, item) for item, count in self.counts.items()]
+        heapq.heapify(self._heap)
+
+    def most_common(self, n=None):
+        """按计数降序返回 (条目, 计数) 列表"""
+        if n is None:
+            return sorted(self.counts.items(), key=lambda e: e[1], reverse=True)
+        return heapq.nlargest(n, self.counts.items(), key=lambda e: e[1])
+
+
+def make_tokenizer(mode, ngram=2, keywords=None):
+    """
+    根据统计模式生成切分函数：输入一行文本，返回该行中的条目
+    
+    Args:
+        mode: word（单词）、ngram（连续n个单词）、keyword（正则关键字）
+        ngram: n-gram的单词数
+        keywords: 正则表达式列表，有分组时统计第一个分组，否则统计整个匹配
+    """
+    findall = WORD_PATTERN.findall
+    
+    if mode == 'word':
+        return findall
+    
+    if mode == 'ngram':
+        def tokenize(line):
+            words = findall(line)
+            return [' '.join(words[i:i + ngram]) for i in range(len(words) - ngram + 1)]
+        return tokenize
+    
+    if mode == 'keyword':
+        patterns = [re.compile(k) for k in keywords or []]
+        
+        def tokenize(line):
+            tokens = []
+            for pattern in patterns:
+                if pattern.groups:
+                    # 第一个分组未参与匹配（如可选分组）时统计整个匹配
+                    tokens.extend(m.group(1) if m.group(1) is not None else m.group(0)
+                                  for m in pattern.finditer(line))
+                else:
+                    tokens.extend(pattern.findall(line))
+            return tokens
+        return tokenize
+    
+    raise ValueError(f"不支持的统计模式: {mode}")
+
+
+def new_summary(capacity):
+    """capacity为0时精确计数，否则使用有界的Space-Saving摘要"""
+    return SpaceSaving(capacity) if capacity else Counter()
+
+
+def top_items(summary, top_k=None):
+    """
+    取计数最大的前top_k项（None或0表示全部），只对这些项排序
+    
+    Returns:
+        Counter为 [(条目, 计数), ...]；Space-Saving摘要为 [(条目, 计数, 误差上界), ...]
+    """
+    rate = summary.most_common(top_k or None)
+    if isinstance(summary, SpaceSaving):
+        errors = summary.errors
+        rate = [(item, count, errors[item]) for item, count in rate]
+    return rate
+
+
+def count_tokens(f, tokenize, summary):
+    """逐行切分并计数，返回 (摘要, 条目总数)"""
+    update = summary.update
+    total = 0
+    for line in f:
+        tokens = tokenize(line)
+        total += len(tokens)
+        update(tokens)
+    return summary, total
+
+
+def analyze_token_frequency(input_file, mode='word', encoding='UTF-8', ngram=2,
+                            keywords=None, capacity=DEFAULT_CAPACITY, top_k=None):
+    """
+    分析文本文件中单词、n-gram或正则关键字出现的频率
+    
+    Args:
+        input_file: 输入文件路径
+        mode: 统计模式（word/ngram/keyword）
+        encoding: 文件编码，默认UTF-8
+        ngram: n-gram的单词数
+        keywords: keyword模式下的正则表达式列表
+        capacity: Space-Saving摘要跟踪的条目数，0表示精确计数
+        top_k: 只返回前K项，None或0表示全部
+    
+    Returns:
+        rate: 频率列表（按出现次数降序排列，近似模式下每项附带误差上界）
+        total: 条目总数
+        unique: 不同条目数（近似模式下为跟踪的条目数）
+    """
+    tokenize = make_tokenizer(mode, ngram, keywords)
+    try:
+        with profiler.stage('read+parse'), open(input_file, 'r', encoding=encoding) as f:
+            summary, total = count_tokens(f, tokenize, new_summary(capacity))
+    except FileNotFoundError:
+        print(f"[错误] 文件不存在: {input_file}")
+        return None, 0, 0
+    except Exception as e:
+        print(f"[错误] 读取文件失败: {str(e)}")
+        return None, 0, 0
+    profiler.count('tokens', total)
+    
+    with profiler.stage('transform'):
+        rate = top_items(summary, top_k)
+    return rate, total, len(summary)
+
+
+def analyze_text_frequency(input_file, encoding='UTF-8', top_k=None):
     """
     分析文本文件中字符出现的频率
     
     Args:
         input_file: 输入文件路径
         encoding: 文件编码，默认UTF-8
+        top_k: 只返回前K项，None或0表示全部
     
     Returns:
-        rate: 字符频率字典（按出现次数降序排列）
+        rate: 字符频率列表（按出现次数降序排列）
         total_chars: 总字符数
         unique_chars: 不同字符数
     """
     
     try:
-        # 打开文件
-        with open(input_file, 'r', encoding=encoding) as f:
-            # 读取文件所有行
-            content = f.readlines()
+        # 按块流式读取，避免一次性载入大文件
+        with profiler.stage('read+parse'), open(input_file, 'r', encoding=encoding) as f:
+            counter, total_chars = count_characters(f)
     except FileNotFoundError:
         print(f"[错误] 文件不存在: {input_file}")
         return None, 0, 0
     except Exception as e:
         print(f"[错误] 读取文件失败: {str(e)}")
         return None, 0, 0
+    profiler.count('chars', total_chars)
+
+    # 按出现次数从高到低取前K项（同频字符保持首次出现的顺序）
+    with profiler.stage('transform'):
+        rate = top_items(counter, top_k)
     
-    contentLines = ''
-    characers = []  # 存放不同字符的列表
-    rate = {}       # 存放每个字符出现的频率
+    return rate, total_chars, len(counter)
 
-    # 依次迭代所有行
-    for line in content:
-        # 去除空格
-        line = line.strip()
-        # 如果是空行，则跳过
-        if len(line) == 0:
-            continue
-        
-        contentLines = contentLines + line
-        
-        # 统计每个字符出现的次数
-        for i in range(0, len(line)):
-            # 如果字符第一次出现，加入到字符数组中
-            if not line[i] in characers:
-                characers.append(line[i])
-            
-            # 如果是字符第一次出现，加入到字典中
-            if line[i] not in rate:
-                rate[line[i]] = 0
-            
-            # 出现次数加一
-            rate[line[i]] += 1
 
-    # 对字典进行降序排序（按出现次数从高到低）
-    # e表示dict.items()中的一个元素，e[1]表示按值排序
-    rate = sorted(rate.items(), key=lambda e: e[1], reverse=True)
+def split_file(input_file, encoding, split_size=SPLIT_SIZE):
+    """
+    将文件按行边界切分为若干字节区间
+    
+    切分点总是落在 b'\\n' 之后：UTF-8中换行符不会出现在多字节字符内部，
+    且每行首尾空白的处理不受切分影响，各区间计数之和与整体计数完全一致。
+    非UTF-8兼容编码（如GBK、UTF-16）不切分。
+    
+    Returns:
+        [(起始偏移, 结束偏移), ...]，结束偏移为None表示读到文件末尾
+    """
+    size = os.path.getsize(input_file)
+    if codecs.lookup(encoding).name not in _SPLITTABLE_ENCODINGS or size <= split_size:
+        return [(0, None)]
     
-    return rate, len(contentLines), len(characers)
+    ranges = []
+    start = 0
+    with open(input_file, 'rb') as f:
+        while start < size:
+            f.seek(start + split_size)
+            f.readline()
+            end = min(f.tell(), size)
+            ranges.append((start, end))
+            start = end
+    return ranges
 
 
-def print_results(rate, total_chars, unique_chars):
+class _ByteRange(io.RawIOBase):
+    """文件中 [start, end) 字节区间的只读流（end为None时读到文件末尾）"""
+    
+    def __init__(self, raw, start, end):
+        self.raw = raw
+        self.raw.seek(start)
+        self.remaining = None if end is None else end - start
+    
+    def readable(self):
+        return True
+    
+    def readinto(self, buffer):
+        size = len(buffer) if self.remaining is None else min(len(buffer), self.remaining)
+        if size <= 0:
+            return 0
+        size = self.raw.readinto(memoryview(buffer)[:size])
+        if self.remaining is not None:
+            self.remaining -= size
+        return size
+
+
+def _count_range(task):
+    """
+    统计文件一个字节区间的频率（进程池工作函数）
+    
+    区间按 CHUNK_SIZE 分块读取解码，不整体载入内存
+    （不可切分编码的文件只有一个区间，同样按块读取）
+    
+    Returns:
+        (文件路径, 计数或摘要, 条目总数, 错误信息)
+    """
+    input_file, encoding, start, end, (mode, ngram, keywords, capacity) = task
+    try:
+        # 与文本模式打开文件一致：按指定编码解码并做通用换行转换
+        with open(input_file, 'rb') as raw, \
+                io.TextIOWrapper(io.BufferedReader(_ByteRange(raw, start, end), CHUNK_SIZE),
+                                 encoding=encoding) as f:
+            if mode == 'char':
+                counter, total_chars = count_characters(f)
+            else:
+                counter, total_chars = count_tokens(
+                    f, make_tokenizer(mode, ngram, keywords), new_summary(capacity))
+        return input_file, counter, total_chars, None
+    except Exception as e:
+        return input_file, None, 0, str(e)
+
+
+def collect_input_files(inputs, pattern='**/*'):
+    """展开输入列表：文件直接使用，目录按模式匹配其中的文件"""
+    files = []
+    for item in inputs:
+        path = Path(item)
+        if path.is_dir():
+            files.extend(str(p) for p in sorted(path.glob(pattern)) if p.is_file())
+        else:
+            files.append(str(path))
+    return files
+
+
+def analyze_files_frequency(input_files, encoding='UTF-8', jobs=None, split_size=SPLIT_SIZE,
+                            mode='char', ngram=2, keywords=None, capacity=DEFAULT_CAPACITY,
+                            top_k=None):
+    """
+    并行分析多个文件的频率
+    
+    每个文件（大文件按行边界切分为多块）在进程池中单独计数，
+    再按文件和块的顺序合并。字符模式及精确计数（capacity=0）时
+    结果与逐个文件串行统计完全一致；Space-Saving摘要合并后为近似结果。
+    
+    Args:
+        input_files: 输入文件路径列表
+        encoding: 文件编码，默认UTF-8
+        jobs: 并发进程数，默认CPU核数
+        split_size: 大文件切分大小（字节）
+        mode, ngram, keywords, capacity, top_k: 统计模式参数，见 analyze_token_frequency
+    
+    Returns:
+        rate: 字符频率列表（按出现次数降序排列）
+        total_chars: 总字符数
+        unique_chars: 不同字符数
+    """
+    tasks = []
+    failed = {}
+    with profiler.stage('split'):
+        for input_file in input_files:
+            try:
+                for start, end in split_file(input_file, encoding, split_size):
+                    tasks.append((input_file, encoding, start, end,
+                                  (mode, ngram, keywords, capacity)))
+            except OSError as e:
+                failed[input_file] = str(e)
+    
+    jobs = jobs or os.cpu_count() or 1
+    print(f"[INFO] 共 {len(input_files)} 个文件，切分为 {len(tasks)} 个任务，进程数 {jobs}")
+    
+    merged = Counter() if mode == 'char' else new_summary(capacity)
+    total_chars = 0
+    # 当前文件已完成的块；文件的所有块都成功后才合并，任一块失败则整个文件跳过
+    pending_file, pending = None, []
+    
+    def flush():
+        nonlocal total_chars
+        if pending_file in failed:
+            return
+        with profiler.stage('merge'):
+            for counter, chars in pending:
+                if isinstance(merged, SpaceSaving):
+                    merged.merge(counter)
+                else:
+                    merged.update(counter)
+                total_chars += chars
+    
+    # 读取和计数在工作进程中进行，这里只统计总耗时和子进程峰值内存。
+    # 结果按提交顺序逐个取回并立即合并（不保留全部结果），
+    # 保证字符的首次出现顺序（同频字符的排列）与串行一致
+    with profiler.stage('read+parse'), ProcessPoolExecutor(max_workers=jobs) as executor:
+        for input_file, counter, chars, error in executor.map(_count_range, tasks):
+            if input_file != pending_file:
+                flush()
+                pending_file, pending = input_file, []
+            if error is not None:
+                failed.setdefault(input_file, error)
+                pending = []
+            elif input_file not in failed:
+                pending.append((counter, chars))
+        flush()
+        pending = []
+    profiler.count('chars' if mode == 'char' else 'tokens', total_chars)
+    
+    if failed:
+        print(f"[警告] {len(failed)} 个文件读取失败，已跳过：")
+        for input_file, error in failed.items():
+            print(f"  {input_file}: {error}")
+    
+    if not merged:
+        return None, 0, 0
+    
+    with profiler.stage('transform'):
+        rate = top_items(merged, top_k)
+    return rate, total_chars, len(merged)
+
+
+def print_results(rate, total_chars, unique_chars, top_k=DEFAULT_TOP_K, unit='字符',
+                  approximate=False):
     """
     打印分析结果
+    
+    Args:
+        rate: 频率列表（降序，近似结果每项附带误差上界）
+        total_chars: 条目总数
+        unique_chars: 不同条目数
+        top_k: 只打印前K项，0或None表示全部打印
+        unit: 条目名称（字符/单词/n-gram/关键字）
+        approximate: 是否为Space-Saving近似结果
     """
     print("="*60)
-    print("文本字符频率分析结果")
+    print(f"文本{unit}频率分析结果")
     print("="*60)
-    print(f'全文共有 {total_chars} 个字符')
-    print(f'一共有 {unique_chars} 个不同的字符')
+    print(f'全文共有 {total_chars} 个{unit}')
+    if approximate:
+        print(f'跟踪了 {unique_chars} 个不同的{unit}（Space-Saving近似统计）')
+    else:
+        print(f'一共有 {unique_chars} 个不同的{unit}')
     print("="*60)
-    print("\n字符出现频率（降序排列）：\n")
     
-    for i in rate:
-        print(f"[{i[0]}] 共出现 {i[1]} 次")
+    if top_k and top_k < unique_chars:
+        print(f"\n{unit}出现频率（前 {top_k} 项，降序排列）：\n")
+        rate = rate[:top_k]
+    else:
+        print(f"\n{unit}出现频率（降序排列）：\n")
+    
+    if approximate:
+        # 真实次数在 [计数-误差, 计数] 之间
+        for i in rate:
+            print(f"[{i[0]}] 共出现 {i[1]} 次（误差 ≤ {i[2]}）")
+    else:
+        for i in rate:
+            print(f"[{i[0]}] 共出现 {i[1]} 次")
 
 
 def main():
@@ -89,23 +552,68 @@ def main():
     """
     import argparse
     
-    parser = argparse.ArgumentParser(description='文本字符频率分析工具')
-    parser.add_argument('-i', '--input', required=True, help='输入文件路径')
+    parser = argparse.ArgumentParser(description='文本频率分析工具（字符/单词/n-gram/正则关键字）')
+    parser.add_argument('-i', '--input', required=True, nargs='+',
+                        help='输入文件或目录路径，可指定多个')
     parser.add_argument('-e', '--encoding', default='UTF-8', help='文件编码（默认UTF-8）')
+    parser.add_argument('-p', '--pattern', default='**/*',
+                        help='输入为目录时的文件匹配模式（默认 **/*）')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='并发进程数（默认CPU核数）')
+    parser.add_argument('--split-size', type=int, default=SPLIT_SIZE >> 20,
+                        help=f'多文件模式下大文件切分大小（MB，默认{SPLIT_SIZE >> 20}）')
+    parser.add_argument('-m', '--mode', choices=MODES, default='char',
+                        help='统计模式：char（字符，默认）、word（单词）、ngram、keyword（正则关键字）')
+    parser.add_argument('-n', '--ngram', type=int, default=2, help='n-gram的单词数（默认2）')
+    parser.add_argument('-r', '--regex', action='append', dest='keywords',
+                        help='keyword模式下的正则表达式，可指定多次；有分组时统计第一个分组')
+    parser.add_argument('-k', '--top', type=int, default=DEFAULT_TOP_K,
+                        help=f'只输出前K项（默认{DEFAULT_TOP_K}，0表示全部）')
+    parser.add_argument('--capacity', type=int, default=DEFAULT_CAPACITY,
+                        help=f'单词/n-gram/关键字模式下跟踪的条目数上限（默认{DEFAULT_CAPACITY}，'
+                             f'0表示精确计数）')
+    add_profile_arguments(parser)
     
     args = parser.parse_args()
     
-    print(f"[INFO] 开始分析文件: {args.input}")
+    if args.mode == 'keyword' and not args.keywords:
+        parser.error('keyword模式需要用 -r 指定至少一个正则表达式')
+    if args.ngram < 1:
+        parser.error('n-gram的单词数必须大于0')
     
-    # 分析文本频率
-    rate, total_chars, unique_chars = analyze_text_frequency(args.input, args.encoding)
+    unit = {'char': '字符', 'word': '单词', 'ngram': f'{args.ngram}-gram',
+            'keyword': '关键字'}[args.mode]
+    approximate = args.mode != 'char' and args.capacity > 0
     
-    if rate:
-        # 打印结果
-        print_results(rate, total_chars, unique_chars)
-        print("\n[SUCCESS] 分析完成！")
-    else:
-        print("\n[FAILED] 分析失败！")
+    with profile_session(args):
+        input_files = collect_input_files(args.input, args.pattern)
+        
+        # 分析文本频率：单个文件串行，多个文件或指定并发时使用进程池
+        if len(input_files) == 1 and args.jobs is None:
+            print(f"[INFO] 开始分析文件: {input_files[0]}")
+            if args.mode == 'char':
+                rate, total_chars, unique_chars = analyze_text_frequency(
+                    input_files[0], args.encoding, args.top)
+            else:
+                rate, total_chars, unique_chars = analyze_token_frequency(
+                    input_files[0], args.mode, args.encoding, args.ngram, args.keywords, args.capacity,
+                    args.top)
+        elif input_files:
+            print(f"[INFO] 开始分析 {len(input_files)} 个文件")
+            rate, total_chars, unique_chars = analyze_files_frequency(
+                input_files, args.encoding, args.jobs, args.split_size << 20,
+                args.mode, args.ngram, args.keywords, args.capacity, args.top)
+        else:
+            print(f"[错误] 未找到输入文件: {' '.join(args.input)}")
+            rate, total_chars, unique_chars = None, 0, 0
+        
+        if rate:
+            # 打印结果
+            with profiler.stage('write'):
+                print_results(rate, total_chars, unique_chars, args.top, unit, approximate)
+            print("\n[SUCCESS] 分析完成！")
+        else:
+            print("\n[FAILED] 分析失败！")
 
 
 if __name__ == '__main__':
@@ -0,0 +1,365 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+GPS NMEA数据流读取工具
+功能：与GPS设备保持一个TCP长连接，增量解析GGA/RMC/GSV语句（校验和检查），
+      最新定位状态、收星数、HDOP保存在内存环形缓冲区中供监控程序读取
+作者：何枭雄
+日期：2025-01-15
+
+另外提供一个NMEA回放服务（--replay），按记录时间重放NMEA文件，
+用于在没有GPS设备时测试监控程序
+"""
+
+import sys
+import time
+import asyncio
+import argparse
+from collections import deque
+
+
+# GPS设备（根据实际情况修改）
+GPS_HOST = '192.168.10.14'
+GPS_PORT = 4001
+
+RING_SIZE = 600              # 环形缓冲区保存的定位记录数（1Hz时为10分钟）
+STALE_SECONDS = 3.0          # 超过该时间没有新的GGA时视为无数据
+READ_SIZE = 4096
+MAX_LINE_LENGTH = 1024       # NMEA语句最长82字节，超长数据视为乱码丢弃
+RECONNECT_MIN = 0.5          # 断线重连等待时间（秒，逐次加倍）
+RECONNECT_MAX = 5.0
+CONNECT_TIMEOUT = 3.0
+
+
+def nmea_checksum(body):
+    """计算 $ 与 * 之间内容的异或校验和"""
+    checksum = 0
+    for byte in body.encode('ascii', errors='replace'):
+        checksum ^= byte
+    return checksum
+
+
+def split_sentence(line, require_checksum=True):
+    """
+    校验一条NMEA语句并拆分字段
+
+    返回 (语句类型, 发送方, 字段列表)，格式错误或校验和不一致时返回None
+    """
+    line = line.strip()
+    if not line.startswith(('$', '!')):
+        return None
+    body, star, checksum = line[1:].partition('*')
+    if star:
+        try:
+            if int(checksum[:2], 16) != nmea_checksum(body):
+                return None
+        except ValueError:
+            return None
+    elif require_checksum:
+        return None
+
+    fields = body.split(',')
+    address = fields[0]
+    if len(address) < 5:
+        return None
+    # 如 GNGGA：发送方 GN，语句类型 GGA（专有语句 P 开头不区分发送方）
+    return address[-3:], address[:-3], fields
+
+
+def parse_float(value):
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def parse_int(value):
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+def parse_coordinate(value, hemisphere):
+    """ddmm.mmmm 格式转换为度"""
+    number = parse_float(value)
+    if number is None:
+        return None
+    degrees = int(number // 100)
+    result = degrees + (number - degrees * 100) / 60
+    return -result if hemisphere in ('S', 'W') else result
+
+
+class GpsFix(object):
+    """一次GGA定位记录（附带最近一次RMC和GSV的信息）"""
+
+    __slots__ = ('received', 'utc', 'quality', 'satellites', 'hdop', 'latitude', 'longitude',
+                 'altitude', 'status', 'speed_knots', 'course', 'date', 'in_view')
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields.get(name))
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class NmeaParser(object):
+    """
+    增量NMEA解析器
+
+    feed() 接收任意切分的字节流，拼出完整语句后解析；
+    每条有效GGA生成一条 GpsFix 记录存入环形缓冲区
+    """
+
+    def __init__(self, ring_size=RING_SIZE, require_checksum=True):
+        self.require_checksum = require_checksum
+        self.ring = deque(maxlen=ring_size)
+        self.buffer = b''
+        self.rmc = {}
+        self.in_view = {}
+        self.gsv_pending = {}
+        self.stats = {'sentences': 0, 'bad': 0, 'gga': 0, 'rmc': 0, 'gsv': 0}
+
+        self.handlers = {
+            'GGA': self.handle_gga,
+            'RMC': self.handle_rmc,
+            'GSV': self.handle_gsv,
+        }
+
+    def feed(self, data, received=None):
+        """输入一段字节流，返回本次新增的定位记录数"""
+        received = time.monotonic() if received is None else received
+        before = self.stats['gga']
+        lines = (self.buffer + data).split(b'\n')
+        self.buffer = lines.pop()
+        if len(self.buffer) > MAX_LINE_LENGTH:
+            self.buffer = b''
+        for line in lines:
+            self.feed_line(line.decode('ascii', errors='replace'), received)
+        return self.stats['gga'] - before
+
+    def feed_line(self, line, received=None):
+        """解析一条完整语句"""
+        if not line.strip():
+            return
+        self.stats['sentences'] += 1
+        sentence = split_sentence(line, self.require_checksum)
+        if sentence is None:
+            self.stats['bad'] += 1
+            return
+        kind, talker, fields = sentence
+        handler = self.handlers.get(kind)
+        if handler is not None:
+            handler(talker, fields, time.monotonic() if received is None else received)
+
+    def handle_gga(self, talker, fields, received):
+        # $GNGGA,时间,纬度,N,经度,E,定位质量,卫星数,HDOP,海拔,M,...
+        if len(fields) < 10:
+            self.stats['bad'] += 1
+            return
+        self.stats['gga'] += 1
+        self.ring.append(GpsFix(
+            received=received,
+            utc=fields[1],
+            quality=parse_int(fields[6]),
+            satellites=parse_int(fields[7]),
+            hdop=parse_float(fields[8]),
+            latitude=parse_coordinate(fields[2], fields[3]),
+            longitude=parse_coordinate(fields[4], fields[5]),
+            altitude=parse_float(fields[9]),
+            status=self.rmc.get('status'),
+            speed_knots=self.rmc.get('speed_knots'),
+            course=self.rmc.get('course'),
+            date=self.rmc.get('date'),
+            in_view=sum(self.in_view.values()) if self.in_view else None,
+        ))
+
+    def handle_rmc(self, talker, fields, received):
+        # $GNRMC,时间,状态,纬度,N,经度,E,速度(节),航向,日期,...
+        if len(fields) < 10:
+            self.stats['bad'] += 1
+            return
+        self.stats['rmc'] += 1
+        self.rmc = {
+            'status': fields[2],
+            'speed_knots': parse_float(fields[7]),
+            'course': parse_float(fields[8]),
+            'date': fields[9],
+        }
+
+    def handle_gsv(self, talker, fields, received):
+        # $GPGSV,总条数,当前条号,可见卫星数,(卫星号,仰角,方位角,信噪比)...
+        if len(fields) < 4:
+            self.stats['bad'] += 1
+            return
+        self.stats['gsv'] += 1
+        total, number, in_view = parse_int(fields[1]), parse_int(fields[2]), parse_int(fields[3])
+        if total is None or number is None or in_view is None:
+            return
+        # 一组GSV收齐后才更新该系统的可见卫星数
+        if number == 1:
+            self.gsv_pending[talker] = in_view
+        if number == total and talker in self.gsv_pending:
+            self.in_view[talker] = self.gsv_pending.pop(talker)
+
+    def latest(self, max_age=None, now=None):
+        """最新定位记录，超过max_age秒没有更新时返回None"""
+        if not self.ring:
+            return None
+        fix = self.ring[-1]
+        if max_age is not None:
+            now = time.monotonic() if now is None else now
+            if now - fix.received > max_age:
+                return None
+        return fix
+
+
+class GpsNmeaReader(object):
+    """
+    GPS数据流读取器：一个TCP长连接，断线自动重连
+
+    在事件循环中运行 run()，其它协程随时通过 latest() 读取最新状态
+    """
+
+    def __init__(self, host=GPS_HOST, port=GPS_PORT, ring_size=RING_SIZE, require_checksum=True):
+        self.host = host
+        self.port = port
+        self.parser = NmeaParser(ring_size, require_checksum)
+        self.connected = False
+        self.reconnects = 0
+
+    def latest(self, max_age=STALE_SECONDS):
+        return self.parser.latest(max_age)
+
+    async def run(self):
+        """读取数据直到任务被取消"""
+        delay = RECONNECT_MIN
+        while True:
+            try:
+                reader, writer = await asyncio.wait_for(
+                    asyncio.open_connection(self.host, self.port), CONNECT_TIMEOUT)
+            except (OSError, asyncio.TimeoutError):
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, RECONNECT_MAX)
+                continue
+
+            self.connected = True
+            delay = RECONNECT_MIN
+            try:
+                while True:
+                    data = await reader.read(READ_SIZE)
+                    if not data:
+                        break
+                    self.parser.feed(data)
+            except OSError:
+                pass
+            finally:
+                self.connected = False
+                self.reconnects += 1
+                writer.close()
+            await asyncio.sleep(delay)
+
+
+def nmea_seconds(utc):
+    """NMEA时间 hhmmss.ss 转换为当天秒数"""
+    value = parse_float(utc)
+    if value is None:
+        return None
+    hours, rest = divmod(value, 10000)
+    minutes, seconds = divmod(rest, 100)
+    return hours * 3600 + minutes * 60 + seconds
+
+
+class NmeaReplayServer(object):
+    """
+    NMEA回放服务：每个客户端连接后按记录的时间间隔重放NMEA文件
+
+    以GGA/RMC语句中的UTC时间计算间隔，speed为回放倍速；loop为真时循环回放
+    """
+
+    def __init__(self, replay_file, speed=1.0, loop=False):
+        with open(replay_file, 'rb') as f:
+            self.lines = [line.rstrip(b'\r\n') + b'\r\n' for line in f if line.strip()]
+        self.speed = speed
+        self.loop = loop
+
+    async def handle_client(self, reader, writer):
+        try:
+            while True:
+                last = None
+                for line in self.lines:
+                    sentence = split_sentence(line.decode('ascii', errors='replace'), False)
+                    if sentence is not None and sentence[0] in ('GGA', 'RMC') and len(sentence[2]) > 1:
+                        current = nmea_seconds(sentence[2][1])
+                        if current is not None and last is not None and current > last:
+                            await writer.drain()
+                            await asyncio.sleep((current - last) / self.speed)
+                        if current is not None:
+                            last = current
+                    writer.write(line)
+                await writer.drain()
+                if not self.loop:
+                    break
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle_client, host, port)
+        print(f"[INFO] NMEA回放服务已启动: {host}:{port}（{len(self.lines)} 条语句）")
+        async with server:
+            await server.serve_forever()
+
+
+async def print_status(reader, interval, count):
+    """每隔interval秒打印一次最新定位状态"""
+    task = asyncio.ensure_future(reader.run())
+    try:
+        done = 0
+        while not count or done < count:
+            await asyncio.sleep(interval)
+            done += 1
+            fix = reader.latest()
+            stats = reader.parser.stats
+            if fix is None:
+                state = '已连接' if reader.connected else '未连接'
+                print(f"[WARN] 无GPS数据（{state}，语句 {stats['sentences']} 条，无效 {stats['bad']} 条）")
+                continue
+            print(f"[INFO] UTC {fix.utc} 定位质量 {fix.quality} 收星数 {fix.satellites} "
+                  f"可见 {fix.in_view} HDOP {fix.hdop} 位置 ({fix.latitude}, {fix.longitude})")
+    finally:
+        task.cancel()
+
+
+def main():
+    """
+    主函数
+    """
+    parser = argparse.ArgumentParser(description='GPS NMEA数据流读取工具')
+    parser.add_argument('--host', default=GPS_HOST, help=f'GPS设备地址（默认{GPS_HOST}）')
+    parser.add_argument('--port', type=int, default=GPS_PORT, help=f'GPS设备端口（默认{GPS_PORT}）')
+    parser.add_argument('--interval', type=float, default=1.0, help='状态打印间隔（秒，默认1）')
+    parser.add_argument('-n', '--count', type=int, default=0, help='打印次数（默认0，一直运行）')
+    parser.add_argument('--replay', help='回放模式：在 --host:--port 上重放该NMEA文件')
+    parser.add_argument('--speed', type=float, default=1.0, help='回放倍速（默认1.0）')
+    parser.add_argument('--loop', action='store_true', help='循环回放')
+
+    args = parser.parse_args()
+
+    try:
+        if args.replay:
+            server = NmeaReplayServer(args.replay, args.speed, args.loop)
+            asyncio.run(server.serve(args.host, args.port))
+        else:
+            asyncio.run(print_status(GpsNmeaReader(args.host, args.port), args.interval, args.count))
+    except FileNotFoundError:
+        print(f"[错误] 文件不存在: {args.replay}")
+        sys.exit(1)
+    except KeyboardInterrupt:
+        print("\n[INFO] 已停止")
+
+
+if __name__ == '__main__':
+    main()
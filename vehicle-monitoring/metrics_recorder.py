@@ -0,0 +1,299 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+车载监控数据记录工具
+功能：将监控程序每次采样的CPU、内存、磁盘、4G、GPS、NTP测量值写入预分配的环形文件，
+      路测结束后按时间范围导出为CSV/Parquet，用于分析
+作者：何枭雄
+日期：2025-01-15
+
+存储格式：64字节文件头 + capacity 条定长记录（每条32字节），文件创建时一次分配，
+通过mmap写入，写满后覆盖最早的记录，文件大小始终不变。
+写入只修改内存映射页，由系统后台回写，不逐条fsync。
+
+使用方法：
+    python vehicle_system_monitor.py --record metrics.ring
+    python metrics_recorder.py -i metrics.ring --info
+    python metrics_recorder.py -i metrics.ring -o drive.csv --start "2025-01-15 09:00:00" --end "2025-01-15 18:00:00"
+"""
+
+import os
+import csv
+import mmap
+import time
+import struct
+import argparse
+from datetime import datetime
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+MAGIC = b'VHMRING1'
+HEADER = struct.Struct('<8sIIQQ32x')          # 标识, 版本, 记录长度, 容量, 写入总数
+FORMAT_VERSION = 1
+
+# 定长记录：采样时间, 内存剩余(MB), NTP偏移(微秒), HDOP(×100), CPU使用率, CPU空闲率,
+#          磁盘使用率, 4G是否正常, GPS定位质量, GPS收星数, 有效标记
+RECORD = struct.Struct('<dIiHBBBBBBB7x')
+
+# 字段顺序与记录一致：(字段名, 缩放倍数)；空值写入哨兵值
+FIELDS = (
+    ('mem_free', 1),
+    ('ntp_offset', 1000000),
+    ('gps_hdop', 100),
+    ('cpu_use', 1),
+    ('cpu_idle', 1),
+    ('disk_use', 1),
+    ('net_ok', 1),
+    ('gps_fix', 1),
+    ('gps_satellites', 1),
+)
+MISSING = {'I': 0xffffffff, 'i': -0x80000000, 'H': 0xffff, 'B': 0xff}
+FIELD_MISSING = tuple(MISSING[code] for code in RECORD.format[2:2 + len(FIELDS)])
+RECORD_VALID = 1
+
+DEFAULT_CAPACITY = 86400       # 1秒采样一天（约2.7MB），10秒采样可保存10天
+DEFAULT_SYNC_INTERVAL = 300    # 定期将脏页写回磁盘的间隔（秒），0表示只在关闭时写回
+
+# 导出时间格式与 log_parser 一致（毫秒精度）
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+COLUMNS = ('timestamp',) + tuple(name for name, _ in FIELDS)
+
+
+def format_time(timestamp):
+    """Unix时间戳转换为 log_parser 格式的本地时间字符串"""
+    return datetime.fromtimestamp(timestamp).strftime(TIME_FORMAT)[:-3]
+
+
+def parse_time(text):
+    """解析命令行时间参数（支持秒或毫秒精度）"""
+    for fmt in ('%Y-%m-%d %H:%M:%S.%f', '%Y-%m-%d %H:%M:%S', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(text, fmt).timestamp()
+        except ValueError:
+            continue
+    raise ValueError(f"无法识别的时间: {text}")
+
+
+def encode_value(value, scale, missing):
+    """测量值转换为定长整数，空值或超出范围时写入哨兵值"""
+    if value is None:
+        return missing
+    value = int(round(value * scale))
+    if missing < 0:
+        return value if missing < value <= 0x7fffffff else missing
+    return value if 0 <= value < missing else missing
+
+
+def decode_value(value, scale, missing):
+    if value == missing:
+        return None
+    return value / scale if scale != 1 else value
+
+
+def read_header(data, path):
+    """
+    解析并校验文件头，返回 (容量, 写入总数)
+
+    文件被截断（如写入中途断电、拷贝不完整）时长度不足文件头加 capacity 条记录，
+    此时抛出ValueError，避免后续读写越界
+    """
+    if len(data) < HEADER.size:
+        raise ValueError(f"监控记录文件不完整或已损坏: {path}（{len(data)} 字节）")
+    magic, version, record_size, capacity, total = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != FORMAT_VERSION or record_size != RECORD.size:
+        raise ValueError(f"不是有效的监控记录文件: {path}")
+    if capacity == 0 or len(data) < HEADER.size + capacity * RECORD.size:
+        raise ValueError(f"监控记录文件不完整或已损坏: {path}"
+                         f"（{len(data)} 字节，容量 {capacity} 条需要 {HEADER.size + capacity * RECORD.size} 字节）")
+    return capacity, total
+
+
+class MetricsRecorder(object):
+    """
+    环形文件记录器
+
+    文件不存在时按capacity创建并预分配；已存在时沿用文件中的容量继续写入
+    """
+
+    def __init__(self, path, capacity=DEFAULT_CAPACITY, sync_interval=DEFAULT_SYNC_INTERVAL):
+        self.path = path
+        self.sync_interval = sync_interval
+        self.last_sync = time.monotonic()
+
+        if not os.path.exists(path):
+            self.create(path, capacity)
+
+        self.file = open(path, 'r+b')
+        self.map = None
+        try:
+            size = os.fstat(self.file.fileno()).st_size
+            if size < HEADER.size:
+                # 空文件无法mmap，先按文件头不完整处理
+                raise ValueError(f"监控记录文件不完整或已损坏: {path}（{size} 字节）")
+            self.map = mmap.mmap(self.file.fileno(), 0)
+            self.capacity, self.total = read_header(self.map, path)
+        except Exception:
+            self.close()
+            raise
+
+    @staticmethod
+    def create(path, capacity):
+        """创建并预分配环形文件（之后写入不再改变文件大小）"""
+        size = HEADER.size + capacity * RECORD.size
+        with open(path, 'wb') as f:
+            if hasattr(os, 'posix_fallocate'):
+                os.posix_fallocate(f.fileno(), 0, size)
+            else:
+                f.truncate(size)
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION, RECORD.size, capacity, 0))
+        print(f"[INFO] 创建监控记录文件: {path}（{capacity} 条，{size / 1024 / 1024:.1f} MB）")
+
+    def append(self, timestamp, values):
+        """写入一条采样记录（values为监控程序的测量值字典）"""
+        fields = [encode_value(values.get(name), scale, missing)
+                  for (name, scale), missing in zip(FIELDS, FIELD_MISSING)]
+        offset = HEADER.size + (self.total % self.capacity) * RECORD.size
+        RECORD.pack_into(self.map, offset, timestamp, *fields, RECORD_VALID)
+
+        # 先写记录再更新写入总数，中途断电最多丢失最后一条
+        self.total += 1
+        HEADER.pack_into(self.map, 0, MAGIC, FORMAT_VERSION, RECORD.size, self.capacity, self.total)
+
+        if self.sync_interval and time.monotonic() - self.last_sync >= self.sync_interval:
+            self.sync()
+
+    def sync(self):
+        """将脏页写回磁盘（定期一次，不逐条写回）"""
+        self.map.flush()
+        self.last_sync = time.monotonic()
+
+    def close(self):
+        if self.map is not None:
+            if not self.map.closed:
+                self.map.flush()
+                self.map.close()
+            self.map = None
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class MetricsReader(object):
+    """环形文件读取器：按写入顺序（从最早到最新）读取记录"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.data = f.read()
+        self.capacity, self.total = read_header(self.data, path)
+        self.count = min(self.total, self.capacity)
+
+    def iter_records(self, start=None, end=None):
+        """按时间顺序返回 [start, end] 范围内的记录字典"""
+        oldest = (self.total - self.count) % self.capacity
+        body = memoryview(self.data)[HEADER.size:HEADER.size + self.capacity * RECORD.size]
+        # 环形缓冲区分两段：最早记录到文件末尾，文件开头到最新记录
+        segments = [(oldest, min(self.capacity, oldest + self.count))]
+        if oldest + self.count > self.capacity:
+            segments.append((0, oldest + self.count - self.capacity))
+
+        for first, last in segments:
+            for record in RECORD.iter_unpack(body[first * RECORD.size:last * RECORD.size]):
+                timestamp, valid = record[0], record[-1]
+                if valid != RECORD_VALID:
+                    continue
+                if (start is not None and timestamp < start) or (end is not None and timestamp > end):
+                    continue
+                row = {'timestamp': format_time(timestamp)}
+                for (name, scale), missing, value in zip(FIELDS, FIELD_MISSING, record[1:-1]):
+                    row[name] = decode_value(value, scale, missing)
+                yield row
+
+    def time_range(self):
+        """返回 (最早记录时间, 最新记录时间)"""
+        if not self.count:
+            return None, None
+        oldest = (self.total - self.count) % self.capacity
+        newest = (self.total - 1) % self.capacity
+        first = RECORD.unpack_from(self.data, HEADER.size + oldest * RECORD.size)[0]
+        last = RECORD.unpack_from(self.data, HEADER.size + newest * RECORD.size)[0]
+        return first, last
+
+
+def export_csv(rows, output_file):
+    """导出为CSV，返回记录数"""
+    count = 0
+    with open(output_file, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def export_parquet(rows, output_file):
+    """导出为Parquet（需要pyarrow），返回记录数"""
+    if pyarrow is None:
+        raise ImportError("导出Parquet需要安装pyarrow: pip install pyarrow")
+    columns = {name: [] for name in COLUMNS}
+    for row in rows:
+        for name in COLUMNS:
+            columns[name].append(row[name])
+    pyarrow.parquet.write_table(pyarrow.table(columns), output_file)
+    return len(columns['timestamp'])
+
+
+def main():
+    """
+    主函数
+    """
+    parser = argparse.ArgumentParser(description='车载监控数据记录工具 - 查看和导出环形记录文件')
+    parser.add_argument('-i', '--input', required=True, help='监控记录文件路径')
+    parser.add_argument('-o', '--output', help='导出文件路径（.csv 或 .parquet）')
+    parser.add_argument('--start', help='起始时间，如 "2025-01-15 09:00:00"')
+    parser.add_argument('--end', help='结束时间，如 "2025-01-15 18:00:00"')
+    parser.add_argument('--info', action='store_true', help='显示记录文件信息')
+
+    args = parser.parse_args()
+
+    try:
+        reader = MetricsReader(args.input)
+        start = parse_time(args.start) if args.start else None
+        end = parse_time(args.end) if args.end else None
+    except FileNotFoundError:
+        print(f"[ERROR] 文件不存在: {args.input}")
+        return
+    except ValueError as e:
+        print(f"[ERROR] {e}")
+        return
+
+    if args.info or not args.output:
+        first, last = reader.time_range()
+        print(f"[INFO] 容量 {reader.capacity} 条，已写入 {reader.total} 条，当前保存 {reader.count} 条")
+        if first is not None:
+            print(f"[INFO] 时间范围: {format_time(first)} ~ {format_time(last)}")
+
+    if args.output:
+        rows = reader.iter_records(start, end)
+        try:
+            if args.output.endswith('.parquet'):
+                count = export_parquet(rows, args.output)
+            else:
+                count = export_csv(rows, args.output)
+        except ImportError as e:
+            print(f"[ERROR] {e}")
+            return
+        print(f"[INFO] 已导出 {count} 条记录到: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,543 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+车载系统健康监控工具（Python版）
+功能：与 vehicle_system_monitor.sh 相同的检测项、阈值和输出，
+      所有检测项在一个事件循环中并发执行，每项单独超时，按固定周期采样
+作者：何枭雄
+日期：2025-01-15
+
+与Shell版的区别：
+- CPU、内存、磁盘直接读取 /proc/stat、/proc/meminfo 和 statvfs，不再调用 top/free/df/awk
+- GPS与设备保持一个TCP长连接，由 gps_nmea_reader 持续解析NMEA数据，检测时直接读取最新状态
+- NTP直接发送SNTP请求，默认只检测偏移、不调整系统时间（Shell版的 ntpdate -b 每次都会校准时间）；
+  需要校准时加 --sync-clock，偏移超出阈值时调用 ntpdate -b（没有时用 chronyc makestep）
+- 可选 --record 将每次采样的测量值写入环形记录文件（见 metrics_recorder.py），供路测后分析
+- 4G直接通过ICMP套接字发送ping（都不可用时退回调用ping命令），不阻塞其它检测项
+"""
+
+import os
+import sys
+import time
+import socket
+import struct
+import asyncio
+import argparse
+
+from gps_nmea_reader import GpsNmeaReader, GPS_HOST, GPS_PORT, STALE_SECONDS
+from metrics_recorder import MetricsRecorder, DEFAULT_CAPACITY
+
+
+# 检测目标（根据实际情况修改，GPS设备地址见 gps_nmea_reader.py）
+NTP_SERVER = '192.168.10.8'
+PING_HOST = '180.76.103.37'
+
+# 阈值（与Shell版一致）
+GPS_FIX_OK = 1                # GGA定位质量为1时正常
+GPS_MIN_SATELLITES = 20       # 收星数量下限
+NTP_MAX_OFFSET = 0.005        # 时间偏移允许范围（±秒）
+PING_COUNT = 3                # 4G检测发送的ping包数，全部收到才算正常
+PING_INTERVAL = 0.2           # ping包发送间隔（秒）
+PING_REPLY_TIMEOUT = 1.0      # 每个ping包等待回复的时间（秒，与 ping -W 1 一致）
+NTP_REPLY_TIMEOUT = 2.0       # 等待NTP服务器回复的时间（秒，须小于NTP检测项超时）
+
+# --sync-clock 时校准系统时间的命令（依次尝试，{server}替换为NTP服务器）及超时（秒）
+CLOCK_SYNC_COMMANDS = (('ntpdate', '-b', '{server}'), ('chronyc', 'makestep'))
+CLOCK_SYNC_TIMEOUT = 10.0
+GPS_WAIT_SECONDS = 2.0        # 刚启动或断线重连时等待GPS数据的时间
+
+# 采样周期（秒）
+SAMPLE_PERIOD = 10
+
+# 每个检测项的超时时间（秒）
+CHECK_TIMEOUTS = {
+    'cpu': 2.0,
+    'mem': 1.0,
+    '4g': 4.0,
+    'gps': 4.0,
+    'disk': 2.0,
+    'ntp': 3.0,
+}
+
+# 检测项及输出顺序（与Shell版主循环一致）
+CHECK_ORDER = ('cpu', 'mem', '4g', 'gps', 'disk', 'ntp')
+CHECK_NAMES = {
+    'cpu': 'CPU使用率',
+    'mem': '内存',
+    '4g': '4G网络连接',
+    'gps': 'GPS',
+    'disk': '磁盘使用率',
+    'ntp': 'NTP时间同步',
+}
+
+# 统计可用空间时排除的文件系统（与 df | grep -v -E '(tmp|boot)' 一致）
+DISK_EXCLUDE = ('tmp', 'boot')
+
+# NTP时间戳起点（1900-01-01）与Unix时间戳起点的差值（秒）
+NTP_EPOCH_DELTA = 2208988800
+
+RED = '\033[31m'
+RESET = '\033[0m'
+
+
+def normal(now, text):
+    """正常输出行"""
+    return f"{now} {text}"
+
+
+def alarm(now, text):
+    """异常输出行（红色，格式与Shell版 echo -e 一致）"""
+    return f"{RED}{now} {text} {RESET}"
+
+
+def read_cpu_times(path='/proc/stat'):
+    """读取CPU总时间和空闲时间（jiffies）"""
+    with open(path, 'r') as f:
+        fields = f.readline().split()
+    # user nice system idle iowait irq softirq steal（guest已计入user）
+    values = [int(value) for value in fields[1:9]]
+    return sum(values), values[3]
+
+
+def read_meminfo(path='/proc/meminfo'):
+    """读取 /proc/meminfo，返回 {字段: kB}"""
+    meminfo = {}
+    with open(path, 'r') as f:
+        for line in f:
+            key, _, value = line.partition(':')
+            meminfo[key] = int(value.split()[0])
+    return meminfo
+
+
+def list_disks(path='/proc/mounts'):
+    """列出 /dev 设备上的文件系统挂载点（同一设备只取第一个挂载点）"""
+    disks = []
+    devices = set()
+    with open(path, 'r') as f:
+        for line in f:
+            fields = line.split()
+            if len(fields) < 2 or not fields[0].startswith('/dev'):
+                continue
+            if any(word in line for word in DISK_EXCLUDE) or fields[0] in devices:
+                continue
+            devices.add(fields[0])
+            disks.append(fields[1].replace('\\040', ' '))
+    return disks
+
+
+def disk_usage_percent(mountpoint):
+    """与 df -P 的 Use% 一致：已用 / (已用 + 普通用户可用)，向上取整"""
+    st = os.statvfs(mountpoint)
+    used = st.f_blocks - st.f_bfree
+    total = used + st.f_bavail
+    if total == 0:
+        return 0
+    return -(-used * 100 // total)
+
+
+def icmp_checksum(data):
+    """ICMP校验和"""
+    if len(data) % 2:
+        data += b'\0'
+    total = sum(struct.unpack('!%dH' % (len(data) // 2), data))
+    total = (total >> 16) + (total & 0xffff)
+    total += total >> 16
+    return ~total & 0xffff
+
+
+def icmp_echo_packet(ident, seq):
+    """构造ICMP回显请求（数据报套接字由内核改写标识符）"""
+    payload = b'vehicle-monitor'
+    header = struct.pack('!BBHHH', 8, 0, 0, ident, seq)
+    checksum = icmp_checksum(header + payload)
+    return struct.pack('!BBHHH', 8, 0, checksum, ident, seq) + payload
+
+
+def open_icmp_socket():
+    """
+    打开ICMP套接字，返回 (套接字, 是否为原始套接字)
+
+    优先使用普通用户可用的数据报套接字（受 net.ipv4.ping_group_range 限制），
+    不允许时使用原始套接字（需要root权限）
+    """
+    try:
+        return socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP), False
+    except OSError:
+        return socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP), True
+
+
+class NtpProtocol(asyncio.DatagramProtocol):
+    """SNTP客户端：发送一次请求，计算本机时间偏移"""
+
+    def __init__(self, future):
+        self.future = future
+        self.sent = 0.0
+
+    def connection_made(self, transport):
+        self.sent = time.time()
+        # LI=0 VN=3 Mode=3（客户端）
+        transport.sendto(b'\x1b' + 47 * b'\0')
+
+    def datagram_received(self, data, addr):
+        received = time.time()
+        if len(data) < 48 or self.future.done():
+            return
+        server_recv, server_send = struct.unpack('!QQ', data[32:48])
+        server_recv = server_recv / 2 ** 32 - NTP_EPOCH_DELTA
+        server_send = server_send / 2 ** 32 - NTP_EPOCH_DELTA
+        offset = ((server_recv - self.sent) + (server_send - received)) / 2
+        self.future.set_result(offset)
+
+    def error_received(self, exc):
+        if not self.future.done():
+            self.future.set_exception(exc)
+
+
+class VehicleHealthMonitor(object):
+    """
+    车载系统健康监控器
+
+    每个检测项是一个协程，返回 (测量值字典, 输出行列表)；
+    一次采样中所有检测项并发执行，输出按Shell版的顺序打印
+    """
+
+    def __init__(self, gps_host=GPS_HOST, gps_port=GPS_PORT, ntp_server=NTP_SERVER,
+                 ping_host=PING_HOST, period=SAMPLE_PERIOD, timeouts=None,
+                 sync_clock=False, sync_threshold=NTP_MAX_OFFSET):
+        self.gps_reader = GpsNmeaReader(gps_host, gps_port)
+        self.ntp_server = ntp_server
+        # 偏移超过 sync_threshold 秒时在后台校准系统时间（不计入NTP检测项耗时）
+        self.sync_clock = sync_clock
+        self.sync_threshold = sync_threshold
+        self.sync_task = None
+        self.ping_host = ping_host
+        self.period = period
+        self.timeouts = dict(CHECK_TIMEOUTS, **(timeouts or {}))
+
+        # CPU使用率为两次采样之间的差值，启动时先记录一次
+        self.cpu_times = read_cpu_times()
+        self.use_ping_socket = True
+
+    async def check_cpu(self, now):
+        """CPU使用率（与 top 的 id 一致，只计空闲时间，取整数部分）"""
+        total, idle = read_cpu_times()
+        if total == self.cpu_times[0]:
+            # 与上次采样间隔过短时等待一个时钟周期后重新读取
+            await asyncio.sleep(0.2)
+            total, idle = read_cpu_times()
+        last_total, last_idle = self.cpu_times
+        self.cpu_times = (total, idle)
+
+        cpu_idle = int((idle - last_idle) * 100 / max(total - last_total, 1))
+        cpu_use = 100 - cpu_idle
+        return ({'cpu_use': cpu_use, 'cpu_idle': cpu_idle},
+                [normal(now, f"CPU使用率: {cpu_use}% (空闲: {cpu_idle}%)")])
+
+    async def check_mem(self, now):
+        """内存剩余空间（与 free -m 的 free + buff/cache 一致）"""
+        meminfo = read_meminfo()
+        mem_free = (meminfo.get('MemFree', 0) + meminfo.get('Buffers', 0)
+                    + meminfo.get('Cached', 0) + meminfo.get('SReclaimable', 0)) // 1024
+        return {'mem_free': mem_free}, [normal(now, f"内存剩余空间: {mem_free} MB")]
+
+    async def check_disk(self, now):
+        """磁盘使用率（多个文件系统时每个一行并注明挂载点）"""
+        disks = list_disks()
+        usages = [(mountpoint, disk_usage_percent(mountpoint)) for mountpoint in disks]
+        if len(usages) == 1:
+            lines = [normal(now, f"磁盘使用率: {usages[0][1]}%")]
+        else:
+            lines = [normal(now, f"磁盘使用率: {usage}% ({mountpoint})") for mountpoint, usage in usages]
+        disk_use = max((usage for _, usage in usages), default=0)
+        return {'disk_use': disk_use}, lines
+
+    async def ping(self, count):
+        """发送count个ping包，返回 (收到的回复数, 发送的包数)"""
+        if self.use_ping_socket:
+            try:
+                sock, raw = open_icmp_socket()
+            except OSError:
+                # 既不允许ICMP数据报套接字，也没有root权限，退回ping命令
+                self.use_ping_socket = False
+            else:
+                try:
+                    return await self.ping_socket(sock, raw, count)
+                finally:
+                    sock.close()
+        return await self.ping_command(count)
+
+    async def ping_socket(self, sock, raw, count):
+        """
+        通过ICMP套接字ping，每 PING_INTERVAL 秒发送一个包
+
+        每个包单独等待 PING_REPLY_TIMEOUT 秒，超时按丢包计，
+        丢包时不会一直等到整个检测项超时
+        """
+        loop = asyncio.get_running_loop()
+        sock.setblocking(False)
+        sock.connect((self.ping_host, 0))
+        ident = os.getpid() & 0xffff
+        replies = {seq: loop.create_future() for seq in range(1, count + 1)}
+        sent = 0
+
+        async def receive():
+            while True:
+                reply = await loop.sock_recv(sock, 1024)
+                if raw:
+                    # 原始套接字收到的是完整IP包，且包含其它进程的ICMP报文
+                    reply = reply[(reply[0] & 0x0f) * 4:]
+                    if len(reply) < 8 or struct.unpack('!H', reply[4:6])[0] != ident:
+                        continue
+                if len(reply) >= 8 and reply[0] == 0:
+                    future = replies.get(struct.unpack('!H', reply[6:8])[0])
+                    if future is not None and not future.done():
+                        future.set_result(True)
+
+        async def send_one(seq):
+            nonlocal sent
+            await asyncio.sleep((seq - 1) * PING_INTERVAL)
+            sock.send(icmp_echo_packet(ident, seq))
+            sent += 1
+            try:
+                return await asyncio.wait_for(replies[seq], PING_REPLY_TIMEOUT)
+            except asyncio.TimeoutError:
+                return False
+
+        receiver = asyncio.ensure_future(receive())
+        try:
+            results = await asyncio.gather(*[send_one(seq) for seq in replies])
+        finally:
+            receiver.cancel()
+        return sum(results), sent
+
+    async def ping_command(self, count):
+        """调用ping命令（不阻塞事件循环）"""
+        process = await asyncio.create_subprocess_exec(
+            'ping', '-c', str(count), '-i', str(PING_INTERVAL), '-W', f'{PING_REPLY_TIMEOUT:g}', self.ping_host,
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL)
+        try:
+            output, _ = await process.communicate()
+        finally:
+            if process.returncode is None:
+                process.kill()
+        # 统计行：3 packets transmitted, 3 received, 0% packet loss, ...
+        for line in output.decode(errors='replace').splitlines():
+            if ' received' in line and ' transmitted' in line:
+                sent = int(line.split(' packets transmitted')[0].split()[-1])
+                return int(line.split(' received')[0].split()[-1]), sent
+        return 0, 0
+
+    async def check_4g(self, now):
+        """4G网络连接：PING_COUNT个包全部收到为正常"""
+        try:
+            received, sent = await self.ping(PING_COUNT)
+        except OSError:
+            received, sent = 0, 0
+        if sent == PING_COUNT and received == PING_COUNT:
+            return {'net_ok': 1}, [normal(now, "4G网络连接正常")]
+        return {'net_ok': 0}, [alarm(now, "[错误] 4G网络连接异常")]
+
+    async def wait_gps(self):
+        """读取最新GPS定位记录，暂时没有数据时短暂等待"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + GPS_WAIT_SECONDS
+        fix = self.gps_reader.latest(STALE_SECONDS)
+        while fix is None and loop.time() < deadline:
+            await asyncio.sleep(0.1)
+            fix = self.gps_reader.latest(STALE_SECONDS)
+        return fix
+
+    async def check_gps(self, now):
+        """GPS定位状态和收星数量（取不到数据时与Shell版一样按异常处理）"""
+        fix = await self.wait_gps()
+        quality = fix.quality if fix else None
+        satellites = fix.satellites if fix else None
+        gps_num = '' if satellites is None else str(satellites)
+
+        lines = [f"-----------------GPS收星数：{gps_num}--------------------------------------------------------"]
+        if quality == GPS_FIX_OK:
+            lines.append(normal(now, "当前GPS使用差分定位 - 正常"))
+        else:
+            lines.append(alarm(now, "[错误] 当前GPS状态异常"))
+        if satellites is not None and satellites >= GPS_MIN_SATELLITES:
+            lines.append(normal(now, f"当前GPS收星数量为{gps_num} - 正常"))
+        else:
+            lines.append(alarm(now, f"[警告] 当前GPS收星数量为{gps_num}（建议≥{GPS_MIN_SATELLITES}颗）"))
+        return {'gps_fix': quality, 'gps_satellites': satellites,
+                'gps_hdop': fix.hdop if fix else None}, lines
+
+    async def query_ntp(self):
+        """向NTP服务器发送一次SNTP请求，返回本机时间偏移（秒）"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        transport, _ = await loop.create_datagram_endpoint(
+            lambda: NtpProtocol(future), remote_addr=(self.ntp_server, 123))
+        try:
+            return await future
+        finally:
+            transport.close()
+
+    async def check_ntp(self, now):
+        """NTP时间同步（偏移在 ±NTP_MAX_OFFSET 秒内为正常，服务器无响应时与Shell版一样按异常处理）"""
+        try:
+            offset = await asyncio.wait_for(self.query_ntp(), NTP_REPLY_TIMEOUT)
+        except (OSError, asyncio.TimeoutError):
+            offset = None
+        if (self.sync_clock and offset is not None and abs(offset) > self.sync_threshold
+                and (self.sync_task is None or self.sync_task.done())):
+            self.sync_task = asyncio.ensure_future(self.step_clock())
+        if offset is not None and -NTP_MAX_OFFSET < offset < NTP_MAX_OFFSET:
+            return {'ntp_offset': offset}, [normal(now, f"NTP时间同步正常 (偏移: {offset:.6f} 秒)")]
+        text = '' if offset is None else f"{offset:.6f}"
+        return {'ntp_offset': offset}, [alarm(now, f"[错误] NTP时间同步异常 (偏移: {text} 秒)")]
+
+    async def step_clock(self):
+        """校准系统时间（与Shell版的 ntpdate -b 一致，需要root权限），结果单独输出一行"""
+        for command in CLOCK_SYNC_COMMANDS:
+            command = [arg.format(server=self.ntp_server) for arg in command]
+            try:
+                process = await asyncio.create_subprocess_exec(
+                    *command, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE)
+            except FileNotFoundError:
+                continue
+            try:
+                _, error = await asyncio.wait_for(process.communicate(), CLOCK_SYNC_TIMEOUT)
+            except asyncio.TimeoutError:
+                print(f"[WARN] 校准系统时间超时: {' '.join(command)}", flush=True)
+                return
+            finally:
+                if process.returncode is None:
+                    process.kill()
+            if process.returncode == 0:
+                print(f"[INFO] 已校准系统时间: {' '.join(command)}", flush=True)
+            else:
+                message = error.decode(errors='replace').strip()
+                print(f"[WARN] 校准系统时间失败: {' '.join(command)}: {message}", flush=True)
+            return
+        print("[WARN] 未找到 ntpdate 或 chronyc，不再校准系统时间", flush=True)
+        self.sync_clock = False
+
+    async def run_check(self, name, now):
+        """执行一个检测项，超时或出错时输出错误行"""
+        check = getattr(self, 'check_' + name)
+        try:
+            return await asyncio.wait_for(check(now), self.timeouts[name])
+        except asyncio.TimeoutError:
+            return {}, [alarm(now, f"[错误] {CHECK_NAMES[name]}检测超时（{self.timeouts[name]:g}秒）")]
+        except Exception as e:
+            return {}, [alarm(now, f"[错误] {CHECK_NAMES[name]}检测失败: {e}")]
+
+    async def sample(self):
+        """
+        并发执行全部检测项
+
+        返回 (采样时间戳, 测量值字典, 输出行列表)
+        """
+        timestamp = time.time()
+        now = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(timestamp))
+        results = await asyncio.gather(*(self.run_check(name, now) for name in CHECK_ORDER))
+
+        values = {}
+        lines = [f"---------- {now} ----------"]
+        for check_values, check_lines in results:
+            values.update(check_values)
+            lines.extend(check_lines)
+        return timestamp, values, lines
+
+    async def run(self, count=0, recorder=None):
+        """
+        按固定周期采样（以启动时间为基准，不随检测耗时漂移），count为0时一直运行
+
+        recorder 不为空时，每次采样的测量值写入环形记录文件
+        """
+        loop = asyncio.get_running_loop()
+        gps_task = asyncio.ensure_future(self.gps_reader.run())
+        next_time = loop.time()
+        done = 0
+        try:
+            while not count or done < count:
+                timestamp, values, lines = await self.sample()
+                print('\n'.join(lines) + '\n', flush=True)
+                if recorder is not None:
+                    recorder.append(timestamp, values)
+                done += 1
+
+                next_time += self.period
+                delay = next_time - loop.time()
+                if delay < 0:
+                    # 本次采样超过一个周期，跳到下一个周期起点
+                    skipped = int(-delay // self.period) + 1
+                    next_time += skipped * self.period
+                    delay = next_time - loop.time()
+                if not count or done < count:
+                    await asyncio.sleep(delay)
+        finally:
+            gps_task.cancel()
+            if self.sync_task is not None:
+                self.sync_task.cancel()
+
+
+def print_banner():
+    """打印启动信息（与Shell版一致）"""
+    print("==========================================")
+    print("车载系统健康监控工具 v1.0")
+    print("==========================================")
+    print("监控项目：")
+    print("  - GPS定位状态和收星数量")
+    print("  - CPU和内存使用率")
+    print("  - 磁盘空间")
+    print("  - 4G网络连接")
+    print("  - NTP时间同步")
+    print("==========================================")
+    print("开始监控...（Ctrl+C 停止）")
+    print("")
+
+
+def main():
+    """
+    主函数
+    """
+    parser = argparse.ArgumentParser(description='车载系统健康监控工具 - 并发检测，固定周期采样')
+    parser.add_argument('--period', type=float, default=SAMPLE_PERIOD,
+                        help=f'采样周期（秒，默认{SAMPLE_PERIOD}）')
+    parser.add_argument('-n', '--count', type=int, default=0,
+                        help='采样次数（默认0，一直运行）')
+    parser.add_argument('--gps-host', default=GPS_HOST, help=f'GPS设备地址（默认{GPS_HOST}）')
+    parser.add_argument('--gps-port', type=int, default=GPS_PORT, help=f'GPS设备端口（默认{GPS_PORT}）')
+    parser.add_argument('--ntp-server', default=NTP_SERVER, help=f'NTP服务器（默认{NTP_SERVER}）')
+    parser.add_argument('--ping-host', default=PING_HOST, help=f'4G检测ping地址（默认{PING_HOST}）')
+    parser.add_argument('--sync-clock', action='store_true',
+                        help='NTP偏移超出阈值时校准系统时间（ntpdate -b 或 chronyc makestep，需要root权限）；'
+                             '默认只检测偏移')
+    parser.add_argument('--sync-threshold', type=float, default=NTP_MAX_OFFSET,
+                        help=f'--sync-clock 时校准系统时间的偏移阈值（秒，默认{NTP_MAX_OFFSET}）')
+    parser.add_argument('--record', help='将测量值写入环形记录文件（不存在时创建）')
+    parser.add_argument('--record-capacity', type=int, default=DEFAULT_CAPACITY,
+                        help=f'新建记录文件的容量（条，默认{DEFAULT_CAPACITY}）')
+
+    args = parser.parse_args()
+
+    recorder = None
+    if args.record:
+        try:
+            recorder = MetricsRecorder(args.record, args.record_capacity)
+        except (OSError, ValueError) as e:
+            print(f"[ERROR] 无法打开记录文件: {e}")
+            sys.exit(1)
+
+    monitor = VehicleHealthMonitor(gps_host=args.gps_host, gps_port=args.gps_port,
+                                   ntp_server=args.ntp_server, ping_host=args.ping_host,
+                                   period=args.period, sync_clock=args.sync_clock,
+                                   sync_threshold=args.sync_threshold)
+    print_banner()
+    try:
+        asyncio.run(monitor.run(args.count, recorder))
+    except KeyboardInterrupt:
+        print("\n[INFO] 监控已停止")
+    finally:
+        if recorder is not None:
+            recorder.close()
+
+
+if __name__ == '__main__':
+    main()